@@ -0,0 +1,190 @@
+"""
+Production build and serving of the frontend assets.
+
+`python assets.py` bundles the local stylesheets and scripts referenced by
+static/index.html into one CSS and one JS file, minifies them, names them
+by content hash and writes gzip / brotli siblings next to each bundle:
+
+    static/dist/app.<hash>.js      (+ .gz, .br)
+    static/dist/app.<hash>.css     (+ .gz, .br)
+    static/dist/index.html         (index.html pointing at the bundles)
+    static/dist/manifest.json
+
+Scripts are concatenated in page order, so globals declared by config.js
+are still visible to map.js / tools.js / app.js exactly as with separate
+<script> tags.  When static/dist/index.html exists, main.py serves it at
+"/" and serves /static/dist with PrecompressedStaticFiles (pre-encoded
+variants; immutable caching for the hashed bundles, revalidation for
+index.html and manifest.json, which every build rewrites).  Without a build the app runs from the
+plain sources as before.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import stat
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles
+
+STATIC_DIR = "static"
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+DIST_INDEX = os.path.join(DIST_DIR, "index.html")
+
+_CSS_TAG = re.compile(r'[ \t]*<link rel="stylesheet" href="/static/([\w.-]+\.css)">\n')
+_JS_TAG = re.compile(r'[ \t]*<script src="/static/([\w.-]+\.js)"></script>\n')
+
+# Content-hashed files never change, so browsers may keep them for a year.
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+# Files rewritten in place by build() (index.html, manifest.json).
+REVALIDATE_CACHE = "no-cache"
+_HASHED_NAME = re.compile(r"(?:^|/)app\.[0-9a-f]{12}\.(?:css|js)$")
+
+
+# -------------------------------------------------------------------------
+#  Build
+# -------------------------------------------------------------------------
+
+def _minify_js(source: str) -> str:
+    try:
+        import rjsmin
+    except ImportError:
+        return source
+    return rjsmin.jsmin(source)
+
+
+def _minify_css(source: str) -> str:
+    try:
+        import rcssmin
+    except ImportError:
+        return source
+    return rcssmin.cssmin(source)
+
+
+def _write_variants(name: str, payload: bytes) -> list:
+    """Write *name* plus .gz / .br siblings into DIST_DIR; return written names."""
+    written = [name]
+    with open(os.path.join(DIST_DIR, name), "wb") as fh:
+        fh.write(payload)
+    with open(os.path.join(DIST_DIR, name + ".gz"), "wb") as fh:
+        # mtime=0 keeps the .gz byte-identical between builds of the same bundle.
+        fh.write(gzip.compress(payload, compresslevel=9, mtime=0))
+    written.append(name + ".gz")
+    try:
+        import brotli
+    except ImportError:
+        return written
+    with open(os.path.join(DIST_DIR, name + ".br"), "wb") as fh:
+        fh.write(brotli.compress(payload, quality=11))
+    written.append(name + ".br")
+    return written
+
+
+def _bundle(files: list, minify, ext: str) -> tuple:
+    parts = []
+    for fname in files:
+        with open(os.path.join(STATIC_DIR, fname), encoding="utf-8") as fh:
+            parts.append(f"/* {fname} */\n" + minify(fh.read()))
+    # Scripts are joined with ";\n" so a file without a trailing semicolon
+    # cannot merge into the first statement of the next one.
+    payload = (";\n" if ext == "js" else "\n").join(parts).encode("utf-8")
+    digest = hashlib.sha256(payload).hexdigest()[:12]
+    return f"app.{digest}.{ext}", payload
+
+
+def _replace_tags(html: str, pattern: "re.Pattern", tag: str) -> str:
+    """Put *tag* where the first *pattern* match was and drop all matches."""
+    first = pattern.search(html)
+    return html[:first.start()] + tag + pattern.sub("", html[first.start():])
+
+
+def build() -> dict:
+    """Build hashed, precompressed bundles and the matching index.html."""
+    with open(os.path.join(STATIC_DIR, "index.html"), encoding="utf-8") as fh:
+        html = fh.read()
+
+    css_files = _CSS_TAG.findall(html)
+    js_files = _JS_TAG.findall(html)
+    if not css_files or not js_files:
+        raise RuntimeError("No local stylesheets or scripts found in static/index.html")
+
+    os.makedirs(DIST_DIR, exist_ok=True)
+    css_name, css_payload = _bundle(css_files, _minify_css, "css")
+    js_name, js_payload = _bundle(js_files, _minify_js, "js")
+    keep = set(_write_variants(css_name, css_payload) + _write_variants(js_name, js_payload))
+
+    html = _replace_tags(html, _CSS_TAG, f'    <link rel="stylesheet" href="/static/dist/{css_name}">\n')
+    html = _replace_tags(html, _JS_TAG, f'<script src="/static/dist/{js_name}"></script>\n')
+    with open(DIST_INDEX, "w", encoding="utf-8") as fh:
+        fh.write(html)
+
+    manifest = {
+        "css": css_name, "js": js_name,
+        "sources": {"css": css_files, "js": js_files},
+        "bytes": {"css": len(css_payload), "js": len(js_payload)},
+    }
+    with open(os.path.join(DIST_DIR, "manifest.json"), "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=2)
+    keep.update({"index.html", "manifest.json"})
+
+    # Remove bundles from earlier builds.
+    for fname in os.listdir(DIST_DIR):
+        if fname not in keep:
+            os.remove(os.path.join(DIST_DIR, fname))
+    return manifest
+
+
+# -------------------------------------------------------------------------
+#  Serving
+# -------------------------------------------------------------------------
+
+def cache_control(path: str) -> str:
+    """Cache-Control for a file under DIST_DIR: immutable only for hashed bundles."""
+    return IMMUTABLE_CACHE if _HASHED_NAME.search(path) else REVALIDATE_CACHE
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that prefers pre-encoded .br / .gz siblings.
+
+    Content-hashed bundles are served with an immutable Cache-Control
+    header; other files (index.html, manifest.json) must be revalidated.
+    """
+
+    _ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+    async def get_response(self, path: str, scope) -> Response:
+        accept = Headers(scope=scope).get("accept-encoding", "")
+        if scope["method"] in ("GET", "HEAD"):
+            for encoding, suffix in self._ENCODINGS:
+                if encoding not in accept:
+                    continue
+                full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + suffix)
+                if stat_result and stat.S_ISREG(stat_result.st_mode):
+                    response = FileResponse(full_path, stat_result=stat_result)
+                    # Content type follows the original file, not the .br / .gz suffix.
+                    response.headers["content-type"] = _guess_type(path)
+                    response.headers["content-encoding"] = encoding
+                    response.headers["vary"] = "Accept-Encoding"
+                    response.headers["cache-control"] = cache_control(path)
+                    return response
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            response.headers["cache-control"] = cache_control(path)
+        return response
+
+
+def _guess_type(path: str) -> str:
+    if path.endswith(".js"):
+        return "text/javascript; charset=utf-8"
+    if path.endswith(".css"):
+        return "text/css; charset=utf-8"
+    return "application/octet-stream"
+
+
+if __name__ == "__main__":
+    result = build()
+    print(f"Built {result['css']} ({result['bytes']['css']} B) and {result['js']} ({result['bytes']['js']} B)")
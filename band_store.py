@@ -0,0 +1,257 @@
+"""
+On-disk store of per-AOI, per-scene band arrays.
+
+Raw Sentinel-2 / Landsat bands for an AOI grid are written once and
+read back as memory-mapped NumPy arrays, so revisiting a field does not
+pull the same pixels from GEE again.  Scenes are indexed by
+(geometry hash, scene ID); the geometry hash is pixel_cache.geometry_key.
+
+Layout:
+    <BAND_STORE_DIR>/<geometry_key>/<scene>/meta.json
+    <BAND_STORE_DIR>/<geometry_key>/<scene>/<band>.npy     (one file per band)
+
+Each band is its own chunk: a reader maps only the bands it needs and
+slices rows / columns without copying.  Scenes are written to a temporary
+directory and renamed into place, so readers never see a partial scene.
+
+Eviction:
+  Scenes older than BAND_STORE_MAX_AGE_DAYS are dropped, then the least
+  recently read scenes until the store fits in BAND_STORE_MAX_MB.  The
+  scene being written is never evicted by its own put.
+
+Filling:
+  Any source that yields equally shaped 2-D arrays on a known grid can
+  fill the store: services.py writes GEE computePixels downloads, and
+  `fill_from_geotiffs` reads local GeoTIFF files (requires rasterio).
+"""
+
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+BAND_STORE_DIR = os.getenv("BAND_STORE_DIR", os.path.join(tempfile.gettempdir(), "biomass_band_store"))
+BAND_STORE_MAX_BYTES = int(os.getenv("BAND_STORE_MAX_MB", "2048")) * 1024 * 1024
+BAND_STORE_MAX_AGE_S = float(os.getenv("BAND_STORE_MAX_AGE_DAYS", "30")) * 86400
+
+S2_BANDS = ['B2', 'B3', 'B4', 'B5', 'B6', 'B7', 'B8', 'B8A', 'B11', 'B12', 'SCL']
+LANDSAT_BANDS = ['SR_B1', 'SR_B2', 'SR_B3', 'SR_B4', 'SR_B5', 'SR_B6', 'SR_B7', 'ST_B10', 'QA_PIXEL']
+
+_META = "meta.json"
+_UNSAFE = re.compile(r"[^A-Za-z0-9._-]")
+
+
+def _scene_dirname(scene_id: str) -> str:
+    return _UNSAFE.sub("_", scene_id)
+
+
+class StoredScene:
+    """Read-only, memory-mapped view of one stored scene."""
+
+    __slots__ = ("geometry_key", "scene_id", "grid", "meta", "path", "_bands")
+
+    def __init__(self, path: str, meta: dict):
+        self.path = path
+        self.meta = meta
+        self.geometry_key = meta["geometry_key"]
+        self.scene_id = meta["scene_id"]
+        self.grid = meta["grid"]
+        self._bands: Dict[str, np.ndarray] = {}
+
+    @property
+    def band_names(self) -> List[str]:
+        return list(self.meta["bands"])
+
+    def band(self, name: str) -> np.ndarray:
+        """Memory-mapped 2-D array of *name* (opened on first access)."""
+        arr = self._bands.get(name)
+        if arr is None:
+            if name not in self.meta["bands"]:
+                raise KeyError(name)
+            arr = np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r")
+            self._bands[name] = arr
+        return arr
+
+    def bands(self, names: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+        return {n: self.band(n) for n in (names or self.band_names)}
+
+    def window(self, name: str, row0: int, row1: int, col0: int, col1: int) -> np.ndarray:
+        """Zero-copy slice of one band."""
+        return self.band(name)[row0:row1, col0:col1]
+
+
+class BandStore:
+    """Thread-safe on-disk scene store with size / age eviction."""
+
+    def __init__(self, root: str = BAND_STORE_DIR, max_bytes: int = BAND_STORE_MAX_BYTES,
+                 max_age_s: float = BAND_STORE_MAX_AGE_S):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[tuple, dict]] = None   # (geometry_key, scene_id) -> meta
+
+    # ---- index -------------------------------------------------------------
+
+    def _scene_path(self, geometry_key: str, scene_id: str) -> str:
+        return os.path.join(self.root, geometry_key, _scene_dirname(scene_id))
+
+    def _load_index(self) -> Dict[tuple, dict]:
+        if self._index is not None:
+            return self._index
+        index = {}
+        if os.path.isdir(self.root):
+            for gkey in os.listdir(self.root):
+                gdir = os.path.join(self.root, gkey)
+                if not os.path.isdir(gdir):
+                    continue
+                for sdir in os.listdir(gdir):
+                    meta_path = os.path.join(gdir, sdir, _META)
+                    try:
+                        with open(meta_path, encoding="utf-8") as fh:
+                            meta = json.load(fh)
+                    except (OSError, ValueError):
+                        continue
+                    meta["accessed_at"] = os.path.getmtime(meta_path)
+                    index[(meta["geometry_key"], meta["scene_id"])] = meta
+        self._index = index
+        return index
+
+    # ---- public API --------------------------------------------------------
+
+    def get(self, geometry_key: str, scene_id: str) -> Optional[StoredScene]:
+        with self._lock:
+            meta = self._load_index().get((geometry_key, scene_id))
+            if meta is None:
+                return None
+            if time.time() - meta["created_at"] > self.max_age_s:
+                self._remove(geometry_key, scene_id)
+                return None
+            path = self._scene_path(geometry_key, scene_id)
+            meta["accessed_at"] = time.time()
+            try:
+                os.utime(os.path.join(path, _META))
+            except OSError:
+                pass
+            return StoredScene(path, meta)
+
+    def scenes(self, geometry_key: str) -> List[str]:
+        with self._lock:
+            return sorted(sid for (gkey, sid) in self._load_index() if gkey == geometry_key)
+
+    def put(self, geometry_key: str, scene_id: str, bands: Dict[str, np.ndarray],
+            grid: dict, meta: Optional[dict] = None) -> StoredScene:
+        """Write *bands* (equally shaped 2-D arrays) for one scene and return a view of it."""
+        shapes = {np.shape(a) for a in bands.values()}
+        if len(shapes) != 1 or len(next(iter(shapes))) != 2:
+            raise ValueError("All bands must be 2-D arrays of the same shape.")
+
+        gdir = os.path.join(self.root, geometry_key)
+        os.makedirs(gdir, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=gdir)
+        nbytes = 0
+        try:
+            for name, arr in bands.items():
+                arr = np.ascontiguousarray(arr)
+                np.save(os.path.join(tmp, f"{name}.npy"), arr, allow_pickle=False)
+                nbytes += arr.nbytes
+            now = time.time()
+            record = {
+                "geometry_key": geometry_key,
+                "scene_id": scene_id,
+                "bands": list(bands),
+                "shape": list(next(iter(shapes))),
+                "grid": grid,
+                "nbytes": nbytes,
+                "created_at": now,
+                **(meta or {}),
+            }
+            with open(os.path.join(tmp, _META), "w", encoding="utf-8") as fh:
+                json.dump(record, fh)
+
+            with self._lock:
+                index = self._load_index()
+                final = self._scene_path(geometry_key, scene_id)
+                if os.path.isdir(final):
+                    shutil.rmtree(final, ignore_errors=True)
+                os.replace(tmp, final)
+                record["accessed_at"] = now
+                index[(geometry_key, scene_id)] = record
+                self._evict_locked(keep=(geometry_key, scene_id))
+            return StoredScene(final, record)
+        finally:
+            if os.path.isdir(tmp):
+                shutil.rmtree(tmp, ignore_errors=True)
+
+    def evict(self) -> None:
+        with self._lock:
+            self._evict_locked()
+
+    def stats(self) -> dict:
+        with self._lock:
+            index = self._load_index()
+            return {"scenes": len(index), "bytes": sum(m.get("nbytes", 0) for m in index.values())}
+
+    # ---- eviction ----------------------------------------------------------
+
+    def _remove(self, geometry_key: str, scene_id: str) -> None:
+        self._load_index().pop((geometry_key, scene_id), None)
+        shutil.rmtree(self._scene_path(geometry_key, scene_id), ignore_errors=True)
+
+    def _evict_locked(self, keep: Optional[tuple] = None) -> None:
+        """Evict by age, then LRU; *keep* (the scene just written) is never evicted,
+        so a scene larger than max_bytes on its own still stays until the next put."""
+        index = self._load_index()
+        now = time.time()
+        for key, meta in list(index.items()):
+            if now - meta["created_at"] > self.max_age_s:
+                self._remove(*key)
+        total = sum(m.get("nbytes", 0) for m in index.values())
+        for key, meta in sorted(index.items(), key=lambda kv: kv[1]["accessed_at"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= meta.get("nbytes", 0)
+            self._remove(*key)
+
+
+# ---------------------------------------------------------------------------
+#  GeoTIFF filler
+# ---------------------------------------------------------------------------
+
+def fill_from_geotiffs(store: BandStore, geometry_key: str, scene_id: str,
+                       paths: Dict[str, str], meta: Optional[dict] = None) -> StoredScene:
+    """Load single-band GeoTIFFs ({band: path}) on a common grid into *store*.
+
+    The grid is taken from the first file's transform / CRS; files must be
+    north-up and share it.  Requires the optional `rasterio` package.
+    """
+    try:
+        import rasterio
+    except ImportError as exc:
+        raise RuntimeError("Reading GeoTIFFs requires the 'rasterio' package.") from exc
+
+    bands, grid = {}, None
+    for name, path in paths.items():
+        with rasterio.open(path) as src:
+            t = src.transform
+            this_grid = {
+                "crs": src.crs.to_string(), "scale": abs(t.a),
+                "x0": t.c, "y0": t.f, "width": src.width, "height": src.height,
+            }
+            if grid is None:
+                grid = this_grid
+            elif this_grid != grid:
+                raise ValueError(f"{path} is not on the same grid as the other bands.")
+            bands[name] = src.read(1)
+    return store.put(geometry_key, scene_id, bands, grid, {"source": "geotiff", **(meta or {})})
@@ -0,0 +1,290 @@
+"""
+Offline batch runner: analyse a fleet of fields without the web server.
+
+    python batch_cli.py --fields fields.geojson --start 2024-04-01 --end 2024-09-30 \
+        --workers 4 --gee-concurrency 12 --checkpoint nightly.jsonl --out nightly.csv --db
+
+Fields are read from a GeoJSON FeatureCollection (ids from feature `id` or
+properties `field_id` / `id` / `name`) or a CSV with `field_id` and
+`geojson` columns.  Each field runs the same calculate_biomass_logic as
+POST /calculate/biomass, spread over a process pool.
+
+Checkpointing:
+  Every finished field is appended to the --checkpoint file as one JSON
+  line ({"field_id", "ok", "result" | "error"}).  Re-running with the same
+  checkpoint skips fields already completed successfully, so an
+  interrupted nightly run resumes where it stopped.
+
+GEE budget:
+  --gee-concurrency is the total number of concurrent GEE requests for the
+  run.  It is split evenly across worker processes by capping each
+  worker's per-date thread pool (services._MAX_GEE_WORKERS); --workers is
+  capped at --gee-concurrency so every worker gets at least one request.
+
+Outputs:
+  --out writes one row per (field, date, sensor) with a column per index,
+  as CSV or, for a .parquet path, Parquet (needs the optional `pyarrow`
+  package).  --db saves every result through save_results_to_db with one
+  transaction per chunk of fields; a chunk that fails is retried field by
+  field, and fields that still fail are logged and skipped.
+"""
+
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date as date_type
+
+log = logging.getLogger("batch_cli")
+
+DEFAULT_INDICES = ["NDVI", "NDRE", "GNDVI", "EVI", "SAVI", "CIre", "MTCI", "IRECI", "NDMI", "NMDI",
+                   "LST", "VSWI", "TVDI", "TCI", "VHI"]
+DB_CHUNK_SIZE = 50
+
+
+# -------------------------------------------------------------------------
+#  Field input
+# -------------------------------------------------------------------------
+
+def load_fields(path: str) -> list:
+    """Return [{"id", "geometry"}, ...] from a .geojson/.json or .csv file."""
+    if path.lower().endswith(".csv"):
+        fields = []
+        with open(path, newline="", encoding="utf-8") as fh:
+            for n, row in enumerate(csv.DictReader(fh), start=1):
+                if not row.get("geojson"):
+                    raise ValueError(f"{path}:{n + 1}: missing 'geojson' column value")
+                geometry = json.loads(row["geojson"])
+                if geometry.get("type") == "Feature":
+                    geometry = geometry["geometry"]
+                fields.append({"id": str(row.get("field_id") or n), "geometry": geometry})
+        return fields
+
+    with open(path, encoding="utf-8") as fh:
+        collection = json.load(fh)
+    import services
+    return services._normalize_fields(collection)
+
+
+def read_checkpoint(path: str) -> set:
+    """Field ids already completed successfully in *path*."""
+    done = set()
+    if not path or not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue   # a line cut short by an interrupted run
+            if entry.get("ok"):
+                done.add(str(entry["field_id"]))
+    return done
+
+
+def iter_checkpoint_results(path: str):
+    """Yield the latest successful result per field from a checkpoint file."""
+    latest = {}
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get("ok"):
+                latest[str(entry["field_id"])] = entry["result"]
+    yield from latest.values()
+
+
+# -------------------------------------------------------------------------
+#  Worker process
+# -------------------------------------------------------------------------
+
+def _init_worker(gee_threads: int) -> None:
+    import services
+    services._MAX_GEE_WORKERS = gee_threads
+    services.init_gee()
+
+
+def _run_field(field: dict, start_date: str, end_date: str, indices: list, cloud_cover: int) -> dict:
+    import services
+    from schemas import AnalysisRequest
+
+    t0 = time.time()
+    request = AnalysisRequest(
+        field_id=field["id"], geojson=field["geometry"],
+        start_date=start_date, end_date=end_date,
+        indices=indices, cloud_cover=cloud_cover,
+    )
+    try:
+        result = services.calculate_biomass_logic(request)
+    except Exception as exc:
+        return {"field_id": field["id"], "ok": False, "error": str(exc), "seconds": round(time.time() - t0, 1)}
+    return {"field_id": field["id"], "ok": True, "result": result, "seconds": round(time.time() - t0, 1)}
+
+
+# -------------------------------------------------------------------------
+#  Outputs
+# -------------------------------------------------------------------------
+
+def write_csv(path: str, results, indices: list) -> int:
+    rows = 0
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(["field_id", "date", "sensor"] + indices)
+        for result in results:
+            field_id = result["metadata"]["field_id"]
+            for point in result["timeseries"]:
+                vals = point["values"]
+                writer.writerow([field_id, point["date"], point["sensor"]] +
+                                ["" if vals.get(idx) is None else vals[idx] for idx in indices])
+                rows += 1
+    return rows
+
+
+def write_parquet(path: str, results, indices: list) -> int:
+    """Same rows as write_csv, as a Parquet file (one row group per field)."""
+    import measurement_export
+
+    pa = measurement_export._pyarrow()
+    schema = pa.schema([pa.field("field_id", pa.string()), pa.field("date", pa.date32()),
+                        pa.field("sensor", pa.string())] +
+                       [pa.field(idx, pa.float64()) for idx in indices])
+    rows = 0
+    with pa.parquet.ParquetWriter(path, schema, compression="zstd") as writer:
+        for result in results:
+            field_id = str(result["metadata"]["field_id"])
+            points = result["timeseries"]
+            if not points:
+                continue
+            columns = {
+                "field_id": [field_id] * len(points),
+                "date": [date_type.fromisoformat(p["date"]) for p in points],
+                "sensor": [p["sensor"] for p in points],
+            }
+            for idx in indices:
+                columns[idx] = [p["values"].get(idx) for p in points]
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            rows += len(points)
+    return rows
+
+
+def write_db(results) -> int:
+    import database
+    import services
+    from sqlalchemy.exc import SQLAlchemyError
+
+    if not database.DATABASE_ENABLED or database.SessionLocal is None:
+        raise RuntimeError("Database persistence is disabled (ENABLE_DB=0).")
+
+    def _save(batch: list) -> int:
+        """Save *batch* in one transaction; returns how many fields were saved."""
+        with database.SessionLocal() as db:
+            try:
+                for result in batch:
+                    services.save_results_to_db(db, result, commit=False)
+                db.commit()
+                return len(batch)
+            except (ValueError, SQLAlchemyError) as exc:
+                db.rollback()
+                if len(batch) == 1:
+                    log.warning("Field %s not saved: %s", batch[0]["metadata"]["field_id"], exc)
+                    return 0
+                log.warning("Chunk of %d fields not saved (%s); saving them one by one.", len(batch), exc)
+        return sum(_save([result]) for result in batch)
+
+    saved = 0
+    batch = []
+    for result in results:
+        batch.append(result)
+        if len(batch) >= DB_CHUNK_SIZE:
+            saved += _save(batch)
+            batch = []
+    if batch:
+        saved += _save(batch)
+    return saved
+
+
+# -------------------------------------------------------------------------
+#  Driver
+# -------------------------------------------------------------------------
+
+def run(args) -> int:
+    fields = load_fields(args.fields)
+    done = read_checkpoint(args.checkpoint)
+    pending = [f for f in fields if f["id"] not in done]
+    log.info("%d fields, %d already done, %d to run", len(fields), len(fields) - len(pending), len(pending))
+
+    workers = max(1, min(args.workers, args.gee_concurrency, len(pending) or 1))
+    if workers < args.workers and workers == args.gee_concurrency:
+        log.info("Using %d workers (capped at --gee-concurrency)", workers)
+    gee_threads = max(1, args.gee_concurrency // workers)
+    checkpoint = open(args.checkpoint, "a", encoding="utf-8") if args.checkpoint else None
+    results, failures = [], 0
+    t0 = time.time()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(gee_threads,)) as pool:
+            futures = [
+                pool.submit(_run_field, f, args.start, args.end, args.indices, args.cloud_cover)
+                for f in pending
+            ]
+            for n, fut in enumerate(as_completed(futures), start=1):
+                entry = fut.result()
+                if checkpoint:
+                    checkpoint.write(json.dumps(entry) + "\n")
+                    checkpoint.flush()
+                if entry["ok"]:
+                    results.append(entry["result"])
+                else:
+                    failures += 1
+                elapsed = time.time() - t0
+                eta = elapsed / n * (len(pending) - n)
+                log.info("[%d/%d] field %s %s in %.1fs (eta %.0fs)%s",
+                         n, len(pending), entry["field_id"], "ok" if entry["ok"] else "FAILED",
+                         entry["seconds"], eta, "" if entry["ok"] else f": {entry['error']}")
+    finally:
+        if checkpoint:
+            checkpoint.close()
+
+    # With a checkpoint, outputs cover the whole run including resumed fields.
+    all_results = list(iter_checkpoint_results(args.checkpoint)) if args.checkpoint else results
+    if args.out:
+        writer = write_parquet if args.out.lower().endswith(".parquet") else write_csv
+        rows = writer(args.out, all_results, args.indices)
+        log.info("Wrote %d rows to %s", rows, args.out)
+    if args.db:
+        log.info("Saved %d fields to the database", write_db(all_results))
+    log.info("Done: %d ok, %d failed in %.0fs", len(results), failures, time.time() - t0)
+    return 1 if failures else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run field analyses offline across a process pool.")
+    parser.add_argument("--fields", required=True, help="GeoJSON FeatureCollection or CSV (field_id, geojson)")
+    parser.add_argument("--start", required=True, help="Start date YYYY-MM-DD")
+    parser.add_argument("--end", required=True, help="End date YYYY-MM-DD")
+    parser.add_argument("--indices", nargs="+", default=DEFAULT_INDICES)
+    parser.add_argument("--cloud-cover", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Worker processes")
+    parser.add_argument("--gee-concurrency", type=int, default=12,
+                        help="Total concurrent GEE requests for the run (split across workers)")
+    parser.add_argument("--checkpoint", help="JSONL checkpoint file; reused to resume a run")
+    parser.add_argument("--out", help="CSV or .parquet file with one row per field/date/sensor")
+    parser.add_argument("--db", action="store_true", help="Save results to the configured database")
+    args = parser.parse_args(argv)
+    if not args.out and not args.db and not args.checkpoint:
+        parser.error("nothing to write: pass --out, --db and/or --checkpoint")
+    if args.gee_concurrency < 1:
+        parser.error("--gee-concurrency must be at least 1")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", stream=sys.stderr)
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
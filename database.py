@@ -1,13 +1,16 @@
+import logging
 import os
 import re
 from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, inspect, text
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 load_dotenv()
 
+log = logging.getLogger(__name__)
+
 _ENABLE_DB_RAW = os.getenv("ENABLE_DB", "1").strip().lower()
 DATABASE_ENABLED = _ENABLE_DB_RAW not in {"0", "false", "no", "off"}
 
@@ -16,6 +19,25 @@ SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./biomass_results
 DB_TABLE_NAME = os.getenv("DB_TABLE_NAME", "vegetation_indices")
 DB_SCHEMA = os.getenv("DB_SCHEMA", "obs").strip()
 
+# Async engine for request handlers (psycopg async / aiosqlite); DB_ASYNC=0 disables it.
+DB_ASYNC_ENABLED = os.getenv("DB_ASYNC", "1").strip().lower() not in {"0", "false", "no", "off"}
+# Pool sizing for server databases (SQLite uses SQLAlchemy's defaults).
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+# File-backed SQLite runs in WAL mode with these pragmas (SQLITE_TUNING=0 keeps the defaults).
+# WAL lets reads proceed while the write-behind thread (the single writer) commits.
+SQLITE_TUNING = os.getenv("SQLITE_TUNING", "1").strip().lower() not in {"0", "false", "no", "off"}
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "cache_size": -int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536")),    # negative = KiB
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE_MB", "256")) * 1024 * 1024,
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "10000")),
+    "temp_store": "MEMORY",
+}
+
 
 def _validated_table_name() -> str:
     """Return a SQL-safe table identifier from env config."""
@@ -61,19 +83,80 @@ def _ensure_postgres_sslmode(db_url: str) -> str:
     return db_url
 
 
+def _async_database_url(db_url: str) -> str | None:
+    """Async driver URL for *db_url*, or None when there is no async driver for it."""
+    scheme, sep, rest = db_url.partition("://")
+    if scheme in ("sqlite", "sqlite+pysqlite"):
+        return f"sqlite+aiosqlite{sep}{rest}"
+    if scheme in ("postgresql", "postgresql+psycopg", "postgresql+psycopg_async"):
+        # SQLAlchemy selects psycopg's async connection class under create_async_engine.
+        return f"postgresql+psycopg{sep}{rest}"
+    return None
+
+
+def _is_sqlite_file(db_url: str) -> bool:
+    return db_url.startswith("sqlite") and db_url.partition("://")[2] not in ("", "/", "/:memory:")
+
+
+def _apply_sqlite_pragmas(dbapi_connection, _connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def _tune_sqlite(sync_engine) -> None:
+    """Apply SQLITE_PRAGMAS to every new connection of a file-backed SQLite engine."""
+    if SQLITE_TUNING and _is_sqlite_file(str(sync_engine.url)):
+        event.listen(sync_engine, "connect", _apply_sqlite_pragmas)
+
+
+def _engine_kwargs(db_url: str) -> dict:
+    kwargs = {}
+    if db_url.startswith("sqlite"):
+        kwargs["connect_args"] = {"check_same_thread": False}
+    else:
+        # Keep pooled connections healthy for managed cloud databases.
+        kwargs["pool_pre_ping"] = True
+        kwargs["pool_recycle"] = 1800
+        kwargs["pool_size"] = DB_POOL_SIZE
+        kwargs["max_overflow"] = DB_MAX_OVERFLOW
+        kwargs["pool_timeout"] = DB_POOL_TIMEOUT
+    return kwargs
+
+
+def _create_async_engine(db_url: str):
+    """Async engine + session factory, or (None, None) when unavailable."""
+    async_url = _async_database_url(db_url)
+    if async_url is None:
+        return None, None
+    try:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        kwargs = _engine_kwargs(db_url)
+        kwargs.pop("connect_args", None)
+        async_engine = create_async_engine(async_url, **kwargs)
+    except ImportError as exc:
+        log.warning("Async database engine unavailable (%s); using the sync engine.", exc)
+        return None, None
+    return async_engine, async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
 engine = None
 SessionLocal = None
+async_engine = None
+AsyncSessionLocal = None
 if DATABASE_ENABLED:
     SQLALCHEMY_DATABASE_URL = _ensure_postgres_sslmode(SQLALCHEMY_DATABASE_URL)
-    engine_kwargs = {}
-    if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
-        engine_kwargs["connect_args"] = {"check_same_thread": False}
-    else:
-        # Keep pooled connections healthy for managed cloud databases.
-        engine_kwargs["pool_pre_ping"] = True
-        engine_kwargs["pool_recycle"] = 1800
-    engine = create_engine(SQLALCHEMY_DATABASE_URL, **engine_kwargs)
+    engine = create_engine(SQLALCHEMY_DATABASE_URL, **_engine_kwargs(SQLALCHEMY_DATABASE_URL))
+    _tune_sqlite(engine)
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    if DB_ASYNC_ENABLED:
+        async_engine, AsyncSessionLocal = _create_async_engine(SQLALCHEMY_DATABASE_URL)
+        if async_engine is not None:
+            _tune_sqlite(async_engine.sync_engine)
 
 Base = declarative_base()
 
@@ -91,6 +174,21 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """Yield an AsyncSession; yield None when the DB or the async engine is disabled."""
+    if not DATABASE_ENABLED or AsyncSessionLocal is None:
+        yield None
+        return
+
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def dispose_async_engine() -> None:
+    if async_engine is not None:
+        await async_engine.dispose()
+
+
 def check_db_connection() -> None:
     """Raises when DB connection is not healthy or cannot be established."""
     if not DATABASE_ENABLED or engine is None:
@@ -99,15 +197,12 @@ def check_db_connection() -> None:
         connection.execute(text("SELECT 1"))
 
 
-def ensure_measurements_schema() -> None:
+def ensure_measurements_schema(connection) -> None:
     """Add missing optional columns for backward-compatible upgrades."""
-    if not DATABASE_ENABLED or engine is None:
-        return
-
     table_name = _validated_table_name()
     table_ref = _qualified_table_name()
     schema_name = _active_schema()
-    inspector = inspect(engine)
+    inspector = inspect(connection)
     if not inspector.has_table(table_name, schema=schema_name):
         return
 
@@ -119,48 +214,45 @@ def ensure_measurements_schema() -> None:
         "source_image_id": "VARCHAR",
         "source": "VARCHAR",
         "created_at": "TIMESTAMP",
+        "spatial_stats": "JSON",
     }
 
-    with engine.begin() as connection:
-        for column_name, column_type in desired_columns.items():
-            if column_name in existing_columns:
-                continue
-            connection.execute(
-                text(f"ALTER TABLE {table_ref} ADD COLUMN {column_name} {column_type}")
-            )
+    for column_name, column_type in desired_columns.items():
+        if column_name in existing_columns:
+            continue
+        connection.execute(
+            text(f"ALTER TABLE {table_ref} ADD COLUMN {column_name} {column_type}")
+        )
 
-        all_columns = existing_columns.union(desired_columns.keys())
-        # Backfill for compatibility with earlier rows.
-        if "captured_at" in all_columns and "date" in all_columns:
-            connection.execute(
-                text(f"UPDATE {table_ref} SET captured_at = date WHERE captured_at IS NULL")
-            )
-        if "canopy_cover" in all_columns:
-            connection.execute(
-                text(f"UPDATE {table_ref} SET canopy_cover = 1 WHERE canopy_cover IS NULL")
-            )
-        if "biomass_est" in all_columns:
-            connection.execute(
-                text(f"UPDATE {table_ref} SET biomass_est = 1 WHERE biomass_est IS NULL")
-            )
-        if "source_image_id" in all_columns:
-            connection.execute(
-                text(
-                    f"UPDATE {table_ref} SET source_image_id = '1' "
-                    "WHERE source_image_id IS NULL OR source_image_id = ''"
-                )
+    all_columns = existing_columns.union(desired_columns.keys())
+    # Backfill for compatibility with earlier rows.
+    if "captured_at" in all_columns and "date" in all_columns:
+        connection.execute(
+            text(f"UPDATE {table_ref} SET captured_at = date WHERE captured_at IS NULL")
+        )
+    if "canopy_cover" in all_columns:
+        connection.execute(
+            text(f"UPDATE {table_ref} SET canopy_cover = 1 WHERE canopy_cover IS NULL")
+        )
+    if "biomass_est" in all_columns:
+        connection.execute(
+            text(f"UPDATE {table_ref} SET biomass_est = 1 WHERE biomass_est IS NULL")
+        )
+    if "source_image_id" in all_columns:
+        connection.execute(
+            text(
+                f"UPDATE {table_ref} SET source_image_id = '1' "
+                "WHERE source_image_id IS NULL OR source_image_id = ''"
             )
+        )
 
 
-def migrate_measurements_drop_legacy_date() -> None:
+def migrate_measurements_drop_legacy_date(connection) -> None:
     """Drop legacy `date` column after migrating values into `captured_at`."""
-    if not DATABASE_ENABLED or engine is None:
-        return
-
     table_name = _validated_table_name()
     table_ref = _qualified_table_name()
     schema_name = _active_schema()
-    inspector = inspect(engine)
+    inspector = inspect(connection)
     if not inspector.has_table(table_name, schema=schema_name):
         return
 
@@ -169,75 +261,91 @@ def migrate_measurements_drop_legacy_date() -> None:
     if "date" not in column_names:
         return
 
-    with engine.begin() as connection:
-        if "captured_at" not in column_names:
-            connection.execute(text(f"ALTER TABLE {table_ref} ADD COLUMN captured_at DATE"))
-        connection.execute(text(f"UPDATE {table_ref} SET captured_at = date WHERE captured_at IS NULL"))
-
-        dialect = engine.dialect.name
-        if dialect == "postgresql":
-            index_name = f"uq_{table_name}_field_captured_sensor"
-            qualified_index = f"{schema_name}.{index_name}" if schema_name else index_name
-            connection.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
-            connection.execute(
-                text(f"DROP INDEX IF EXISTS {qualified_index}")
-            )
-            connection.execute(
-                text(
-                    f"ALTER TABLE {table_ref} DROP CONSTRAINT IF EXISTS _field_date_sensor_uc"
-                )
+    if "captured_at" not in column_names:
+        connection.execute(text(f"ALTER TABLE {table_ref} ADD COLUMN captured_at DATE"))
+    connection.execute(text(f"UPDATE {table_ref} SET captured_at = date WHERE captured_at IS NULL"))
+
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        index_name = f"uq_{table_name}_field_captured_sensor"
+        qualified_index = f"{schema_name}.{index_name}" if schema_name else index_name
+        connection.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
+        connection.execute(
+            text(f"DROP INDEX IF EXISTS {qualified_index}")
+        )
+        connection.execute(
+            text(
+                f"ALTER TABLE {table_ref} DROP CONSTRAINT IF EXISTS _field_date_sensor_uc"
             )
-            connection.execute(
-                text(
-                    f"CREATE UNIQUE INDEX IF NOT EXISTS {index_name} "
-                    f"ON {table_ref}(field_id, captured_at, sensor)"
-                )
+        )
+        connection.execute(
+            text(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS {index_name} "
+                f"ON {table_ref}(field_id, captured_at, sensor)"
             )
-            connection.execute(text(f"ALTER TABLE {table_ref} DROP COLUMN IF EXISTS date"))
-            return
-
-        if dialect == "sqlite":
-            pragma_rows = connection.execute(text(f"PRAGMA table_info({table_name})")).fetchall()
-            keep_rows = [row for row in pragma_rows if row[1] != "date"]
-            keep_cols = [row[1] for row in keep_rows]
-
-            def _col_def(row):
-                name = row[1]
-                col_type = row[2] or "TEXT"
-                not_null = bool(row[3])
-                default = row[4]
-                pk = bool(row[5])
-
-                if pk and col_type.upper() == "INTEGER":
-                    return f"{name} INTEGER PRIMARY KEY"
-
-                parts = [name, col_type]
-                if not_null:
-                    parts.append("NOT NULL")
-                if default is not None:
-                    parts.append(f"DEFAULT {default}")
-                if pk:
-                    parts.append("PRIMARY KEY")
-                return " ".join(parts)
-
-            col_defs = ", ".join(_col_def(row) for row in keep_rows)
-            keep_cols_csv = ", ".join(keep_cols)
-            temp_table = f"{table_name}__new"
-
-            connection.execute(
-                text(
-                    f"CREATE TABLE {temp_table} ("
-                    f"{col_defs}, "
-                    "UNIQUE(field_id, captured_at, sensor)"
-                    ")"
-                )
+        )
+        connection.execute(text(f"ALTER TABLE {table_ref} DROP COLUMN IF EXISTS date"))
+        return
+
+    if dialect == "sqlite":
+        pragma_rows = connection.execute(text(f"PRAGMA table_info({table_name})")).fetchall()
+        keep_rows = [row for row in pragma_rows if row[1] != "date"]
+        keep_cols = [row[1] for row in keep_rows]
+
+        def _col_def(row):
+            name = row[1]
+            col_type = row[2] or "TEXT"
+            not_null = bool(row[3])
+            default = row[4]
+            pk = bool(row[5])
+
+            if pk and col_type.upper() == "INTEGER":
+                return f"{name} INTEGER PRIMARY KEY"
+
+            parts = [name, col_type]
+            if not_null:
+                parts.append("NOT NULL")
+            if default is not None:
+                parts.append(f"DEFAULT {default}")
+            if pk:
+                parts.append("PRIMARY KEY")
+            return " ".join(parts)
+
+        col_defs = ", ".join(_col_def(row) for row in keep_rows)
+        keep_cols_csv = ", ".join(keep_cols)
+        temp_table = f"{table_name}__new"
+
+        connection.execute(
+            text(
+                f"CREATE TABLE {temp_table} ("
+                f"{col_defs}, "
+                "UNIQUE(field_id, captured_at, sensor)"
+                ")"
             )
-            connection.execute(
-                text(
-                    f"INSERT INTO {temp_table} "
-                    f"({keep_cols_csv}) "
-                    f"SELECT {keep_cols_csv} FROM {table_name}"
-                )
+        )
+        connection.execute(
+            text(
+                f"INSERT INTO {temp_table} "
+                f"({keep_cols_csv}) "
+                f"SELECT {keep_cols_csv} FROM {table_name}"
             )
-            connection.execute(text(f"DROP TABLE {table_name}"))
-            connection.execute(text(f"ALTER TABLE {temp_table} RENAME TO {table_name}"))
\ No newline at end of file
+        )
+        connection.execute(text(f"DROP TABLE {table_name}"))
+        connection.execute(text(f"ALTER TABLE {temp_table} RENAME TO {table_name}"))
+
+
+def ensure_history_index(connection) -> None:
+    """Create the (field_id, captured_at, id) index used by /history.
+
+    create_all only adds it to new tables, and the SQLite legacy-date
+    migration rebuilds the table, so this runs after both.
+    """
+    table_name = _validated_table_name()
+    if not inspect(connection).has_table(table_name, schema=_active_schema()):
+        return
+    connection.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS ix_vegetation_indices_field_captured "
+            f"ON {_qualified_table_name()} (field_id, captured_at, id)"
+        )
+    )
@@ -0,0 +1,438 @@
+"""
+NumPy implementation of the index band maths used in services.py.
+
+Every Sentinel-2 and Landsat index, the TVDI/TCI/VHI min/max
+normalisation and the STRESS_HOTSPOTS blend are computed here over plain
+band arrays, so indices can be derived locally from cached bands and the
+Earth Engine graphs have a reference implementation to be checked
+against.
+
+Conventions:
+  * Input bands are raw product values, exactly what the GEE graphs see:
+    Sentinel-2 L2A surface reflectance ×10000 (the EVI / SAVI / IRECI
+    constants rely on that), Landsat Collection 2 Level-2 DNs before
+    `apply_landsat_scale`.
+  * Outputs are float32 arrays with NaN wherever GEE would mask the pixel
+    (cloud mask, division by zero, missing input).
+  * Work is done in float32 with in-place `out=` ufunc calls, so each
+    index needs at most one or two temporaries of the input size.
+"""
+
+import warnings
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+F32 = np.float32
+
+# SCL classes kept by _mask_s2_clouds: dark area, vegetation, bare soil, water, unclassified.
+S2_CLEAR_SCL = (2, 4, 5, 6, 7)
+# QA_PIXEL bits rejected by _mask_landsat_clouds: dilated cloud, cloud, cloud shadow.
+LANDSAT_QA_REJECT = (1 << 1) | (1 << 3) | (1 << 4)
+
+S2_BANDS_FOR = {
+    'NDVI': ('B8', 'B4'),
+    'NDRE': ('B8', 'B5'),
+    'GNDVI': ('B8', 'B3'),
+    'EVI': ('B8', 'B4', 'B2'),
+    'SAVI': ('B8', 'B4'),
+    'CIre': ('B7', 'B5'),
+    'MTCI': ('B6', 'B5', 'B4'),
+    'IRECI': ('B7', 'B4', 'B5', 'B6'),
+    'NDMI': ('B8', 'B11'),
+    'NMDI': ('B8', 'B11', 'B12'),
+}
+LANDSAT_NEEDS_MINMAX = {'TVDI', 'TCI', 'VHI'}
+
+
+# ===========================================================================
+#  Masks and scaling  (mirror _mask_s2_clouds / _mask_landsat_clouds /
+#  _apply_landsat_scale)
+# ===========================================================================
+
+def s2_clear_mask(scl: np.ndarray) -> np.ndarray:
+    """Boolean mask of pixels whose SCL class is accepted by _mask_s2_clouds."""
+    return np.isin(scl, S2_CLEAR_SCL)
+
+
+def landsat_clear_mask(qa_pixel: np.ndarray) -> np.ndarray:
+    """Boolean mask of pixels with none of the cloud / shadow / dilated bits set."""
+    return (qa_pixel.astype(np.uint32) & LANDSAT_QA_REJECT) == 0
+
+
+def apply_mask(bands: Dict[str, np.ndarray], clear: np.ndarray,
+               names: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+    """Return float32 copies of *bands* with NaN outside *clear*."""
+    out = {}
+    for name in (names if names is not None else bands):
+        arr = np.array(bands[name], dtype=F32, copy=True)
+        arr[~clear] = np.nan
+        out[name] = arr
+    return out
+
+
+def mask_s2(bands: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Apply the SCL cloud mask; the SCL band itself is dropped."""
+    clear = s2_clear_mask(bands['SCL'])
+    return apply_mask(bands, clear, [b for b in bands if b != 'SCL'])
+
+
+def mask_landsat(bands: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Apply the QA_PIXEL cloud mask and Collection 2 scale factors."""
+    clear = landsat_clear_mask(bands['QA_PIXEL'])
+    masked = apply_mask(bands, clear, [b for b in bands if b != 'QA_PIXEL'])
+    return apply_landsat_scale(masked)
+
+
+def apply_landsat_scale(bands: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """SR_B* → reflectance (×0.0000275 − 0.2), ST_B* → Kelvin (×0.00341802 + 149)."""
+    out = {}
+    for name, arr in bands.items():
+        arr = np.asarray(arr, dtype=F32)
+        if name.startswith('SR_B'):
+            arr = arr * F32(0.0000275)
+            arr += F32(-0.2)
+        elif name.startswith('ST_B'):
+            arr = arr * F32(0.00341802)
+            arr += F32(149.0)
+        out[name] = arr
+    return out
+
+
+def median_composite(scenes: Iterable[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    """Per-band NaN-aware median of masked scenes (ImageCollection.median)."""
+    scenes = list(scenes)
+    if not scenes:
+        return {}
+    out = {}
+    for name in scenes[0]:
+        stack = np.stack([s[name] for s in scenes]).astype(F32, copy=False)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)   # all-NaN pixels stay NaN
+            out[name] = np.nanmedian(stack, axis=0).astype(F32, copy=False)
+    return out
+
+
+# ===========================================================================
+#  Fused arithmetic helpers
+# ===========================================================================
+
+def _f32(arr) -> np.ndarray:
+    return np.asarray(arr, dtype=F32)
+
+
+def _safe_divide(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    """num / den in place on *num*; zero denominators become NaN (GEE masks them)."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        np.divide(num, den, out=num)
+    num[den == 0] = np.nan
+    return num
+
+
+def normalized_difference(a, b) -> np.ndarray:
+    """(a - b) / (a + b) using one temporary for the denominator."""
+    a, b = _f32(a), _f32(b)
+    num = np.subtract(a, b, dtype=F32)
+    den = np.add(a, b, dtype=F32)
+    return _safe_divide(num, den)
+
+
+# ===========================================================================
+#  Sentinel-2 indices  (mirror index_registry.build_s2)
+# ===========================================================================
+
+def _evi(b: Dict[str, np.ndarray]) -> np.ndarray:
+    # 2.5 * ((NIR - RED) / (NIR + 6 * RED - 7.5 * BLUE + 10000))
+    nir, red, blue = _f32(b['B8']), _f32(b['B4']), _f32(b['B2'])
+    den = np.multiply(red, F32(6.0), dtype=F32)
+    den += nir
+    den -= F32(7.5) * blue
+    den += F32(10000.0)
+    num = np.subtract(nir, red, dtype=F32)
+    _safe_divide(num, den)
+    num *= F32(2.5)
+    return num
+
+
+def _savi(b: Dict[str, np.ndarray]) -> np.ndarray:
+    # ((NIR - RED) / (NIR + RED + 5000)) * 1.5
+    nir, red = _f32(b['B8']), _f32(b['B4'])
+    den = np.add(nir, red, dtype=F32)
+    den += F32(5000.0)
+    num = np.subtract(nir, red, dtype=F32)
+    _safe_divide(num, den)
+    num *= F32(1.5)
+    return num
+
+
+def _cire(b: Dict[str, np.ndarray]) -> np.ndarray:
+    # (RE3 / RE1) - 1
+    num = np.array(b['B7'], dtype=F32, copy=True)
+    _safe_divide(num, _f32(b['B5']))
+    num -= F32(1.0)
+    return num
+
+
+def _mtci(b: Dict[str, np.ndarray]) -> np.ndarray:
+    # (RE2 - RE1) / (RE1 - RED)
+    re1 = _f32(b['B5'])
+    num = np.subtract(_f32(b['B6']), re1, dtype=F32)
+    den = np.subtract(re1, _f32(b['B4']), dtype=F32)
+    return _safe_divide(num, den)
+
+
+def _ireci(b: Dict[str, np.ndarray]) -> np.ndarray:
+    # (RE3 - RED) * RE2 / (RE1 * 10000)
+    num = np.subtract(_f32(b['B7']), _f32(b['B4']), dtype=F32)
+    num *= _f32(b['B6'])
+    den = np.multiply(_f32(b['B5']), F32(10000.0), dtype=F32)
+    return _safe_divide(num, den)
+
+
+def _nmdi(b: Dict[str, np.ndarray]) -> np.ndarray:
+    # (NIR - (SWIR1 - SWIR2)) / (NIR + (SWIR1 - SWIR2))
+    nir = _f32(b['B8'])
+    swir_diff = np.subtract(_f32(b['B11']), _f32(b['B12']), dtype=F32)
+    den = np.add(nir, swir_diff, dtype=F32)
+    np.subtract(nir, swir_diff, out=swir_diff)
+    return _safe_divide(swir_diff, den)
+
+
+_S2_FORMULAS = {
+    'NDVI': lambda b: normalized_difference(b['B8'], b['B4']),
+    'NDRE': lambda b: normalized_difference(b['B8'], b['B5']),
+    'GNDVI': lambda b: normalized_difference(b['B8'], b['B3']),
+    'EVI': _evi,
+    'SAVI': _savi,
+    'CIre': _cire,
+    'MTCI': _mtci,
+    'IRECI': _ireci,
+    'NDMI': lambda b: normalized_difference(b['B8'], b['B11']),
+    'NMDI': _nmdi,
+}
+
+
+def compute_s2_indices(bands: Dict[str, np.ndarray], indices: Iterable[str]) -> Dict[str, np.ndarray]:
+    """Compute the requested Sentinel-2 indices from (masked) L2A bands.
+
+    If *bands* still contains 'SCL' the cloud mask is applied first.
+    Unknown indices are skipped.
+    """
+    if 'SCL' in bands:
+        bands = mask_s2(bands)
+    out = {}
+    for idx in indices:
+        formula = _S2_FORMULAS.get(idx)
+        if formula is not None:
+            out[idx] = formula(bands)
+    return out
+
+
+# ===========================================================================
+#  Landsat indices  (mirror index_registry.build_landsat)
+# ===========================================================================
+
+def landsat_minmax(ndvi_l: np.ndarray, lst_c: np.ndarray,
+                   region_mask: Optional[np.ndarray] = None) -> Dict[str, float]:
+    """NaN-aware min/max of NDVI and LST inside the AOI (Reducer.minMax)."""
+    if region_mask is not None:
+        ndvi_l = ndvi_l[region_mask]
+        lst_c = lst_c[region_mask]
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return {
+            'ndvi_l_min': float(np.nanmin(ndvi_l)) if ndvi_l.size else float('nan'),
+            'ndvi_l_max': float(np.nanmax(ndvi_l)) if ndvi_l.size else float('nan'),
+            'lst_c_min': float(np.nanmin(lst_c)) if lst_c.size else float('nan'),
+            'lst_c_max': float(np.nanmax(lst_c)) if lst_c.size else float('nan'),
+        }
+
+
+def _tci(lst_c: np.ndarray, lst_max: float, lst_rng: float) -> np.ndarray:
+    # (lst_max - lst_c) / lst_rng * 100
+    tci = np.subtract(F32(lst_max), lst_c, dtype=F32)
+    tci *= F32(100.0 / lst_rng)
+    return tci
+
+
+def compute_landsat_indices(bands: Dict[str, np.ndarray], indices: Iterable[str],
+                            region_mask: Optional[np.ndarray] = None,
+                            minmax: Optional[Dict[str, float]] = None) -> Dict[str, np.ndarray]:
+    """Compute the requested Landsat indices from Collection 2 L2 bands.
+
+    Raw bands (with 'QA_PIXEL') are masked and scaled first; already
+    scaled bands are used as they are.  TVDI / TCI / VHI are normalised by
+    the AOI min/max of NDVI and LST, taken from *minmax* when given (for
+    example the values GEE returned) or computed over *region_mask*.
+    """
+    indices = list(indices)
+    if 'QA_PIXEL' in bands:
+        bands = mask_landsat(bands)
+
+    ndvi_l = normalized_difference(bands['SR_B5'], bands['SR_B4'])
+    lst_c = np.subtract(_f32(bands['ST_B10']), F32(273.15), dtype=F32)
+
+    out = {}
+    if 'LST' in indices:
+        out['LST'] = lst_c
+    if 'VSWI' in indices:
+        out['VSWI'] = _safe_divide(ndvi_l.copy(), lst_c)
+
+    if LANDSAT_NEEDS_MINMAX.intersection(indices):
+        mm = minmax or landsat_minmax(ndvi_l, lst_c, region_mask)
+        ndvi_min, ndvi_max = mm['ndvi_l_min'], mm['ndvi_l_max']
+        lst_min, lst_max = mm['lst_c_min'], mm['lst_c_max']
+        ndvi_rng = max(ndvi_max - ndvi_min, 0.001)
+        lst_rng = max(lst_max - lst_min, 0.001)
+
+        if 'TVDI' in indices:
+            tvdi = np.subtract(lst_c, F32(lst_min), dtype=F32)
+            tvdi *= F32(1.0 / lst_rng)
+            out['TVDI'] = tvdi
+        if 'TCI' in indices or 'VHI' in indices:
+            tci = _tci(lst_c, lst_max, lst_rng)
+            if 'TCI' in indices:
+                out['TCI'] = tci
+            if 'VHI' in indices:
+                # 0.5 * VCI + 0.5 * TCI, with VCI = (ndvi - min) / rng * 100
+                vhi = np.subtract(ndvi_l, F32(ndvi_min), dtype=F32)
+                vhi *= F32(50.0 / ndvi_rng)
+                vhi += F32(0.5) * tci
+                out['VHI'] = vhi
+    return out
+
+
+# ===========================================================================
+#  STRESS_HOTSPOTS  (mirror _build_stress_hotspot_image)
+# ===========================================================================
+
+def _ramp(values: np.ndarray, offset: float, scale: float, invert: bool) -> np.ndarray:
+    """clamp((offset - v) / scale, 0, 1) if invert else clamp((v - offset) / scale, 0, 1); NaN stays NaN."""
+    if invert:
+        out = np.subtract(F32(offset), values, dtype=F32)
+    else:
+        out = np.subtract(values, F32(offset), dtype=F32)
+    out *= F32(1.0 / scale)
+    np.clip(out, 0.0, 1.0, out=out)
+    return out
+
+
+def _weighted_stress(parts: Iterable[Tuple[np.ndarray, float]]) -> Optional[np.ndarray]:
+    """Σ w·stress / max(Σ w·valid, 0.001), masked stress counting as 0 (unmask(0))."""
+    total = weight = None
+    for stress, w in parts:
+        valid = ~np.isnan(stress)
+        contrib = np.where(valid, stress, F32(0.0)).astype(F32, copy=False)
+        contrib *= F32(w)
+        wmask = valid.astype(F32)
+        wmask *= F32(w)
+        if total is None:
+            total, weight = contrib, wmask
+        else:
+            total += contrib
+            weight += wmask
+    if total is None:
+        return None
+    np.maximum(weight, F32(0.001), out=weight)
+    total /= weight
+    np.clip(total, 0.0, 1.0, out=total)
+    return total
+
+
+def s2_stress(s2_bands: Dict[str, np.ndarray]) -> np.ndarray:
+    """Sentinel-2 stress from an S2 median composite (NDVI 0.20, NDMI 0.15)."""
+    ndvi = normalized_difference(s2_bands['B8'], s2_bands['B4'])
+    ndmi = normalized_difference(s2_bands['B8'], s2_bands['B11'])
+    return _weighted_stress([
+        (_ramp(ndvi, 0.70, 0.50, invert=True), 0.20),
+        (_ramp(ndmi, 0.30, 0.40, invert=True), 0.15),
+    ])
+
+
+def landsat_stress(ls_bands: Dict[str, np.ndarray],
+                   region_mask: Optional[np.ndarray] = None) -> np.ndarray:
+    """Landsat stress from a scaled Landsat median composite (VHI 0.40, TCI 0.20, TVDI 0.05)."""
+    ndvi_l = normalized_difference(ls_bands['SR_B5'], ls_bands['SR_B4'])
+    lst_c = np.subtract(_f32(ls_bands['ST_B10']), F32(273.15), dtype=F32)
+    mm = landsat_minmax(ndvi_l, lst_c, region_mask)
+    # Same fallbacks as mm.get(..., default) in the GEE graph.
+    defaults = {'ndvi_l_min': -0.2, 'ndvi_l_max': 0.9, 'lst_c_min': 10.0, 'lst_c_max': 45.0}
+    mm = {k: (defaults[k] if np.isnan(v) else v) for k, v in mm.items()}
+    idx = compute_landsat_indices(
+        {'SR_B5': ls_bands['SR_B5'], 'SR_B4': ls_bands['SR_B4'], 'ST_B10': ls_bands['ST_B10']},
+        ['TVDI', 'TCI', 'VHI'], minmax=mm)
+    tvdi = np.clip(idx['TVDI'], 0.0, 1.0)
+    return _weighted_stress([
+        (_ramp(idx['VHI'], 70.0, 50.0, invert=True), 0.40),
+        (_ramp(idx['TCI'], 80.0, 60.0, invert=True), 0.20),
+        (_ramp(tvdi, 0.20, 0.60, invert=False), 0.05),
+    ])
+
+
+def focal_mean(values: np.ndarray, radius_px: int) -> np.ndarray:
+    """Mean over a circular kernel of *radius_px* pixels, ignoring NaN (focal_mean)."""
+    h, w = values.shape
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, F32(0.0)).astype(F32, copy=False)
+    pad = radius_px
+    filled_p = np.pad(filled, pad)
+    valid_p = np.pad(valid.astype(F32), pad)
+    total = np.zeros((h, w), dtype=F32)
+    count = np.zeros((h, w), dtype=F32)
+    r2 = radius_px * radius_px
+    for dy in range(-radius_px, radius_px + 1):
+        for dx in range(-radius_px, radius_px + 1):
+            if dy * dy + dx * dx > r2:
+                continue
+            ys, xs = pad + dy, pad + dx
+            total += filled_p[ys:ys + h, xs:xs + w]
+            count += valid_p[ys:ys + h, xs:xs + w]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        total /= count
+    total[count == 0] = np.nan
+    return total
+
+
+def stress_hotspots(s2_bands: Optional[Dict[str, np.ndarray]] = None,
+                    ls_bands: Optional[Dict[str, np.ndarray]] = None,
+                    region_mask: Optional[np.ndarray] = None,
+                    s2_scale: int = 10) -> Tuple[np.ndarray, int]:
+    """Blend S2 and Landsat stress the way _build_stress_hotspot_image does.
+
+    *s2_bands* / *ls_bands* are median composites (masked, Landsat scaled).
+    When both are given the Landsat composite must already be resampled
+    onto the Sentinel-2 grid.  Returns (stress, native_scale); masked
+    pixels are filled with 0, like unmask(0.0) in the GEE graph.
+    """
+    s2 = s2_stress(s2_bands) if s2_bands else None
+    ls = landsat_stress(ls_bands, region_mask) if ls_bands else None
+    if s2 is None and ls is None:
+        raise ValueError("No clear imagery available to build stress hotspot layer.")
+
+    if s2 is not None and ls is not None:
+        # Landsat is the low-frequency thermal baseline; S2 adds detail.
+        s2_low = focal_mean(s2, max(1, round(30 / s2_scale)))
+        detail = np.subtract(s2, s2_low, dtype=F32)
+        stress = np.multiply(ls, F32(0.65), dtype=F32)
+        stress += F32(0.35) * s2_low
+        detail *= F32(0.35)
+        stress += detail
+        np.clip(stress, 0.0, 1.0, out=stress)
+        native_scale = s2_scale
+    elif s2 is not None:
+        stress, native_scale = s2, s2_scale
+    else:
+        stress, native_scale = ls, 30
+
+    stress = np.where(np.isnan(stress), F32(0.0), stress).astype(F32, copy=False)
+    if region_mask is not None:
+        stress[~region_mask] = np.nan
+    return stress, native_scale
+
+
+def compute_indices(sensor: str, bands: Dict[str, np.ndarray], indices: Iterable[str],
+                    region_mask: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """Dispatch to the Sentinel-2 or Landsat engine by sensor name."""
+    if sensor == 'Landsat 8/9':
+        return compute_landsat_indices(bands, indices, region_mask=region_mask)
+    return compute_s2_indices(bands, indices)
@@ -0,0 +1,265 @@
+"""
+Declarative registry of every spectral index.
+
+Each index is described once (sensor, bands, formula, visualisation range,
+palette, native scale, scoring thresholds, condition group).  At import
+time the registry is compiled into:
+
+  * expression strings that reference bands with b('...') directly, so a
+    graph carries one Image.expression node per index instead of an
+    extra Image.select node for every variable;
+  * `build_s2` / `build_landsat` graph builders that take a mosaic or
+    composite and return {index: ee.Image}.  Shared intermediates (Landsat
+    NDVI, LST in °C, and the AOI min/max behind TVDI/TCI/VHI) are built
+    once per call, however many indices use them;
+  * lookup tables (S2_INDICES, LANDSAT_INDICES, VIS_PARAMS,
+    INDEX_THRESHOLDS, CONDITION_GROUPS) that services.py re-exports.
+
+Adding an index means adding one IndexDef below (plus the matching NumPy
+formula in index_engine.py for local rasters).
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional, Tuple
+
+import ee
+
+SENTINEL2 = "Sentinel-2"
+LANDSAT = "Landsat 8/9"
+
+
+@dataclass(frozen=True)
+class IndexDef:
+    name: str
+    sensor: str
+    bands: Tuple[str, ...]
+    vis_min: float
+    vis_max: float
+    palette: Tuple[str, ...]
+    thresholds: Tuple[str, Tuple[float, float, float, float]]   # (direction, cutoffs)
+    group: str
+    # Exactly one formula kind applies:
+    #   nd          → image.normalizedDifference(list(nd))
+    #   expression  → image.expression() with {VAR} placeholders mapped by `variables`
+    #   derived     → built from Landsat intermediates in build_landsat()
+    nd: Optional[Tuple[str, str]] = None
+    expression: Optional[str] = None
+    variables: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def native_scale(self) -> int:
+        return 30 if self.sensor == LANDSAT else 10
+
+    @property
+    def vis_params(self) -> dict:
+        return {'min': self.vis_min, 'max': self.vis_max, 'palette': list(self.palette)}
+
+
+_HEALTH = ('d73027', 'fc8d59', 'fee08b', 'd9ef8b', '66bd63', '1a9850')
+
+INDICES: Tuple[IndexDef, ...] = (
+    # ---- Sentinel-2: vegetation & growth -----------------------------------
+    IndexDef('NDVI', SENTINEL2, ('B8', 'B4'), -0.2, 1.0,
+             ('a50026', 'd73027', 'f46d43', 'fdae61', 'fee08b', 'd9ef8b', 'a6d96a', '66bd63', '1a9850', '006837'),
+             ('higher', (0.70, 0.50, 0.30, 0.10)), 'vigor', nd=('B8', 'B4')),
+    IndexDef('NDRE', SENTINEL2, ('B8', 'B5'), -0.2, 0.8,
+             ('440154', '482878', '3e4989', '31688e', '26828e', '1f9e89', '35b779', '6ece58', 'b5de2b', 'fde725'),
+             ('higher', (0.50, 0.30, 0.20, 0.10)), 'vigor', nd=('B8', 'B5')),
+    IndexDef('GNDVI', SENTINEL2, ('B8', 'B3'), -0.2, 0.9,
+             ('a50026', 'f46d43', 'fee08b', 'addd8e', '66bd63', '006837'),
+             ('higher', (0.60, 0.40, 0.30, 0.15)), 'vigor', nd=('B8', 'B3')),
+    IndexDef('EVI', SENTINEL2, ('B8', 'B4', 'B2'), -0.2, 0.8,
+             ('CE7E45', 'DF923D', 'F1B555', 'FCD163', '99B718', '74A901', '66A000', '529400', '3E8601', '207401'),
+             ('higher', (0.60, 0.40, 0.20, 0.10)), 'vigor',
+             expression='2.5 * (({NIR} - {RED}) / ({NIR} + 6 * {RED} - 7.5 * {BLUE} + 10000))',
+             variables={'NIR': 'B8', 'RED': 'B4', 'BLUE': 'B2'}),
+    IndexDef('SAVI', SENTINEL2, ('B8', 'B4'), -0.2, 0.8,
+             ('8c510a', 'bf812d', 'dfc27d', 'f6e8c3', 'c7eae5', '80cdc1', '35978f', '01665e'),
+             ('higher', (0.60, 0.40, 0.20, 0.10)), 'vigor',
+             expression='(({NIR} - {RED}) / ({NIR} + {RED} + 5000)) * 1.5',
+             variables={'NIR': 'B8', 'RED': 'B4'}),
+    IndexDef('CIre', SENTINEL2, ('B7', 'B5'), 0, 10,
+             ('ffffcc', 'd9f0a3', 'addd8e', '78c679', '41ab5d', '238443', '005a32'),
+             ('higher', (6.0, 4.0, 2.0, 1.0)), 'vigor',
+             expression='({RE3} / {RE1}) - 1',
+             variables={'RE3': 'B7', 'RE1': 'B5'}),
+    IndexDef('MTCI', SENTINEL2, ('B6', 'B5', 'B4'), 0, 6,
+             ('ffffb2', 'fed976', 'feb24c', 'fd8d3c', 'fc4e2a', 'e31a1c', 'b10026'),
+             ('higher', (4.0, 3.0, 2.0, 1.0)), 'vigor',
+             expression='({RE2} - {RE1}) / ({RE1} - {RED})',
+             variables={'RE2': 'B6', 'RE1': 'B5', 'RED': 'B4'}),
+    IndexDef('IRECI', SENTINEL2, ('B7', 'B4', 'B5', 'B6'), 0, 3,
+             ('fef0d9', 'fdd49e', 'fdbb84', 'fc8d59', 'ef6548', 'd7301f', '990000'),
+             ('higher', (2.0, 1.5, 0.8, 0.3)), 'vigor',
+             expression='({RE3} - {RED}) * {RE2} / ({RE1} * 10000)',
+             variables={'RE3': 'B7', 'RED': 'B4', 'RE1': 'B5', 'RE2': 'B6'}),
+    # ---- Sentinel-2: water & moisture --------------------------------------
+    IndexDef('NDMI', SENTINEL2, ('B8', 'B11'), -0.8, 0.8,
+             ('8c510a', 'd8b365', 'f6e8c3', 'c7eae5', '5ab4ac', '2166ac', '053061'),
+             ('higher', (0.30, 0.10, 0.00, -0.20)), 'moisture', nd=('B8', 'B11')),
+    IndexDef('NMDI', SENTINEL2, ('B8', 'B11', 'B12'), 0, 1.0,
+             ('d73027', 'fc8d59', 'fee090', 'ffffbf', 'e0f3f8', '91bfdb', '4575b4'),
+             ('higher', (0.70, 0.50, 0.30, 0.10)), 'moisture',
+             expression='({NIR} - ({SWIR1} - {SWIR2})) / ({NIR} + ({SWIR1} - {SWIR2}))',
+             variables={'NIR': 'B8', 'SWIR1': 'B11', 'SWIR2': 'B12'}),
+    # ---- Landsat 8/9: temperature & drought --------------------------------
+    IndexDef('LST', LANDSAT, ('ST_B10',), 0, 45,
+             ('08306b', '2171b5', '6baed6', 'bdd7e7', 'ffffcc', 'fed976', 'fd8d3c', 'e31a1c', '800026'),
+             ('lower', (25.0, 30.0, 35.0, 40.0)), 'heat'),
+    IndexDef('VSWI', LANDSAT, ('SR_B5', 'SR_B4', 'ST_B10'), 0, 0.06, _HEALTH,
+             ('higher', (0.04, 0.03, 0.02, 0.01)), 'moisture'),
+    IndexDef('TVDI', LANDSAT, ('ST_B10',), 0, 1,
+             ('2166ac', '67a9cf', 'd1e5f0', 'fddbc7', 'ef8a62', 'b2182b'),
+             ('lower', (0.30, 0.50, 0.70, 0.85)), 'moisture'),
+    IndexDef('TCI', LANDSAT, ('ST_B10',), 0, 100, _HEALTH,
+             ('higher', (80.0, 60.0, 40.0, 20.0)), 'heat'),
+    IndexDef('VHI', LANDSAT, ('SR_B5', 'SR_B4', 'ST_B10'), 0, 100, _HEALTH,
+             ('higher', (60.0, 40.0, 30.0, 20.0)), 'overall'),
+)
+
+# True-colour composites are not indices but share the layer builders.
+RGB_LAYERS = {
+    SENTINEL2: (['B4', 'B3', 'B2'], {'min': 0, 'max': 3000}),
+    LANDSAT: (['SR_B4', 'SR_B3', 'SR_B2'], {'min': 0.0, 'max': 0.3}),
+}
+
+_GROUP_WEIGHTS = {"vigor": 0.40, "moisture": 0.30, "heat": 0.20, "overall": 0.10}
+LANDSAT_NEEDS_MINMAX = frozenset({'TVDI', 'TCI', 'VHI'})
+
+
+# ===========================================================================
+#  Compiled lookups
+# ===========================================================================
+BY_NAME: Dict[str, IndexDef] = {d.name: d for d in INDICES}
+S2_INDICES = {d.name for d in INDICES if d.sensor == SENTINEL2}
+LANDSAT_INDICES = {d.name for d in INDICES if d.sensor == LANDSAT}
+VIS_PARAMS: Dict[str, dict] = {d.name: d.vis_params for d in INDICES}
+INDEX_THRESHOLDS = {d.name: {"dir": d.thresholds[0], "cutoffs": list(d.thresholds[1])} for d in INDICES}
+CONDITION_GROUPS = {
+    group: {"weight": weight, "indices": [d.name for d in INDICES if d.group == group]}
+    for group, weight in _GROUP_WEIGHTS.items()
+}
+
+# {VAR} placeholders → b('BAND') so the expression needs no variable map.
+_COMPILED_EXPRESSIONS: Dict[str, str] = {
+    d.name: d.expression.format(**{v: f"b('{band}')" for v, band in d.variables.items()})
+    for d in INDICES if d.expression
+}
+
+
+def native_scale(index_name: str, sensor: Optional[str] = None) -> int:
+    d = BY_NAME.get(index_name)
+    if d is not None:
+        return d.native_scale
+    return 30 if sensor and "Landsat" in sensor else 10
+
+
+# ===========================================================================
+#  Graph builders
+# ===========================================================================
+
+def build_s2(image, indices: Iterable[str]) -> Dict[str, "ee.Image"]:
+    """{index: ee.Image} for the requested Sentinel-2 indices (renamed to the index)."""
+    out = {}
+    for idx in indices:
+        d = BY_NAME.get(idx)
+        if d is None or d.sensor != SENTINEL2:
+            continue
+        if d.nd:
+            img = image.normalizedDifference(list(d.nd))
+        else:
+            img = image.expression(_COMPILED_EXPRESSIONS[idx])
+        out[idx] = img.rename(idx)
+    return out
+
+
+# Typical ranges used when an area has no clear pixels (with_defaults=True).
+_MINMAX_DEFAULTS = {'ndvi_l_min': -0.2, 'ndvi_l_max': 0.9, 'lst_c_min': 10.0, 'lst_c_max': 45.0}
+
+
+def landsat_minmax(ndvi_l, lst_c, region, with_defaults: bool = False) -> tuple:
+    """Lazy AOI min/max of Landsat NDVI and LST (ee.Number, no getInfo).
+
+    with_defaults=True falls back to typical ranges when the AOI has no
+    clear pixels (used by composite-based layers).
+    """
+    mm = ee.Image.cat([ndvi_l, lst_c]).reduceRegion(
+        reducer=ee.Reducer.minMax(), geometry=region, scale=30, maxPixels=1e9)
+    if with_defaults:
+        return tuple(ee.Number(mm.get(prop, default)) for prop, default in _MINMAX_DEFAULTS.items())
+    return (ee.Number(mm.get('ndvi_l_min')), ee.Number(mm.get('ndvi_l_max')),
+            ee.Number(mm.get('lst_c_min')), ee.Number(mm.get('lst_c_max')))
+
+
+def landsat_minmax_by_zone(ndvi_l, lst_c, zones, with_defaults: bool = False) -> tuple:
+    """Per-zone min/max of Landsat NDVI and LST as images (lazy, no getInfo).
+
+    One reduceRegions over *zones* (an ee.FeatureCollection); each zone's
+    pixels then carry that zone's own range, so a batch of fields is
+    normalised exactly as each field would be on its own.
+    """
+    stats = ee.Image.cat([ndvi_l, lst_c]).reduceRegions(
+        collection=zones, reducer=ee.Reducer.minMax(), scale=30)
+    images = []
+    for prop, default in _MINMAX_DEFAULTS.items():
+        img = stats.filter(ee.Filter.notNull([prop])).reduceToImage([prop], ee.Reducer.first())
+        images.append(img.unmask(default) if with_defaults else img)
+    return tuple(images)
+
+
+def build_landsat(image, indices: Iterable[str], region=None,
+                  minmax_defaults: bool = False, zones=None) -> Dict[str, "ee.Image"]:
+    """{index: ee.Image} for the requested Landsat indices of a scaled image.
+
+    TVDI / TCI / VHI need *region* for the AOI min/max normalisation; the
+    min/max reduction is built once and shared by all three.  With *zones*
+    (a FeatureCollection of fields) the min/max is taken per zone instead.
+    """
+    indices = [i for i in indices if i in LANDSAT_INDICES]
+    if not indices:
+        return {}
+    ndvi_l = image.normalizedDifference(['SR_B5', 'SR_B4']).rename('ndvi_l')
+    lst_c = image.select('ST_B10').subtract(273.15).rename('lst_c')
+
+    out = {}
+    if 'LST' in indices:
+        out['LST'] = lst_c.rename('LST')
+    if 'VSWI' in indices:
+        out['VSWI'] = ndvi_l.divide(lst_c).rename('VSWI')
+
+    if LANDSAT_NEEDS_MINMAX.intersection(indices):
+        if zones is not None:
+            ndvi_min, ndvi_max, lst_min, lst_max = landsat_minmax_by_zone(
+                ndvi_l, lst_c, zones, minmax_defaults)
+            lst_max_img = lst_max
+        else:
+            ndvi_min, ndvi_max, lst_min, lst_max = landsat_minmax(ndvi_l, lst_c, region, minmax_defaults)
+            lst_max_img = ee.Image.constant(lst_max)
+        ndvi_rng = ndvi_max.subtract(ndvi_min).max(0.001)
+        lst_rng = lst_max.subtract(lst_min).max(0.001)
+        tci = lst_max_img.subtract(lst_c).divide(lst_rng).multiply(100)
+        if 'TVDI' in indices:
+            out['TVDI'] = lst_c.subtract(lst_min).divide(lst_rng).rename('TVDI')
+        if 'TCI' in indices:
+            out['TCI'] = tci.rename('TCI')
+        if 'VHI' in indices:
+            vci = ndvi_l.subtract(ndvi_min).divide(ndvi_rng).multiply(100)
+            out['VHI'] = vci.multiply(0.5).add(tci.multiply(0.5)).rename('VHI')
+    return out
+
+
+def build_layers(image, sensor: str, indices: Iterable[str], region=None) -> Dict[str, tuple]:
+    """{index: (ee.Image, vis_params)} for map layers, including 'RGB'."""
+    indices = list(indices)
+    if "Landsat" in sensor:
+        sensor, images = LANDSAT, build_landsat(image, indices, region)
+    else:
+        sensor, images = SENTINEL2, build_s2(image, indices)
+    layers = {}
+    for idx in indices:
+        if idx == 'RGB':
+            bands, vp = RGB_LAYERS[sensor]
+            layers[idx] = (image.select(bands), dict(vp))
+        elif idx in images:
+            layers[idx] = (images[idx], VIS_PARAMS[idx])
+    return layers
@@ -0,0 +1,299 @@
+"""
+Background jobs for long-running analyses.
+
+A job is submitted with a kind ("analysis", ...) and a JSON request, runs
+on a small thread pool outside the HTTP request, and is polled by id:
+
+    queued → running → done | failed | cancelled
+
+Jobs live in a local SQLite file (JOBS_DB_PATH), independent of the
+measurements database, so they survive restarts even when ENABLE_DB=0.
+Several worker processes can share the file:
+
+  - a job is claimed with a conditional UPDATE (queued → running), so it
+    runs in exactly one process;
+  - the owning process refreshes a heartbeat on its running jobs; a
+    running job whose heartbeat is older than JOB_STALE_S (its owner has
+    died) is queued again by whichever process notices first;
+  - cancellation is a status change in the file, so it is seen by the
+    owner whichever process received the DELETE.
+
+Deduplication:
+  The fingerprint of a job is a hash of its kind and canonical request
+  JSON.  Submitting a request whose fingerprint matches a queued, running
+  or (not yet expired) finished job returns that job instead of starting
+  another one.
+
+Progress and cancellation:
+  Runners receive a `progress(done, total)` callback.  It records progress
+  only while the stored job is still running under this owner and raises
+  JobCancelled otherwise, so runners stop at their next progress report.
+  The final status is written under the same condition, so it never
+  overwrites a cancellation.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+log = logging.getLogger(__name__)
+
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(tempfile.gettempdir(), "biomass_jobs.sqlite"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_RESULT_TTL_S = float(os.getenv("JOB_RESULT_TTL_HOURS", "24")) * 3600
+JOB_HEARTBEAT_S = float(os.getenv("JOB_HEARTBEAT_S", "10"))
+JOB_STALE_S = float(os.getenv("JOB_STALE_S", "60"))
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress_done INTEGER NOT NULL DEFAULT 0,
+    progress_total INTEGER NOT NULL DEFAULT 0,
+    request TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    owner TEXT,
+    heartbeat_at REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_jobs_fingerprint ON jobs (fingerprint, status);
+"""
+# Columns added after the first release of the jobs file.
+_ADDED_COLUMNS = {"owner": "TEXT", "heartbeat_at": "REAL"}
+
+
+class JobCancelled(Exception):
+    """Raised inside a runner when its job has been cancelled."""
+
+
+def fingerprint(kind: str, request: dict) -> str:
+    raw = json.dumps({"kind": kind, "request": request}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class JobQueue:
+    """SQLite-backed job table plus a thread pool that runs registered kinds."""
+
+    def __init__(self, path: str = JOBS_DB_PATH, workers: int = JOB_WORKERS):
+        self.path = path
+        self.workers = workers
+        self._runners: Dict[str, Callable] = {}
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stop = threading.Event()
+        self._heartbeat: Optional[threading.Thread] = None
+        # Job ids waiting in (or running on) this process's pool.
+        self._submitted: set = set()
+        self._submitted_lock = threading.Lock()
+
+    # ---- storage -----------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _update(self, job_id: str, where: str = "", params: tuple = (), **fields) -> int:
+        """UPDATE one job (optionally only when *where* holds); returns the row count."""
+        fields["updated_at"] = time.time()
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        with self._connect() as conn:
+            return conn.execute(
+                f"UPDATE jobs SET {cols} WHERE id = ?{' AND ' + where if where else ''}",
+                (*fields.values(), job_id, *params),
+            ).rowcount
+
+    def _update_owned(self, job_id: str, **fields) -> bool:
+        """Update a job only while it is running under this process."""
+        return self._update(job_id, "status = ? AND owner = ?", (RUNNING, self._owner), **fields) == 1
+
+    # ---- lifecycle ---------------------------------------------------------
+
+    def register(self, kind: str, runner: Callable) -> None:
+        """runner(request: dict, progress: Callable[[int, int], None]) -> dict"""
+        self._runners[kind] = runner
+
+    def start(self) -> None:
+        """Create the table, drop expired jobs and pick up queued or orphaned ones."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connect() as conn:
+            # Progress updates from worker threads must not block status polls.
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            existing = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for name, kind in _ADDED_COLUMNS.items():
+                if name not in existing:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {kind}")
+            conn.execute("DELETE FROM jobs WHERE status NOT IN (?, ?) AND updated_at < ?",
+                         (*ACTIVE_STATES, time.time() - JOB_RESULT_TTL_S))
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+        self._stop.clear()
+        self._heartbeat = threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True)
+        self._heartbeat.start()
+        self._recover()
+
+    def shutdown(self) -> None:
+        self._stop.set()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        with self._submitted_lock:
+            self._submitted.clear()
+        # Hand jobs this process was running back to the queue for other workers.
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = ?, owner = NULL, progress_done = 0, updated_at = ? "
+                         "WHERE status = ? AND owner = ?", (QUEUED, time.time(), RUNNING, self._owner))
+
+    def _submit(self, job_id: str) -> None:
+        """Hand *job_id* to the pool unless it is already waiting or running here."""
+        pool = self._pool
+        if pool is None:
+            return
+        with self._submitted_lock:
+            if job_id in self._submitted:
+                return
+            self._submitted.add(job_id)
+        pool.submit(self._run, job_id)
+
+    def _recover(self) -> None:
+        """Re-queue running jobs whose owner stopped heartbeating, then submit queued jobs.
+
+        Jobs already in this process's pool are not submitted again.  Queued
+        jobs may also sit in another process's pool; the conditional claim in
+        _run makes sure only one process runs each of them.
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, owner = NULL, progress_done = 0, updated_at = ? "
+                "WHERE status = ? AND COALESCE(heartbeat_at, updated_at) < ?",
+                (QUEUED, time.time(), RUNNING, time.time() - JOB_STALE_S),
+            )
+            queued = conn.execute("SELECT id FROM jobs WHERE status = ? ORDER BY created_at",
+                                  (QUEUED,)).fetchall()
+        for row in queued:
+            self._submit(row["id"])
+
+    def _heartbeat_loop(self) -> None:
+        while not self._stop.wait(JOB_HEARTBEAT_S):
+            try:
+                with self._connect() as conn:
+                    conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE status = ? AND owner = ?",
+                                 (time.time(), RUNNING, self._owner))
+                self._recover()
+            except (sqlite3.Error, RuntimeError) as exc:
+                log.warning("Job heartbeat failed: %s", exc)
+
+    # ---- public API --------------------------------------------------------
+
+    def submit(self, kind: str, request: dict) -> dict:
+        """Queue a job (or return the matching live one) and return its status."""
+        if kind not in self._runners:
+            raise ValueError(f"Unknown job kind {kind!r}.")
+        if self._pool is None:
+            raise RuntimeError("Job queue is not running.")
+        fp = fingerprint(kind, request)
+        now = time.time()
+        with self._connect() as conn:
+            # The write lock makes the dedup check atomic across processes.
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE fingerprint = ? AND "
+                "(status IN (?, ?) OR (status = ? AND updated_at >= ?)) "
+                "ORDER BY created_at DESC LIMIT 1",
+                (fp, *ACTIVE_STATES, DONE, now - JOB_RESULT_TTL_S),
+            ).fetchone()
+            if row is None:
+                job_id = uuid.uuid4().hex
+                conn.execute(
+                    "INSERT INTO jobs (id, kind, fingerprint, status, request, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, kind, fp, QUEUED, json.dumps(request), now, now),
+                )
+        if row is not None:
+            return self.status(row["id"])
+        self._submit(job_id)
+        return self.status(job_id)
+
+    def status(self, job_id: str) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, kind, status, progress_done, progress_total, error, created_at, updated_at "
+                "FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "job_id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "progress": {"done": row["progress_done"], "total": row["progress_total"]},
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+    def result(self, job_id: str) -> Optional[dict]:
+        """Result of a finished job, or None when it is not done."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT status, result FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None or row["status"] != DONE or row["result"] is None:
+            return None
+        return json.loads(row["result"])
+
+    def cancel(self, job_id: str) -> Optional[dict]:
+        """Cancel a queued or running job; finished jobs are left unchanged."""
+        self._update(job_id, "status IN (?, ?)", ACTIVE_STATES, status=CANCELLED)
+        return self.status(job_id)
+
+    # ---- execution ---------------------------------------------------------
+
+    def _run(self, job_id: str) -> None:
+        try:
+            self._claim_and_run(job_id)
+        finally:
+            with self._submitted_lock:
+                self._submitted.discard(job_id)
+
+    def _claim_and_run(self, job_id: str) -> None:
+        # Claim the job; another process may already have it.
+        claimed = self._update(job_id, "status = ?", (QUEUED,),
+                               status=RUNNING, owner=self._owner, heartbeat_at=time.time())
+        if claimed != 1:
+            return
+        with self._connect() as conn:
+            row = conn.execute("SELECT kind, request FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+        def _progress(done: int, total: int) -> None:
+            if not self._update_owned(job_id, progress_done=done, progress_total=total):
+                raise JobCancelled(job_id)
+
+        try:
+            result = self._runners[row["kind"]](json.loads(row["request"]), _progress)
+        except JobCancelled:
+            log.info("Job %s cancelled.", job_id)
+            return
+        except Exception as exc:
+            log.warning("Job %s failed: %s", job_id, exc)
+            self._update_owned(job_id, status=FAILED, error=str(exc))
+            return
+        if not self._update_owned(job_id, status=DONE, result=json.dumps(result, default=str)):
+            log.info("Job %s finished after it was cancelled; result discarded.", job_id)
+
+
+queue = JobQueue()
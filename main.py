@@ -1,26 +1,42 @@
 from fastapi import FastAPI, HTTPException, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from fastapi.encoders import jsonable_encoder
+from fastapi.concurrency import run_in_threadpool
 from contextlib import asynccontextmanager
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import os
+import json
 import logging
 
 import services
 import schemas
 import database
-import models
 import uldk
+import assets
+import jobs
+import write_behind
+import measurement_export
+import migrations
+import rollups
 
 log = logging.getLogger(__name__)
 
-# 1. Creating table in the database (optional in serverless mode)
-if database.DATABASE_ENABLED and database.engine is not None:
-    models.Base.metadata.create_all(bind=database.engine)
-    database.ensure_measurements_schema()
-    database.migrate_measurements_drop_legacy_date()
+# 1. Creating / upgrading tables (optional in serverless mode); a no-op
+#    single query once the schema is at the latest version.
+migrations.run_migrations()
+
+def _run_analysis_job(request: dict, progress) -> dict:
+    """Job runner: same work as POST /calculate/biomass, off the request path."""
+    result = services.calculate_biomass_logic(schemas.AnalysisRequest(**request), progress=progress)
+    # Written by the write-behind thread, the only writer (no SQLite lock contention).
+    if write_behind.queue.stats()["running"]:
+        try:
+            write_behind.queue.enqueue(result)
+        except ValueError as e:
+            log.info("Analysis job result not persisted: %s", e)
+    return jsonable_encoder(result)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -42,7 +58,15 @@ async def lifespan(app: FastAPI):
         )
     else:
         log.warning("Database persistence is disabled (ENABLE_DB=0).")
+    if database.DATABASE_ENABLED and database.SessionLocal is not None:
+        write_behind.queue.start()
+    jobs.queue.register("analysis", _run_analysis_job)
+    jobs.queue.start()
     yield
+    jobs.queue.shutdown()
+    # Flush results still waiting to be written before the process exits.
+    write_behind.queue.stop()
+    await database.dispose_async_engine()
 
 app = FastAPI(title="Biomass Database Service", lifespan=lifespan)
 
@@ -62,35 +86,184 @@ async def favicon():
 # --- API Endpoints ---
 
 @app.post("/calculate/biomass", response_model=schemas.BiomassResponse)
-async def calculate_biomass_endpoint(
-    request: schemas.AnalysisRequest, 
-    db: Session = Depends(database.get_db)
-):
+async def calculate_biomass_endpoint(request: schemas.AnalysisRequest):
     try:
         result = services.calculate_biomass_logic(request)
-        if db is not None:
-            services.save_results_to_db(db, result)
+        # Persisted by the write-behind queue; the response does not wait on the DB.
+        if write_behind.queue.stats()["running"]:
+            write_behind.queue.enqueue(result)
         return result
     except Exception as e:
         print(f"Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/calculate/biomass/batch", response_model=schemas.BatchAnalysisResponse)
+async def calculate_biomass_batch_endpoint(request: schemas.BatchAnalysisRequest):
+    """Analyse a FeatureCollection of fields with shared date discovery and
+    one reduceRegions per scene; numeric field ids are queued for saving."""
+    try:
+        result = services.calculate_biomass_batch(
+            fields_geojson=request.fields,
+            start_date=request.start_date,
+            end_date=request.end_date,
+            indices=request.indices,
+            cloud_cover=request.cloud_cover,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if write_behind.queue.stats()["running"]:
+        for field_id, field_result in result["fields"].items():
+            try:
+                write_behind.queue.enqueue(field_result)
+            except ValueError:
+                log.info("Batch analysis: field %r is not numeric, not persisted.", field_id)
+    return result
+
+@app.get("/api/persistence")
+async def persistence_status():
+    """Write-behind queue depth, lag (oldest unwritten result, s) and counters."""
+    return write_behind.queue.stats()
+
+# --- Background analysis jobs ---
+
+@app.post("/jobs/analysis", response_model=schemas.JobStatus, status_code=202)
+async def submit_analysis_job(request: schemas.AnalysisRequest):
+    """Queue an analysis and return its job id immediately.
+
+    Identical requests share one job (queued, running or recently done).
+    """
+    try:
+        return jobs.queue.submit("analysis", request.model_dump())
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@app.get("/jobs/{job_id}", response_model=schemas.JobStatus)
+async def get_job(job_id: str):
+    status = jobs.queue.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return status
+
+@app.get("/jobs/{job_id}/result", response_model=schemas.BiomassResponse)
+async def get_job_result(job_id: str):
+    status = jobs.queue.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    if status["status"] != jobs.DONE:
+        raise HTTPException(status_code=409, detail=f"Job is {status['status']}.")
+    return jobs.queue.result(job_id)
+
+@app.delete("/jobs/{job_id}", response_model=schemas.JobStatus)
+async def cancel_job(job_id: str):
+    status = jobs.queue.cancel(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return status
+
 @app.get("/history/{field_id}")
-async def get_history(field_id: str, db: Session = Depends(database.get_db)):
-    if db is None:
+async def get_history(
+    field_id: str,
+    start_date: str = Query(None, description="YYYY-MM-DD, inclusive"),
+    end_date: str = Query(None, description="YYYY-MM-DD, inclusive"),
+    sensor: str = Query(None),
+    indices: str = Query(None, description="Comma-separated index names, e.g. NDVI,NDMI"),
+    limit: int = Query(services.HISTORY_DEFAULT_LIMIT, ge=1, le=services.HISTORY_MAX_LIMIT),
+    cursor: str = Query(None, description="X-Next-Cursor header of the previous page"),
+    db: AsyncSession = Depends(database.get_async_db),
+):
+    """Stored measurements for a field, oldest first.
+
+    Returns a JSON list; when more rows match, the `X-Next-Cursor` response
+    header holds the cursor for the next page.
+    """
+    if not database.DATABASE_ENABLED:
         return []
     try:
         field_id_num = int(field_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="field_id must be numeric.")
-    records = db.query(models.Measurement).filter(models.Measurement.field_id == field_id_num).all()
-    payload = []
-    for record in records:
-        item = {k: v for k, v in record.__dict__.items() if not k.startswith("_")}
-        # Keep frontend compatibility after replacing legacy `date` column with `captured_at`.
-        item["date"] = record.captured_at
-        payload.append(item)
-    return jsonable_encoder(payload)
+    filters = dict(
+        start_date=start_date, end_date=end_date, sensor=sensor,
+        indices=[i.strip() for i in indices.split(",") if i.strip()] if indices else None,
+        limit=limit, cursor=cursor,
+    )
+    try:
+        if db is not None:
+            rows, next_cursor = await services.query_history_async(db, field_id_num, **filters)
+        else:
+            # No async driver: keep the blocking query off the event loop.
+            rows, next_cursor = await run_in_threadpool(_query_history_sync, field_id_num, filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return Response(content=json.dumps(rows), media_type="application/json", headers=headers)
+
+def _query_history_sync(field_id: int, filters: dict) -> tuple:
+    with database.SessionLocal() as db:
+        return services.query_history(db, field_id, **filters)
+
+@app.get("/api/rollups")
+async def get_rollups(
+    field_ids: str = Query(..., description="Comma-separated field ids"),
+    period: str = Query("week", description="week (ISO) or month"),
+    indices: str = Query(None, description="Comma-separated index names, e.g. NDVI,NDMI"),
+    start_date: str = Query(None, description="YYYY-MM-DD, inclusive"),
+    end_date: str = Query(None, description="YYYY-MM-DD, inclusive"),
+    sensor: str = Query(None),
+    db: AsyncSession = Depends(database.get_async_db),
+):
+    """Weekly / monthly mean, min, max and count per field, sensor and index."""
+    if not database.DATABASE_ENABLED:
+        return []
+    try:
+        filters = dict(
+            field_ids=[int(i) for i in field_ids.split(",") if i.strip()],
+            period=period, start_date=start_date, end_date=end_date, sensor=sensor,
+            indices=[i.strip() for i in indices.split(",") if i.strip()] if indices else None,
+        )
+        if db is not None:
+            rows = await rollups.query_rollups_async(db, **filters)
+        else:
+            rows = await run_in_threadpool(_query_rollups_sync, filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(content=json.dumps(rows), media_type="application/json")
+
+def _query_rollups_sync(filters: dict) -> list:
+    with database.SessionLocal() as db:
+        return rollups.query_rollups(db, **filters)
+
+@app.get("/export/measurements")
+def export_measurements(
+    format: str = Query("parquet", description="csv, arrow (IPC stream) or parquet"),
+    field_ids: str = Query(None, description="Comma-separated field ids; all fields when omitted"),
+    start_date: str = Query(None, description="YYYY-MM-DD, inclusive"),
+    end_date: str = Query(None, description="YYYY-MM-DD, inclusive"),
+    sensor: str = Query(None),
+    indices: str = Query(None, description="Comma-separated index names, e.g. NDVI,NDMI"),
+):
+    """Stream stored measurements for many fields as CSV, Arrow IPC or Parquet."""
+    if not database.DATABASE_ENABLED:
+        raise HTTPException(status_code=503, detail="Database persistence is disabled.")
+    try:
+        ids = [int(i) for i in field_ids.split(",") if i.strip()] if field_ids else None
+        chunks = measurement_export.stream_export(
+            format, field_ids=ids, start_date=start_date, end_date=end_date, sensor=sensor,
+            indices=[i.strip() for i in indices.split(",") if i.strip()] if indices else None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    media_type, ext = measurement_export.FORMATS[format]
+    return StreamingResponse(
+        chunks, media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="measurements.{ext}"'},
+    )
 
 @app.post("/visualize/map", response_model=schemas.MapResponse)
 async def get_map_layer(request: schemas.AnalysisRequest):
@@ -128,7 +301,8 @@ async def get_batch_layers(request: schemas.BatchLayerRequest):
 async def pixel_value(request: schemas.PixelQueryRequest):
     """Sample index values at a single lat/lng for a given date/sensor."""
     try:
-        result = services.query_pixel_value(
+        result = await run_in_threadpool(
+            services.query_pixel_value,
             lat=request.lat,
             lng=request.lng,
             date=request.date,
@@ -143,6 +317,74 @@ async def pixel_value(request: schemas.PixelQueryRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
+@app.post("/api/pixel-values/batch", response_model=schemas.PixelBatchResponse)
+async def pixel_values_batch(request: schemas.PixelBatchRequest):
+    """Sample index values at many points (e.g. a soil-sampling grid) per date.
+
+    All points are reduced together in one reduceRegions call per date.
+    Set `format` to "csv" to download the samples as a CSV file.
+    """
+    if request.format not in ("json", "csv"):
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'csv'.")
+    try:
+        result = services.query_pixel_values_batch(
+            dates=request.dates,
+            sensor=request.sensor,
+            indices=request.indices,
+            geojson=request.geojson,
+            points=request.points,
+            points_geojson=request.points_geojson,
+            cloud_cover=request.cloud_cover,
+            start_date=request.start_date,
+            end_date=request.end_date,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if request.format == "csv":
+        return Response(
+            content=services.pixel_samples_to_csv(result, request.indices),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="pixel_samples.csv"'},
+        )
+    return result
+
+@app.post("/api/zonal-stats")
+async def zonal_stats(request: schemas.ZonalStatsRequest):
+    """Index means per grid cell / management zone for each date.
+
+    All zones are reduced together in one reduceRegions call per date and
+    results are cached per (field, zoning, date).  `format` selects a
+    GeoJSON FeatureCollection or a columnar values[index][date][zone] payload.
+    """
+    if request.format not in ("geojson", "columnar"):
+        raise HTTPException(status_code=400, detail="format must be 'geojson' or 'columnar'.")
+    try:
+        result = services.query_zonal_stats(
+            dates=request.dates,
+            sensor=request.sensor,
+            indices=request.indices,
+            geojson=request.geojson,
+            field_id=request.field_id,
+            grid_size_m=request.grid_size_m,
+            zones_geojson=request.zones_geojson,
+            cloud_cover=request.cloud_cover,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if request.format == "columnar":
+        return services.zonal_stats_to_columnar(result)
+    return Response(
+        content=json.dumps(services.zonal_stats_to_geojson(result)),
+        media_type="application/geo+json",
+    )
+
 # --- ULDK Parcel Lookup ---
 
 @app.get("/api/uldk/search")
@@ -175,10 +417,16 @@ async def uldk_locate(lat: float = Query(...), lng: float = Query(...)):
 
 # --- Static Files & Frontend Route ---
 
+# Built bundles (python assets.py) are content-hashed and precompressed.
+# This mount must come before /static so it is matched first.
+if os.path.exists(assets.DIST_INDEX):
+    app.mount("/static/dist", assets.PrecompressedStaticFiles(directory=assets.DIST_DIR), name="dist")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 @app.get("/")
 async def read_index():
+    if os.path.exists(assets.DIST_INDEX):
+        return FileResponse(assets.DIST_INDEX, headers={"Cache-Control": "no-cache"})
     index_path = os.path.join("static", "index.html")
     if not os.path.exists(index_path):
         return {"error": "Plik index.html nie został znaleziony w folderze static"}
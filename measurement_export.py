@@ -0,0 +1,220 @@
+"""
+Bulk export of stored measurements (CSV / Arrow IPC / Parquet).
+
+Rows are read from the measurements table with a streaming Core select
+(a server-side cursor on PostgreSQL, `yield_per` batches everywhere) and
+encoded batch by batch, with no ORM objects and no per-row dicts:
+
+  csv      rows go straight from the cursor into csv.writer
+  arrow    record batches built column by column, Arrow IPC stream
+  parquet  the same record batches, written as a Parquet file
+
+Output is produced one batch at a time, so the HTTP endpoint streams it
+and memory stays bounded by EXPORT_BATCH_ROWS whatever the export size.
+
+    GET /export/measurements?field_ids=1,2&start_date=2024-04-01&format=parquet
+
+    python measurement_export.py --out season.parquet --start 2024-04-01 --end 2024-09-30
+
+Arrow and Parquet require the optional `pyarrow` package.
+"""
+
+import argparse
+import csv
+import io
+import os
+import sys
+from datetime import date as date_type
+from typing import Iterator, List, Optional
+
+from sqlalchemy import select
+
+import database
+import index_registry
+import models
+
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "50000"))
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+_INDEX_COLUMNS = {d.name: d.name.lower() for d in index_registry.INDICES}
+_KEY_COLUMNS = ("field_id", "captured_at", "sensor")
+_EXTRA_COLUMNS = ("source", "canopy_cover", "biomass_est")
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401  (registers pyarrow.parquet)
+    except ImportError as exc:
+        raise RuntimeError("Columnar export requires the 'pyarrow' package.") from exc
+    return pyarrow
+
+
+def export_columns(indices: Optional[List[str]] = None) -> List[str]:
+    if indices:
+        unknown = [i for i in indices if i not in _INDEX_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown indices: {', '.join(unknown)}")
+        return list(_KEY_COLUMNS) + [_INDEX_COLUMNS[i] for i in indices]
+    return list(_KEY_COLUMNS) + list(_EXTRA_COLUMNS) + list(_INDEX_COLUMNS.values())
+
+
+def export_schema(columns: List[str]):
+    pa = _pyarrow()
+    types = {"field_id": pa.int64(), "captured_at": pa.date32(), "sensor": pa.string(), "source": pa.string()}
+    return pa.schema([pa.field(c, types.get(c, pa.float64())) for c in columns])
+
+
+def _iter_row_batches(columns: List[str], field_ids: Optional[List[int]] = None,
+                      start_date: Optional[str] = None, end_date: Optional[str] = None,
+                      sensor: Optional[str] = None, batch_rows: int = EXPORT_BATCH_ROWS) -> Iterator[list]:
+    """Yield lists of at most *batch_rows* row tuples (in *columns* order)."""
+    if not database.DATABASE_ENABLED or database.engine is None:
+        raise RuntimeError("Database persistence is disabled (ENABLE_DB=0).")
+    table = models.Measurement.__table__
+
+    stmt = (select(*(table.c[c] for c in columns))
+            .where(table.c.captured_at.isnot(None))
+            .order_by(table.c.field_id, table.c.captured_at, table.c.id))
+    if field_ids:
+        stmt = stmt.where(table.c.field_id.in_(field_ids))
+    if start_date:
+        stmt = stmt.where(table.c.captured_at >= date_type.fromisoformat(start_date))
+    if end_date:
+        stmt = stmt.where(table.c.captured_at <= date_type.fromisoformat(end_date))
+    if sensor:
+        stmt = stmt.where(table.c.sensor == sensor)
+
+    with database.engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_rows).execute(stmt)
+        yield from result.partitions(batch_rows)
+
+
+def iter_record_batches(indices: Optional[List[str]] = None, **filters) -> Iterator:
+    """Yield pyarrow.RecordBatch objects of at most *batch_rows* rows."""
+    pa = _pyarrow()
+    columns = export_columns(indices)
+    schema = export_schema(columns)
+    for rows in _iter_row_batches(columns, **filters):
+        # Transpose the tuples once; each column becomes one Arrow array.
+        arrays = [pa.array(col, type=field.type) for col, field in zip(zip(*rows), schema)]
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def iter_csv_chunks(indices: Optional[List[str]] = None, **filters) -> Iterator[str]:
+    """Yield CSV text: the header, then one chunk per batch of rows."""
+    columns = export_columns(indices)
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    for rows in _iter_row_batches(columns, **filters):
+        writer.writerows(rows)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()   # header only: no rows matched
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes back to a generator."""
+
+    def __init__(self):
+        self.chunks = []
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _open_writer(fmt: str, sink, schema):
+    pa = _pyarrow()
+    if fmt == "arrow":
+        return pa.ipc.new_stream(sink, schema)
+    if fmt == "parquet":
+        return pa.parquet.ParquetWriter(sink, schema, compression="zstd")
+    raise ValueError(f"format must be one of: {', '.join(FORMATS)}")
+
+
+def _check_filters(fmt: str, filters: dict) -> None:
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(FORMATS)}")
+    if fmt != "csv":
+        _pyarrow()
+    for key in ("start_date", "end_date"):
+        if filters.get(key):
+            date_type.fromisoformat(filters[key])
+    export_columns(filters.get("indices"))
+
+
+def stream_export(fmt: str, **filters) -> Iterator[bytes]:
+    """Encode the export as *fmt*, yielding bytes chunk by chunk (one per batch).
+
+    Arguments are validated before the first chunk is produced, so callers
+    can report bad filters before a streaming response has started.
+    """
+    _check_filters(fmt, filters)
+
+    def _csv():
+        for text in iter_csv_chunks(**filters):
+            yield text.encode("utf-8")
+
+    def _columnar():
+        pa = _pyarrow()
+        sink = _ChunkSink()
+        schema = export_schema(export_columns(filters.get("indices")))
+        writer = _open_writer(fmt, pa.PythonFile(sink, mode="w"), schema)
+        for batch in iter_record_batches(**filters):
+            writer.write_batch(batch)
+            data = sink.drain()
+            if data:
+                yield data
+        writer.close()
+        yield sink.drain()
+
+    return _csv() if fmt == "csv" else _columnar()
+
+
+def export_to_file(path: str, fmt: Optional[str] = None, **filters) -> None:
+    """Write the export to *path* (format from the extension unless *fmt* is given)."""
+    fmt = fmt or os.path.splitext(path)[1].lstrip(".").lower()
+    with open(path, "wb") as fh:
+        for chunk in stream_export(fmt, **filters):
+            fh.write(chunk)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Export stored measurements as CSV, Arrow IPC or Parquet.")
+    parser.add_argument("--out", required=True, help="Output file (.csv, .arrow or .parquet)")
+    parser.add_argument("--format", choices=list(FORMATS), help="Default: from the file extension")
+    parser.add_argument("--field-ids", type=int, nargs="+")
+    parser.add_argument("--start", help="Start date YYYY-MM-DD (inclusive)")
+    parser.add_argument("--end", help="End date YYYY-MM-DD (inclusive)")
+    parser.add_argument("--sensor")
+    parser.add_argument("--indices", nargs="+")
+    args = parser.parse_args(argv)
+
+    export_to_file(args.out, args.format, field_ids=args.field_ids, start_date=args.start,
+                   end_date=args.end, sensor=args.sensor, indices=args.indices)
+    print(f"Exported to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
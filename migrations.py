@@ -0,0 +1,135 @@
+"""
+Versioned schema migrations for the measurements database.
+
+Each step in MIGRATIONS runs once; applied versions are recorded in a
+`schema_migrations` ledger table next to the measurements table.  On
+startup `run_migrations()` reads the highest applied version with one
+query and returns immediately when it is current, so a cold start does
+no table inspection, ALTERs or backfills and does not grow with table
+size.
+
+When steps are pending they all run in one transaction that holds a
+lock, so concurrent workers starting together do not race:
+
+  postgresql  pg_advisory_xact_lock (released on commit / rollback)
+  sqlite      BEGIN IMMEDIATE (the write lock).  A worker that gives up
+              after busy_timeout with "database is locked" retries until
+              MIGRATION_LOCK_TIMEOUT_S, since the holder may be running a
+              long backfill.
+
+Under the lock the ledger is read again and only steps still missing are
+applied.  Add new steps by appending to MIGRATIONS with the next version
+number; never renumber or edit an applied step.
+"""
+
+import logging
+import os
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, exc, func, select, text
+
+import database
+import models
+import rollups
+
+log = logging.getLogger(__name__)
+
+# Arbitrary constant shared by every worker for the Postgres advisory lock.
+_ADVISORY_LOCK_KEY = 7_204_311_983
+MIGRATION_LOCK_TIMEOUT_S = float(os.getenv("MIGRATION_LOCK_TIMEOUT_S", "600"))
+_LOCK_RETRY_S = 1.0
+
+
+def _create_tables(connection) -> None:
+    models.Base.metadata.create_all(bind=connection)
+
+
+def _create_rollups(connection) -> None:
+    models.MeasurementRollup.__table__.create(connection, checkfirst=True)
+    rollups.rebuild(connection)
+
+
+# (version, name, step(connection)).  Versions 1-4 are the startup steps
+# main.py used to run on every import; existing databases apply them once.
+MIGRATIONS = [
+    (1, "create tables", _create_tables),
+    (2, "add optional measurement columns and backfill", database.ensure_measurements_schema),
+    (3, "drop legacy date column", database.migrate_measurements_drop_legacy_date),
+    (4, "history index (field_id, captured_at, id)", database.ensure_history_index),
+    (5, "weekly / monthly rollups (backfilled from measurements)", _create_rollups),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+_ledger = Table(
+    "schema_migrations",
+    MetaData(schema=database._active_schema()),
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def current_version(connection) -> int:
+    """Highest applied version; raises when the ledger table does not exist yet."""
+    return connection.execute(select(func.max(_ledger.c.version))).scalar() or 0
+
+
+def _lock(connection) -> None:
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+    elif dialect == "sqlite":
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def _is_locked(error: exc.OperationalError) -> bool:
+    return "database is locked" in str(error.orig)
+
+
+def _apply_pending(connection) -> int:
+    """Take the lock, re-read the ledger and apply the missing steps in one transaction."""
+    _lock(connection)
+    _ledger.create(connection, checkfirst=True)
+    done = current_version(connection)
+    applied = 0
+    for version, name, step in MIGRATIONS:
+        if version <= done:
+            continue
+        log.info("Applying schema migration %d: %s", version, name)
+        step(connection)
+        connection.execute(_ledger.insert().values(
+            version=version, name=name, applied_at=datetime.now(timezone.utc).replace(tzinfo=None),
+        ))
+        applied += 1
+    connection.commit()
+    return applied
+
+
+def run_migrations() -> int:
+    """Apply pending migrations; returns how many steps ran."""
+    if not database.DATABASE_ENABLED or database.engine is None:
+        return 0
+
+    try:
+        with database.engine.connect() as connection:
+            if current_version(connection) >= LATEST_VERSION:
+                return 0
+    except exc.DBAPIError:
+        pass   # no ledger yet: fresh database or one created before versioning
+
+    deadline = time.monotonic() + MIGRATION_LOCK_TIMEOUT_S
+    while True:
+        try:
+            with database.engine.connect() as connection:
+                applied = _apply_pending(connection)
+            break
+        except exc.OperationalError as error:
+            # SQLite: another worker holds the write lock (the transaction was rolled back).
+            if not _is_locked(error) or time.monotonic() >= deadline:
+                raise
+            log.info("Schema migrations are locked by another worker; waiting.")
+            time.sleep(_LOCK_RETRY_S)
+    if applied:
+        log.info("Schema is at version %d (%d migration(s) applied).", LATEST_VERSION, applied)
+    return applied
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, BigInteger, String, Float, Date, DateTime, UniqueConstraint, func, text
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Date, DateTime, JSON, Index, UniqueConstraint, func, text
 import database
 from database import Base
 
@@ -33,9 +33,32 @@ class Measurement(Base):
     tvdi = Column(Float, nullable=True)
     tci = Column(Float, nullable=True)
     vhi = Column(Float, nullable=True)
+
+    # --- Within-field distribution: {index: {std_dev, p10, p50, p90, count[, histogram]}} ---
+    spatial_stats = Column(JSON(none_as_null=True), nullable=True)
     
     _schema = database._active_schema()
     __table_args__ = (
         UniqueConstraint('field_id', 'captured_at', 'sensor', name='_field_captured_sensor_uc'),
+        # /history: range scans and keyset pagination on (captured_at, id) per field.
+        Index('ix_vegetation_indices_field_captured', 'field_id', 'captured_at', 'id'),
         {"schema": _schema} if _schema else {},
-    )
\ No newline at end of file
+    )
+
+class MeasurementRollup(Base):
+    """Weekly / monthly aggregates of Measurement index values (see rollups.py)."""
+    __tablename__ = "vegetation_index_rollups"
+
+    # Primary key order serves GET /api/rollups: fields → period → index → sensor → time.
+    field_id = Column(BigInteger, primary_key=True)
+    period = Column(String, primary_key=True)            # "week" (ISO, Monday start) or "month"
+    index_name = Column(String, primary_key=True)
+    sensor = Column(String, primary_key=True)
+    period_start = Column(Date, primary_key=True)
+    mean = Column(Float, nullable=False)
+    min = Column(Float, nullable=False)
+    max = Column(Float, nullable=False)
+    count = Column(Integer, nullable=False)
+
+    _schema = database._active_schema()
+    __table_args__ = ({"schema": _schema} if _schema else {},)
@@ -0,0 +1,215 @@
+"""
+Local raster cache for the pixel inspector.
+
+Index rasters for an AOI are fetched from GEE once per (AOI, date, sensor)
+as compact float32 arrays on a fixed UTM grid at the sensor's native
+scale.  Pixel-inspector clicks are then answered by an array lookup of
+the grid cell under the click instead of a reduceRegion round trip.
+
+Grid handling:
+  The grid is defined in the UTM zone of the AOI centroid (WGS-84 /
+  UTM, EPSG:326xx north, EPSG:327xx south) with its origin snapped to a
+  multiple of the pixel size, which is how Sentinel-2 and Landsat tiles
+  lay out their pixels.  Coordinates are converted with pyproj, exactly
+  like uldk.py does for the Polish national grid.
+"""
+
+import hashlib
+import json
+import math
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+from pyproj import Transformer
+import shapely
+from shapely.geometry import shape
+from shapely.ops import transform as transform_geom
+
+# Rasters larger than this are not cached; callers fall back to GEE point queries.
+MAX_RASTER_PIXELS = 250_000
+MAX_CACHE_ENTRIES = int(os.getenv("PIXEL_CACHE_MAX_ENTRIES", "64"))
+MAX_CACHE_BYTES = int(os.getenv("PIXEL_CACHE_MAX_MB", "128")) * 1024 * 1024
+
+_transformers: Dict[str, Transformer] = {}
+_transformers_lock = threading.Lock()
+
+
+def geometry_key(geojson: dict) -> str:
+    """Stable short hash of a GeoJSON geometry (key order independent)."""
+    raw = json.dumps(geojson, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _utm_crs_for(lng: float, lat: float) -> str:
+    zone = int((lng + 180.0) // 6.0) % 60 + 1
+    return f"EPSG:{(32600 if lat >= 0 else 32700) + zone}"
+
+
+def _to_grid_crs(crs: str) -> Transformer:
+    with _transformers_lock:
+        tr = _transformers.get(crs)
+        if tr is None:
+            # always_xy=True  ⇒  (longitude, latitude) in, (easting, northing) out
+            tr = Transformer.from_crs("EPSG:4326", crs, always_xy=True)
+            _transformers[crs] = tr
+        return tr
+
+
+def _from_grid_crs(crs: str) -> Transformer:
+    key = "inverse:" + crs
+    with _transformers_lock:
+        tr = _transformers.get(key)
+        if tr is None:
+            tr = Transformer.from_crs(crs, "EPSG:4326", always_xy=True)
+            _transformers[key] = tr
+        return tr
+
+
+def grid_for_aoi(geojson: dict, scale: int) -> Optional[dict]:
+    """Return a pixel grid covering *geojson* at *scale* metres.
+
+    {"crs", "scale", "x0", "y0", "width", "height"} where (x0, y0) is the
+    upper-left corner.  Returns None when the AOI exceeds MAX_RASTER_PIXELS.
+    """
+    geom = shape(geojson)
+    centroid = geom.centroid
+    crs = _utm_crs_for(centroid.x, centroid.y)
+    tr = _to_grid_crs(crs)
+
+    min_lng, min_lat, max_lng, max_lat = geom.bounds
+    xs, ys = tr.transform(
+        [min_lng, min_lng, max_lng, max_lng],
+        [min_lat, max_lat, min_lat, max_lat],
+    )
+    x0 = math.floor(min(xs) / scale) * scale
+    y0 = math.ceil(max(ys) / scale) * scale
+    width = max(1, math.ceil((max(xs) - x0) / scale))
+    height = max(1, math.ceil((y0 - min(ys)) / scale))
+    if width * height > MAX_RASTER_PIXELS:
+        return None
+    return {"crs": crs, "scale": scale, "x0": x0, "y0": y0, "width": width, "height": height}
+
+
+def grid_cell(geojson: dict, lat: float, lng: float, scale: int) -> dict:
+    """Native grid cell under lat/lng on the AOI's grid at *scale* metres.
+
+    {"id", "ring"}: the id is "<crs>/<scale>/<col>/<row>" in grid-origin
+    units, so it is the same for every AOI in the UTM zone; the ring holds
+    the cell corners as [lat, lng] pairs so a client can tell which clicks
+    fall in the same cell.
+    """
+    centroid = shape(geojson).centroid
+    crs = _utm_crs_for(centroid.x, centroid.y)
+    x, y = _to_grid_crs(crs).transform(lng, lat)
+    col = math.floor(x / scale)
+    row = math.floor(y / scale)
+    xs = [col * scale, (col + 1) * scale, (col + 1) * scale, col * scale]
+    ys = [row * scale, row * scale, (row + 1) * scale, (row + 1) * scale]
+    lngs, lats = _from_grid_crs(crs).transform(xs, ys)
+    return {
+        "id": f"{crs}/{scale}/{col}/{row}",
+        "ring": [[round(a, 8), round(o, 8)] for a, o in zip(lats, lngs)],
+    }
+
+
+def aoi_mask(geojson: dict, grid: dict) -> np.ndarray:
+    """Boolean (height, width) mask of grid cells whose centre lies in the AOI."""
+    tr = _to_grid_crs(grid["crs"])
+    geom = transform_geom(tr.transform, shape(geojson))
+    half = grid["scale"] / 2.0
+    xs = grid["x0"] + half + grid["scale"] * np.arange(grid["width"])
+    ys = grid["y0"] - half - grid["scale"] * np.arange(grid["height"])
+    xx, yy = np.meshgrid(xs, ys)
+    return shapely.contains_xy(geom, xx, yy)
+
+
+def ee_grid(grid: dict) -> dict:
+    """Translate a grid dict into the `grid` argument of ee.data.computePixels."""
+    return {
+        "dimensions": {"width": grid["width"], "height": grid["height"]},
+        "affineTransform": {
+            "scaleX": grid["scale"], "shearX": 0, "translateX": grid["x0"],
+            "shearY": 0, "scaleY": -grid["scale"], "translateY": grid["y0"],
+        },
+        "crsCode": grid["crs"],
+    }
+
+
+class PixelRaster:
+    """Band stack (bands × rows × cols, float32, NaN = masked) on a UTM grid."""
+
+    __slots__ = ("bands", "data", "grid", "_band_pos")
+
+    def __init__(self, bands: list, data: np.ndarray, grid: dict):
+        self.bands = list(bands)
+        self.data = data
+        self.grid = grid
+        self._band_pos = {b: i for i, b in enumerate(self.bands)}
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.data.nbytes)
+
+    def has_bands(self, bands) -> bool:
+        return all(b in self._band_pos for b in bands)
+
+    def cell(self, lat: float, lng: float) -> Optional[tuple]:
+        """Return (row, col) of the native grid cell containing lat/lng."""
+        g = self.grid
+        x, y = _to_grid_crs(g["crs"]).transform(lng, lat)
+        col = int(math.floor((x - g["x0"]) / g["scale"]))
+        row = int(math.floor((g["y0"] - y) / g["scale"]))
+        if 0 <= row < g["height"] and 0 <= col < g["width"]:
+            return row, col
+        return None
+
+    def lookup(self, lat: float, lng: float, bands) -> Dict[str, float]:
+        """Values of *bands* at lat/lng; masked or out-of-grid bands are omitted."""
+        rc = self.cell(lat, lng)
+        if rc is None:
+            return {}
+        row, col = rc
+        out = {}
+        for b in bands:
+            v = float(self.data[self._band_pos[b], row, col])
+            if not math.isnan(v):
+                out[b] = v
+        return out
+
+
+class PixelRasterCache:
+    """Thread-safe LRU of PixelRaster objects bounded by entry count and bytes."""
+
+    def __init__(self, max_entries: int = MAX_CACHE_ENTRIES, max_bytes: int = MAX_CACHE_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[tuple, PixelRaster]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[PixelRaster]:
+        with self._lock:
+            raster = self._items.get(key)
+            if raster is not None:
+                self._items.move_to_end(key)
+            return raster
+
+    def put(self, key: tuple, raster: PixelRaster) -> None:
+        if raster.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._items[key] = raster
+            self._bytes += raster.nbytes
+            while self._items and (len(self._items) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._items), "bytes": self._bytes}
@@ -0,0 +1,216 @@
+"""
+Weekly / monthly rollups of stored index values for long-range charts.
+
+models.MeasurementRollup holds one row per
+(field, sensor, index, period, period_start) with mean / min / max /
+count, where period is "week" (ISO week, starting Monday) or "month".
+
+Maintenance:
+  services.save_results_to_db calls `refresh()` for the field, sensors
+  and date span it just upserted.  The affected buckets are recomputed
+  from the raw rows (a range read on the (field_id, captured_at) index)
+  and replaced, so values that an upsert overwrites are never counted
+  twice.  A result touches a few dozen buckets at most.
+
+Reads:
+  `query_rollups()` / `query_rollups_async()` serve GET /api/rollups
+  straight from the primary key (field_id, period, index_name, sensor,
+  period_start), so multi-year views across many fields never touch the
+  raw table.
+"""
+
+from datetime import date as date_type, timedelta
+from itertools import groupby
+from typing import Iterable, List, Optional
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import index_registry
+import models
+
+PERIODS = ("week", "month")
+ROLLUP_MAX_ROWS = 100000
+
+_INDEX_COLUMNS = {d.name: d.name.lower() for d in index_registry.INDICES}
+_COLUMN_INDEX = {column: name for name, column in _INDEX_COLUMNS.items()}
+_RESULT_COLUMNS = ("field_id", "sensor", "index_name", "period", "period_start",
+                   "mean", "min", "max", "count")
+
+
+def period_start(day: date_type, period: str) -> date_type:
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def _period_end(start: date_type, period: str) -> date_type:
+    """Last day of the bucket that begins on *start*."""
+    if period == "week":
+        return start + timedelta(days=6)
+    next_month = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return next_month - timedelta(days=1)
+
+
+def period_label(start: date_type, period: str) -> str:
+    if period == "week":
+        year, week, _ = start.isocalendar()
+        return f"{year}-W{week:02d}"
+    return start.strftime("%Y-%m")
+
+
+def _aggregate(rows: Iterable, columns: List[str], periods=PERIODS) -> dict:
+    """{(sensor, index, period, period_start): [count, sum, min, max]} over raw rows."""
+    acc = {}
+    for captured_at, sensor, *values in rows:
+        starts = [(p, period_start(captured_at, p)) for p in periods]
+        for column, value in zip(columns, values):
+            if value is None:
+                continue
+            for period, start in starts:
+                key = (sensor, column, period, start)
+                slot = acc.get(key)
+                if slot is None:
+                    acc[key] = [1, value, value, value]
+                else:
+                    slot[0] += 1
+                    slot[1] += value
+                    slot[2] = min(slot[2], value)
+                    slot[3] = max(slot[3], value)
+    return acc
+
+
+def _records(field_id: int, acc: dict) -> list:
+    """Rollup rows for one field from an _aggregate() result."""
+    return [
+        {
+            "field_id": field_id, "sensor": sensor, "index_name": _COLUMN_INDEX[column],
+            "period": period, "period_start": bucket,
+            "mean": total / count, "min": lo, "max": hi, "count": count,
+        }
+        for (sensor, column, period, bucket), (count, total, lo, hi) in acc.items()
+    ]
+
+
+def refresh(db, field_id: int, sensors: Iterable[str], start: date_type, end: date_type) -> int:
+    """Recompute every week and month bucket of *field_id* overlapping [start, end].
+
+    *db* is a Session or Connection; the caller commits.  Returns the
+    number of rollup rows written.
+    """
+    measurements = models.Measurement.__table__
+    table = models.MeasurementRollup.__table__
+    sensors = sorted(set(sensors))
+    columns = list(_INDEX_COLUMNS.values())
+    # Per period, the span is widened to whole buckets so each one is rebuilt complete.
+    spans = {p: (period_start(start, p), _period_end(period_start(end, p), p)) for p in PERIODS}
+
+    rows = db.execute(
+        select(measurements.c.captured_at, measurements.c.sensor,
+               *(measurements.c[c] for c in columns))
+        .where(measurements.c.field_id == field_id,
+               measurements.c.sensor.in_(sensors),
+               measurements.c.captured_at.between(min(s for s, _ in spans.values()),
+                                                  max(e for _, e in spans.values())))
+    ).all()
+
+    records = []
+    for period, (span_start, span_end) in spans.items():
+        db.execute(
+            delete(table).where(table.c.field_id == field_id,
+                                table.c.sensor.in_(sensors),
+                                table.c.period == period,
+                                table.c.period_start.between(span_start, span_end))
+        )
+        in_span = (r for r in rows if span_start <= r[0] <= span_end)
+        records.extend(_records(field_id, _aggregate(in_span, columns, (period,))))
+    if records:
+        db.execute(insert(table), records)
+    return len(records)
+
+
+def rebuild(connection, chunk_rows: int = 10000) -> int:
+    """Recompute all rollups from the raw table in one ordered pass (schema migration)."""
+    measurements = models.Measurement.__table__
+    table = models.MeasurementRollup.__table__
+    columns = list(_INDEX_COLUMNS.values())
+    connection.execute(delete(table))
+
+    # Streamed in chunk_rows batches (a server-side cursor on PostgreSQL); the
+    # options go on the select only, not on the connection the inserts use.
+    result = connection.execute(
+        select(measurements.c.field_id, measurements.c.captured_at, measurements.c.sensor,
+               *(measurements.c[c] for c in columns))
+        .where(measurements.c.captured_at.isnot(None))
+        .order_by(measurements.c.field_id)
+        .execution_options(stream_results=True, yield_per=chunk_rows)
+    )
+    written, pending = 0, []
+    for field_id, rows in groupby(result, key=lambda r: r[0]):
+        pending.extend(_records(field_id, _aggregate((r[1:] for r in rows), columns)))
+        if len(pending) >= chunk_rows:
+            connection.execute(insert(table), pending)
+            written += len(pending)
+            pending = []
+    if pending:
+        connection.execute(insert(table), pending)
+        written += len(pending)
+    return written
+
+
+# ---- reads -----------------------------------------------------------------
+
+def _rollup_statement(field_ids: List[int], period: str, indices: Optional[List[str]],
+                      start_date: Optional[str], end_date: Optional[str], sensor: Optional[str]):
+    if period not in PERIODS:
+        raise ValueError(f"period must be one of: {', '.join(PERIODS)}")
+    if not field_ids:
+        raise ValueError("At least one field_id is required.")
+    if indices:
+        unknown = [i for i in indices if i not in _INDEX_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown indices: {', '.join(unknown)}")
+    table = models.MeasurementRollup.__table__
+    stmt = (select(*(table.c[c] for c in _RESULT_COLUMNS))
+            .where(table.c.field_id.in_(field_ids), table.c.period == period)
+            .order_by(table.c.field_id, table.c.index_name, table.c.sensor, table.c.period_start)
+            .limit(ROLLUP_MAX_ROWS + 1))
+    if indices:
+        stmt = stmt.where(table.c.index_name.in_(indices))
+    if start_date:
+        stmt = stmt.where(table.c.period_start >= period_start(date_type.fromisoformat(start_date), period))
+    if end_date:
+        stmt = stmt.where(table.c.period_start <= date_type.fromisoformat(end_date))
+    if sensor:
+        stmt = stmt.where(table.c.sensor == sensor)
+    return stmt
+
+
+def _rollup_payload(rows: list, period: str) -> list:
+    if len(rows) > ROLLUP_MAX_ROWS:
+        raise ValueError(f"More than {ROLLUP_MAX_ROWS} rollup rows match; narrow the fields, "
+                         "indices or date range.")
+    payload = []
+    for row in rows:
+        item = dict(zip(_RESULT_COLUMNS, row))
+        item["label"] = period_label(row.period_start, period)
+        item["period_start"] = row.period_start.isoformat()
+        item["mean"] = round(row.mean, 4)
+        payload.append(item)
+    return payload
+
+
+def query_rollups(db, field_ids: List[int], period: str = "week", indices: Optional[List[str]] = None,
+                  start_date: Optional[str] = None, end_date: Optional[str] = None,
+                  sensor: Optional[str] = None) -> list:
+    """Rollup rows for *field_ids*, ordered by field, index, sensor and period."""
+    stmt = _rollup_statement(field_ids, period, indices, start_date, end_date, sensor)
+    return _rollup_payload(db.execute(stmt).all(), period)
+
+
+async def query_rollups_async(db: AsyncSession, field_ids: List[int], period: str = "week",
+                              indices: Optional[List[str]] = None, start_date: Optional[str] = None,
+                              end_date: Optional[str] = None, sensor: Optional[str] = None) -> list:
+    """query_rollups on an AsyncSession."""
+    stmt = _rollup_statement(field_ids, period, indices, start_date, end_date, sensor)
+    return _rollup_payload((await db.execute(stmt)).all(), period)
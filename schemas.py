@@ -10,11 +10,28 @@ class AnalysisRequest(BaseModel):
                           "LST", "VSWI", "TVDI", "TCI", "VHI"]
     cloud_cover: int = 20
     sensor: Optional[str] = None   # "Sentinel-2" or "Landsat 8/9" (used for RGB routing)
+    histogram_bins: int = 0        # >0 adds a fixed-bin per-date histogram (max 100 bins)
+
+class IndexHistogram(BaseModel):
+    """Fixed-bin pixel histogram over [min, max] (the index's visualisation range)."""
+    min: float
+    max: float
+    counts: List[int]
+
+class SpatialStats(BaseModel):
+    """Within-field distribution of one index on one date."""
+    std_dev: Optional[float] = None
+    p10: Optional[float] = None
+    p50: Optional[float] = None
+    p90: Optional[float] = None
+    count: int = 0                 # valid (unmasked) pixels
+    histogram: Optional[IndexHistogram] = None
 
 class TimeseriesPoint(BaseModel):
     date: str
     sensor: str = ""
     values: Dict[str, float]
+    spatial: Dict[str, SpatialStats] = {}
 
 class IndexStats(BaseModel):
     """Rich statistics for a single index across the analysis period."""
@@ -44,6 +61,8 @@ class FieldConditionResponse(BaseModel):
     damaged_area_pct: float
     drivers: List[FieldConditionDriver] = []
     index_breakdown: Dict[str, Dict[str, float]] = {}
+    # Share of AOI pixels per INDEX_THRESHOLDS class, e.g. {"NDVI": {"critical": 0.1, ...}}
+    damage_classes: Dict[str, Dict[str, float]] = {}
 
 class BiomassResponse(BaseModel):
     metadata: Dict[str, str]
@@ -52,6 +71,37 @@ class BiomassResponse(BaseModel):
     field_condition: Optional[FieldConditionResponse] = None
     timeseries: List[TimeseriesPoint]
 
+class BatchAnalysisRequest(BaseModel):
+    """Analyse many parcels in one pass.
+
+    `fields` is a GeoJSON FeatureCollection of Polygon / MultiPolygon
+    parcels; ids come from the feature `id` or properties `field_id` /
+    `id` / `name`.
+    """
+    fields: dict
+    start_date: str
+    end_date: str
+    indices: List[str] = ["NDVI", "NDRE", "GNDVI", "EVI", "SAVI", "CIre", "MTCI", "IRECI", "NDMI", "NMDI",
+                          "LST", "VSWI", "TVDI", "TCI", "VHI"]
+    cloud_cover: int = 20
+
+class BatchAnalysisResponse(BaseModel):
+    fields: Dict[str, BiomassResponse]
+    elapsed_ms: int
+
+class JobProgress(BaseModel):
+    done: int = 0                  # dates processed
+    total: int = 0                 # dates discovered (0 until known)
+
+class JobStatus(BaseModel):
+    job_id: str
+    kind: str
+    status: str                    # queued | running | done | failed | cancelled
+    progress: JobProgress
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
+
 class MapResponse(BaseModel):
     layer_url: str
     index_name: str
@@ -92,8 +142,71 @@ class PixelQueryRequest(BaseModel):
     end_date: Optional[str] = None
 
 
+class PixelCell(BaseModel):
+    id: str
+    ring: List[List[float]]
+
+
 class PixelQueryResponse(BaseModel):
     lat: float
     lng: float
     date: str
-    values: Dict[str, Optional[float]]
\ No newline at end of file
+    values: Dict[str, Optional[float]]
+    cell: Optional[PixelCell] = None
+
+class PixelBatchPoint(BaseModel):
+    lat: float
+    lng: float
+    id: Optional[str] = None
+
+
+class PixelBatchRequest(BaseModel):
+    """Sample index values at many points for one or more dates.
+
+    Points are given either as `points` or as a GeoJSON `points_geojson`
+    (Point, MultiPoint, Feature or FeatureCollection).
+    """
+    dates: List[str]
+    sensor: str                    # "Sentinel-2" or "Landsat 8/9"
+    indices: List[str]
+    geojson: dict                  # AOI the composite is clipped to
+    points: Optional[List[PixelBatchPoint]] = None
+    points_geojson: Optional[dict] = None
+    cloud_cover: int = 20
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    format: str = "json"           # "json" or "csv"
+
+
+class PixelBatchSample(BaseModel):
+    point_id: str
+    lat: float
+    lng: float
+    date: str
+    values: Dict[str, Optional[float]]
+
+
+class PixelBatchResponse(BaseModel):
+    sensor: str
+    dates: List[str]
+    point_count: int
+    samples: List[PixelBatchSample]
+    elapsed_ms: int
+
+
+class ZonalStatsRequest(BaseModel):
+    """Per-zone index means inside a parcel for one or more dates.
+
+    Zones are either a regular grid (`grid_size_m`, default 20 m) or
+    uploaded management-zone polygons (`zones_geojson`: Polygon,
+    MultiPolygon, Feature or FeatureCollection).
+    """
+    dates: List[str]
+    sensor: str                    # "Sentinel-2" or "Landsat 8/9"
+    indices: List[str]
+    geojson: dict                  # parcel AOI
+    field_id: Optional[str] = None
+    grid_size_m: Optional[float] = None
+    zones_geojson: Optional[dict] = None
+    cloud_cover: int = 20
+    format: str = "geojson"        # "geojson" or "columnar"
@@ -1,14 +1,26 @@
 import ee
-import statistics
+import csv
+import io
 import json
 from datetime import date as date_type
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Dict, Optional
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Optional
 from schemas import AnalysisRequest, BiomassResponse
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from google.oauth2 import service_account
+import numpy as np
+import band_store
+import index_engine
+import index_registry
 import models
+import pixel_cache
+import rollups
+import zones
+from timeseries import TimeSeries
 import os
+import threading
 import time
 import logging
 from dotenv import load_dotenv
@@ -20,35 +32,12 @@ load_dotenv()
 MY_PROJECT_ID = os.getenv('GEE_PROJECT_ID')
 
 # ---------------------------------------------------------------------------
-# Index classification
+# Index classification  (single source of truth: index_registry.py)
 # ---------------------------------------------------------------------------
-S2_INDICES = {'NDVI', 'NDRE', 'GNDVI', 'EVI', 'SAVI', 'CIre', 'MTCI', 'IRECI', 'NDMI', 'NMDI'}
-LANDSAT_INDICES = {'LST', 'VSWI', 'TVDI', 'TCI', 'VHI'}
-
-INDEX_THRESHOLDS = {
-    "NDVI": {"dir": "higher", "cutoffs": [0.70, 0.50, 0.30, 0.10]},
-    "NDRE": {"dir": "higher", "cutoffs": [0.50, 0.30, 0.20, 0.10]},
-    "GNDVI": {"dir": "higher", "cutoffs": [0.60, 0.40, 0.30, 0.15]},
-    "EVI": {"dir": "higher", "cutoffs": [0.60, 0.40, 0.20, 0.10]},
-    "SAVI": {"dir": "higher", "cutoffs": [0.60, 0.40, 0.20, 0.10]},
-    "CIre": {"dir": "higher", "cutoffs": [6.0, 4.0, 2.0, 1.0]},
-    "MTCI": {"dir": "higher", "cutoffs": [4.0, 3.0, 2.0, 1.0]},
-    "IRECI": {"dir": "higher", "cutoffs": [2.0, 1.5, 0.8, 0.3]},
-    "NDMI": {"dir": "higher", "cutoffs": [0.30, 0.10, 0.00, -0.20]},
-    "NMDI": {"dir": "higher", "cutoffs": [0.70, 0.50, 0.30, 0.10]},
-    "LST": {"dir": "lower", "cutoffs": [25.0, 30.0, 35.0, 40.0]},
-    "VSWI": {"dir": "higher", "cutoffs": [0.04, 0.03, 0.02, 0.01]},
-    "TVDI": {"dir": "lower", "cutoffs": [0.30, 0.50, 0.70, 0.85]},
-    "TCI": {"dir": "higher", "cutoffs": [80.0, 60.0, 40.0, 20.0]},
-    "VHI": {"dir": "higher", "cutoffs": [60.0, 40.0, 30.0, 20.0]},
-}
-
-CONDITION_GROUPS = {
-    "vigor": {"weight": 0.40, "indices": ["NDVI", "NDRE", "GNDVI", "EVI", "SAVI", "CIre", "MTCI", "IRECI"]},
-    "moisture": {"weight": 0.30, "indices": ["NDMI", "NMDI", "VSWI", "TVDI"]},
-    "heat": {"weight": 0.20, "indices": ["LST", "TCI"]},
-    "overall": {"weight": 0.10, "indices": ["VHI"]},
-}
+S2_INDICES = index_registry.S2_INDICES
+LANDSAT_INDICES = index_registry.LANDSAT_INDICES
+INDEX_THRESHOLDS = index_registry.INDEX_THRESHOLDS
+CONDITION_GROUPS = index_registry.CONDITION_GROUPS
 
 
 def _clamp(value: float, low: float, high: float) -> float:
@@ -261,160 +250,148 @@ def _apply_landsat_scale(image):
 #  Per-date processing helpers (called from thread pool)
 # ===========================================================================
 
-def _process_s2_date(s2_col, date_str, requested_s2, region):
+# Per-date spatial reduction: one combined reducer gives the mean used by the
+# time series plus the within-field distribution, in the same getInfo().
+MAX_HISTOGRAM_BINS = 100
+
+
+def _date_stats_reducer():
+    return (ee.Reducer.mean()
+            .combine(ee.Reducer.stdDev(), sharedInputs=True)
+            .combine(ee.Reducer.percentile([10, 50, 90]), sharedInputs=True)
+            .combine(ee.Reducer.count(), sharedInputs=True))
+
+
+def _reduce_date_stats(index_imgs: dict, clear_band, region, scale: int,
+                       histogram_bins: int = 0) -> Optional[dict]:
+    """Reduce one date's index bands over *region* in a single round trip.
+
+    Returns {"clear_frac", "stats", "histograms"} (raw GEE dictionaries).
+    Histograms use fixed bins spanning each index's visualisation range, so
+    they are comparable across dates and fields.
+    """
+    combined = ee.Image.cat(list(index_imgs.values())).addBands(clear_band)
+    payload = {
+        "stats": combined.reduceRegion(
+            reducer=_date_stats_reducer(), geometry=region, scale=scale, maxPixels=1e9
+        ),
+    }
+    if histogram_bins:
+        payload["histograms"] = ee.Dictionary({
+            idx: img.reduceRegion(
+                reducer=ee.Reducer.fixedHistogram(
+                    index_registry.BY_NAME[idx].vis_min, index_registry.BY_NAME[idx].vis_max,
+                    histogram_bins,
+                ).unweighted(),
+                geometry=region, scale=scale, maxPixels=1e9,
+            ).get(idx)
+            for idx, img in index_imgs.items()
+        })
+    return ee.Dictionary(payload).getInfo()
+
+
+def _parse_date_stats(result: dict, valid: list, histogram_bins: int = 0) -> tuple:
+    """Split a _reduce_date_stats result into (clear_frac, values, spatial)."""
+    stats = result.get("stats") or {}
+    histograms = result.get("histograms") or {}
+    clear_frac = stats.get('clear_frac_mean', 0) or 0
+
+    day_vals, spatial = {}, {}
+    for idx in valid:
+        v = stats.get(f"{idx}_mean")
+        if v is None:
+            continue
+        day_vals[idx] = round(v, 4)
+        entry = {
+            "std_dev": _round_or_none(stats.get(f"{idx}_stdDev")),
+            "p10": _round_or_none(stats.get(f"{idx}_p10")),
+            "p50": _round_or_none(stats.get(f"{idx}_p50")),
+            "p90": _round_or_none(stats.get(f"{idx}_p90")),
+            "count": int(stats.get(f"{idx}_count") or 0),
+        }
+        hist = histograms.get(idx)
+        if histogram_bins and hist:
+            defn = index_registry.BY_NAME[idx]
+            entry["histogram"] = {
+                "min": defn.vis_min, "max": defn.vis_max,
+                "counts": [int(round(count)) for _, count in hist],
+            }
+        spatial[idx] = entry
+    return clear_frac, day_vals, spatial
+
+
+def _round_or_none(value, digits: int = 4) -> Optional[float]:
+    value = _safe_float(value)
+    return None if value is None else round(value, digits)
+
+
+def _process_s2_date(s2_col, date_str, requested_s2, region, histogram_bins=0):
     """Process a single Sentinel-2 date: mosaic → indices → stats.
 
-    Returns dict {"date", "sensor", "values"} or None if cloudy/empty.
-    Uses a SINGLE getInfo() call per date (combined clear-check + stats).
+    Returns dict {"date", "sensor", "values", "spatial"} or None if
+    cloudy/empty.  Uses a SINGLE getInfo() call per date (combined
+    clear-check + mean + within-field distribution).
     """
     day_start = ee.Date(date_str)
     day_end = day_start.advance(1, 'day')
     dm = s2_col.filterDate(day_start, day_end).mosaic()
 
-    imgs, valid = [], []
-
-    if 'NDVI' in requested_s2:
-        imgs.append(dm.normalizedDifference(['B8', 'B4']).rename('NDVI')); valid.append('NDVI')
-    if 'NDRE' in requested_s2:
-        imgs.append(dm.normalizedDifference(['B8', 'B5']).rename('NDRE')); valid.append('NDRE')
-    if 'GNDVI' in requested_s2:
-        imgs.append(dm.normalizedDifference(['B8', 'B3']).rename('GNDVI')); valid.append('GNDVI')
-    if 'EVI' in requested_s2:
-        imgs.append(dm.expression(
-            '2.5 * ((NIR - RED) / (NIR + 6 * RED - 7.5 * BLUE + 10000))',
-            {'NIR': dm.select('B8'), 'RED': dm.select('B4'), 'BLUE': dm.select('B2')}
-        ).rename('EVI')); valid.append('EVI')
-    if 'SAVI' in requested_s2:
-        imgs.append(dm.expression(
-            '((NIR - RED) / (NIR + RED + 5000)) * 1.5',
-            {'NIR': dm.select('B8'), 'RED': dm.select('B4')}
-        ).rename('SAVI')); valid.append('SAVI')
-    if 'CIre' in requested_s2:
-        imgs.append(dm.expression('(RE3 / RE1) - 1',
-            {'RE3': dm.select('B7'), 'RE1': dm.select('B5')}
-        ).rename('CIre')); valid.append('CIre')
-    if 'MTCI' in requested_s2:
-        imgs.append(dm.expression('(RE2 - RE1) / (RE1 - RED)',
-            {'RE2': dm.select('B6'), 'RE1': dm.select('B5'), 'RED': dm.select('B4')}
-        ).rename('MTCI')); valid.append('MTCI')
-    if 'IRECI' in requested_s2:
-        imgs.append(dm.expression('(RE3 - RED) * RE2 / (RE1 * 10000)',
-            {'RE3': dm.select('B7'), 'RED': dm.select('B4'),
-             'RE1': dm.select('B5'), 'RE2': dm.select('B6')}
-        ).rename('IRECI')); valid.append('IRECI')
-    if 'NDMI' in requested_s2:
-        imgs.append(dm.normalizedDifference(['B8', 'B11']).rename('NDMI')); valid.append('NDMI')
-    if 'NMDI' in requested_s2:
-        imgs.append(dm.expression(
-            '(NIR - (SWIR1 - SWIR2)) / (NIR + (SWIR1 - SWIR2))',
-            {'NIR': dm.select('B8'), 'SWIR1': dm.select('B11'), 'SWIR2': dm.select('B12')}
-        ).rename('NMDI')); valid.append('NMDI')
-
-    if not imgs:
+    index_imgs = index_registry.build_s2(dm, requested_s2)
+    if not index_imgs:
         return None
 
     # Add clear-fraction band: mean of binary mask = fraction of clear pixels
     # unmask(0) ensures masked (cloudy) pixels contribute 0 to the average
     clear_band = dm.select('B8').mask().unmask(0).rename('clear_frac')
-    combined = ee.Image.cat(imgs).addBands(clear_band)
 
     try:
-        stats = combined.reduceRegion(
-            reducer=ee.Reducer.mean(), geometry=region, scale=10, maxPixels=1e9
-        ).getInfo()
+        result = _reduce_date_stats(index_imgs, clear_band, region, 10, histogram_bins)
     except Exception as exc:
         log.warning("S2 reduceRegion failed for %s: %s", date_str, exc)
         return None
 
     # Check clear-pixel ratio
-    clear_frac = stats.get('clear_frac', 0) or 0
-    if clear_frac < MIN_CLEAR_RATIO:
+    clear_frac, day_vals, spatial = _parse_date_stats(result, list(index_imgs), histogram_bins)
+    if clear_frac < MIN_CLEAR_RATIO or not day_vals:
         return None
-
-    day_vals = {}
-    for idx in valid:
-        v = stats.get(idx)
-        if v is not None:
-            day_vals[idx] = round(v, 4)
-    return {"date": date_str, "sensor": "Sentinel-2", "values": day_vals} if day_vals else None
+    return {"date": date_str, "sensor": "Sentinel-2", "values": day_vals, "spatial": spatial}
 
 
-def _process_ls_date(ls_col, date_str, requested_landsat, region):
+def _process_ls_date(ls_col, date_str, requested_landsat, region, histogram_bins=0):
     """Process a single Landsat date: mosaic → indices → stats.
 
-    Returns dict {"date", "sensor", "values"} or None if cloudy/empty.
-    Uses a SINGLE getInfo() call per date. The minMax reduceRegion for
-    TVDI/TCI/VHI is kept lazy (ee.Dictionary → ee.Number) and resolved
-    within the same computation graph.
+    Returns dict {"date", "sensor", "values", "spatial"} or None if
+    cloudy/empty.  Uses a SINGLE getInfo() call per date. The minMax
+    reduceRegion for TVDI/TCI/VHI is kept lazy (ee.Dictionary → ee.Number)
+    and resolved within the same computation graph.
     """
     day_start = ee.Date(date_str)
     day_end = day_start.advance(1, 'day')
     dm = ls_col.filterDate(day_start, day_end).mosaic()
 
-    ndvi_l = dm.normalizedDifference(['SR_B5', 'SR_B4']).rename('ndvi_l')
-    lst_c  = dm.select('ST_B10').subtract(273.15).rename('lst_c')
-
-    imgs, valid = [], []
-
-    if 'LST' in requested_landsat:
-        imgs.append(lst_c.rename('LST')); valid.append('LST')
-    if 'VSWI' in requested_landsat:
-        imgs.append(ndvi_l.divide(lst_c).rename('VSWI')); valid.append('VSWI')
-
-    needs_mm = any(i in requested_landsat for i in ('TVDI', 'TCI', 'VHI'))
-    if needs_mm:
-        # Lazy ee.Dictionary — resolved as part of the final getInfo() graph
-        mm = ee.Image.cat([ndvi_l, lst_c]).reduceRegion(
-            reducer=ee.Reducer.minMax(), geometry=region, scale=30, maxPixels=1e9)
-        ndvi_min = ee.Number(mm.get('ndvi_l_min'))
-        ndvi_max = ee.Number(mm.get('ndvi_l_max'))
-        lst_min  = ee.Number(mm.get('lst_c_min'))
-        lst_max  = ee.Number(mm.get('lst_c_max'))
-        ndvi_rng = ndvi_max.subtract(ndvi_min).max(0.001)
-        lst_rng  = lst_max.subtract(lst_min).max(0.001)
-
-        if 'TVDI' in requested_landsat:
-            imgs.append(lst_c.subtract(lst_min).divide(lst_rng).rename('TVDI'))
-            valid.append('TVDI')
-        if 'TCI' in requested_landsat:
-            imgs.append(ee.Image.constant(lst_max).subtract(lst_c)
-                        .divide(lst_rng).multiply(100).rename('TCI'))
-            valid.append('TCI')
-        if 'VHI' in requested_landsat:
-            vci = ndvi_l.subtract(ndvi_min).divide(ndvi_rng).multiply(100)
-            tci = ee.Image.constant(lst_max).subtract(lst_c).divide(lst_rng).multiply(100)
-            imgs.append(vci.multiply(0.5).add(tci.multiply(0.5)).rename('VHI'))
-            valid.append('VHI')
-
-    if not imgs:
+    index_imgs = index_registry.build_landsat(dm, requested_landsat, region)
+    if not index_imgs:
         return None
 
     clear_band = dm.select('SR_B5').mask().unmask(0).rename('clear_frac')
-    combined = ee.Image.cat(imgs).addBands(clear_band)
 
     try:
-        stats = combined.reduceRegion(
-            reducer=ee.Reducer.mean(), geometry=region, scale=30, maxPixels=1e9
-        ).getInfo()
+        result = _reduce_date_stats(index_imgs, clear_band, region, 30, histogram_bins)
     except Exception as exc:
         log.warning("Landsat reduceRegion failed for %s: %s", date_str, exc)
         return None
 
-    clear_frac = stats.get('clear_frac', 0) or 0
-    if clear_frac < MIN_CLEAR_RATIO:
+    clear_frac, day_vals, spatial = _parse_date_stats(result, list(index_imgs), histogram_bins)
+    if clear_frac < MIN_CLEAR_RATIO or not day_vals:
         return None
-
-    day_vals = {}
-    for idx in valid:
-        v = stats.get(idx)
-        if v is not None:
-            day_vals[idx] = round(v, 4)
-    return {"date": date_str, "sensor": "Landsat 8/9", "values": day_vals} if day_vals else None
+    return {"date": date_str, "sensor": "Landsat 8/9", "values": day_vals, "spatial": spatial}
 
 
 # Max concurrent GEE requests per analysis (stay within GEE rate limits)
 _MAX_GEE_WORKERS = 6
 _FIELD_SCORE_CORE_INDICES = {"VHI", "TCI", "NDVI", "NDMI", "TVDI"}
+# Progress steps reported by core-index-only analyses (no per-date phase).
+_FAST_CORE_PHASES = 4
 
 
 def _normalize_higher(value: Optional[float], low: float, high: float) -> Optional[float]:
@@ -433,6 +410,7 @@ def _compute_field_condition_fast(
     period_summary: Dict[str, Optional[float]],
     period_stats: Dict[str, dict],
     timeseries_count: int,
+    index_damage: Optional[Dict[str, dict]] = None,
 ) -> Optional[dict]:
     """
     Fast field-condition score using already-computed timeseries outputs only.
@@ -441,7 +419,12 @@ def _compute_field_condition_fast(
       - NDVI for canopy vigor and NDMI for moisture status.
       - TVDI for dryness stress (inverse scoring).
     This avoids extra GEE reduceRegion calls and keeps latency low.
+
+    *index_damage* ({index: {"damaged_pct", "classes"}} from
+    _compute_hotspot_condition) supplies measured damaged-area figures;
+    without it they fall back to the inverse-score proxy.
     """
+    index_damage = index_damage or {}
     components = {
         # Strongest signal in literature for vegetation+drought status.
         "VHI":  {"weight": 0.40, "score": _normalize_higher(period_summary.get("VHI"), 20.0, 70.0), "note": "overall vegetation health"},
@@ -485,6 +468,8 @@ def _compute_field_condition_fast(
             "p10": round(p10, 4) if p10 is not None else 0.0,
             "p90": round(p90, 4) if p90 is not None else 0.0,
         }
+        if idx in index_damage:
+            index_breakdown[idx]["damaged_pct"] = index_damage[idx]["damaged_pct"]
 
     if used_weight <= 0.0:
         return None
@@ -495,8 +480,14 @@ def _compute_field_condition_fast(
     variability_penalty = (sum(variability_terms) / len(variability_terms) * 0.8) if variability_terms else 0.0
     final_score = _clamp(base_score_0_10 - variability_penalty, 0.0, 10.0)
 
-    # Fast risk proxy from inverse score (avoid expensive spatial histograms).
-    stress_risk_pct = _clamp((1.0 - (final_score / 10.0)) * 100.0, 0.0, 100.0)
+    # Weighted share of damaged pixels across the measured indices; the
+    # inverse score is only a fallback when no class histograms came back.
+    measured = [(cfg["weight"], index_damage[idx]["damaged_pct"])
+                for idx, cfg in components.items() if idx in index_damage]
+    if measured:
+        stress_risk_pct = sum(w * pct for w, pct in measured) / sum(w for w, _ in measured)
+    else:
+        stress_risk_pct = _clamp((1.0 - (final_score / 10.0)) * 100.0, 0.0, 100.0)
 
     observed_idx_ratio = _clamp(len(index_breakdown) / max(1, len(components)), 0.0, 1.0)
     date_ratio = _clamp(timeseries_count / 6.0, 0.0, 1.0)
@@ -505,7 +496,8 @@ def _compute_field_condition_fast(
     drivers = sorted(index_breakdown.items(), key=lambda kv: kv[1]["score_0_10"])[:2]
     top_drivers = [{
         "index": idx,
-        "damaged_pct": round(_clamp(100.0 - (data["score_0_10"] * 10.0), 0.0, 100.0), 2),
+        "damaged_pct": (data["damaged_pct"] if "damaged_pct" in data
+                        else round(_clamp(100.0 - (data["score_0_10"] * 10.0), 0.0, 100.0), 2)),
         "score_0_10": round(data["score_0_10"], 2),
         "note": components[idx]["note"],
     } for idx, data in drivers]
@@ -524,31 +516,95 @@ def _compute_field_condition_fast(
     }
 
 
-def _compute_hotspot_mean_stress(region, start_date: str, end_date: str, cloud_cover: int) -> Optional[float]:
-    """Compute AOI mean stress (0..1) from the same hotspot layer shown on map."""
+# Hotspot pixels at or above this stress count as damaged ("Stressed" and
+# "Critical" in the map legend).
+DAMAGED_STRESS_LEVEL = 0.6
+# Threshold classes from _score_image_from_threshold, worst first.
+THRESHOLD_CLASSES = ("critical", "stressed", "watch", "mostly_healthy", "healthy")
+_DAMAGED_CLASSES = (0, 1)
+
+
+def _class_fractions(histogram: Optional[dict]) -> Optional[Dict[str, float]]:
+    """{"0": n, ..., "4": n} pixel counts → {class name: fraction of pixels}."""
+    counts = [_safe_float((histogram or {}).get(str(k))) or 0.0 for k in range(len(THRESHOLD_CLASSES))]
+    total = sum(counts)
+    if total <= 0:
+        return None
+    return {name: round(c / total, 4) for name, c in zip(THRESHOLD_CLASSES, counts)}
+
+
+def _compute_hotspot_condition(region, start_date: str, end_date: str, cloud_cover: int) -> Optional[dict]:
+    """AOI stress summary from the same hotspot layer shown on the map.
+
+    One reduction returns the mean stress (0..1), the true fraction of
+    pixels at or above DAMAGED_STRESS_LEVEL and, per core index, the share
+    of pixels in each INDEX_THRESHOLDS class (frequency histogram of the
+    threshold score image).
+    """
     try:
         s_date = ee.Date(start_date)
         e_date = ee.Date(end_date)
         if start_date == end_date:
             e_date = s_date.advance(1, 'day')
 
-        stress_img, native_scale = _build_stress_hotspot_image(
-            region, s_date, e_date, cloud_cover, include_landsat=True
+        stress_img, native_scale, index_imgs = _build_stress_hotspot_image(
+            region, s_date, e_date, cloud_cover, include_landsat=True, with_indices=True
         )
-        stats = stress_img.reduceRegion(
+        stress_bands, class_bands = _hotspot_reduction_images(stress_img, index_imgs)
+        stress_stats = stress_bands.reduceRegion(
             reducer=ee.Reducer.mean(),
             geometry=region,
             scale=native_scale,
             maxPixels=1e9,
             bestEffort=True,
-        ).getInfo() or {}
-        mean_stress = _safe_float(stats.get("STRESS_HOTSPOTS"))
-        if mean_stress is None:
-            return None
-        return _clamp(mean_stress, 0.0, 1.0)
+        )
+        payload = {"stress": stress_stats}
+        if class_bands is not None:
+            payload["classes"] = class_bands.reduceRegion(
+                reducer=ee.Reducer.frequencyHistogram().unweighted(),
+                geometry=region,
+                scale=native_scale,
+                maxPixels=1e9,
+                bestEffort=True,
+            )
+        result = ee.Dictionary(payload).getInfo() or {}
     except Exception as exc:
-        log.warning("Hotspot mean stress fallback failed: %s", exc)
+        log.warning("Hotspot condition reduction failed: %s", exc)
+        return None
+    return _parse_hotspot_condition(result.get("stress"), result.get("classes"))
+
+
+def _hotspot_reduction_images(stress_img, index_imgs: dict) -> tuple:
+    """(stress + DAMAGED image for Reducer.mean, threshold-class image or None)."""
+    stress = ee.Image.cat([
+        stress_img,
+        stress_img.gte(DAMAGED_STRESS_LEVEL).rename('DAMAGED'),
+    ])
+    score_imgs = [_score_image_from_threshold(idx, img).rename(idx) for idx, img in index_imgs.items()]
+    return stress, (ee.Image.cat(score_imgs) if score_imgs else None)
+
+
+def _parse_hotspot_condition(stats: Optional[dict], classes: Optional[dict]) -> Optional[dict]:
+    """Turn the stress-mean and class-histogram reductions into a hotspot summary."""
+    stats = stats or {}
+    mean_stress = _safe_float(stats.get("STRESS_HOTSPOTS"))
+    if mean_stress is None:
         return None
+    damaged = _safe_float(stats.get("DAMAGED"))
+
+    index_damage = {}
+    for idx, hist in (classes or {}).items():
+        fractions = _class_fractions(hist)
+        if fractions is None:
+            continue
+        damaged_share = sum(fractions[THRESHOLD_CLASSES[k]] for k in _DAMAGED_CLASSES)
+        index_damage[idx] = {"damaged_pct": round(damaged_share * 100.0, 2), "classes": fractions}
+
+    return {
+        "mean_stress": _clamp(mean_stress, 0.0, 1.0),
+        "damaged_area_pct": round(_clamp(damaged, 0.0, 1.0) * 100.0, 2) if damaged is not None else None,
+        "index_damage": index_damage,
+    }
 
 
 def _single_point_stats(value: Optional[float]) -> dict:
@@ -585,11 +641,8 @@ def _compute_core_summary_from_period_composites(
     if s2_col and any(i in request_indices for i in ("NDVI", "NDMI")):
         try:
             s2 = s2_col.median().clip(region)
-            s2_bands = []
-            if "NDVI" in request_indices and "NDVI" in requested_s2:
-                s2_bands.append(s2.normalizedDifference(['B8', 'B4']).rename('NDVI'))
-            if "NDMI" in request_indices and "NDMI" in requested_s2:
-                s2_bands.append(s2.normalizedDifference(['B8', 'B11']).rename('NDMI'))
+            wanted = [i for i in ("NDVI", "NDMI") if i in request_indices and i in requested_s2]
+            s2_bands = list(index_registry.build_s2(s2, wanted).values())
             if s2_bands:
                 s2_stats = ee.Image.cat(s2_bands).reduceRegion(
                     reducer=ee.Reducer.mean(),
@@ -611,28 +664,8 @@ def _compute_core_summary_from_period_composites(
     if ls_col and any(i in request_indices for i in ls_core):
         try:
             ls = ls_col.median().clip(region)
-            ndvi_l = ls.normalizedDifference(['SR_B5', 'SR_B4']).rename('ndvi_l')
-            lst_c = ls.select('ST_B10').subtract(273.15).rename('lst_c')
-
-            mm = ee.Image.cat([ndvi_l, lst_c]).reduceRegion(
-                reducer=ee.Reducer.minMax(), geometry=region, scale=30, maxPixels=1e9
-            )
-            ndvi_min = ee.Number(mm.get('ndvi_l_min', -0.2))
-            ndvi_max = ee.Number(mm.get('ndvi_l_max', 0.9))
-            lst_min = ee.Number(mm.get('lst_c_min', 10.0))
-            lst_max = ee.Number(mm.get('lst_c_max', 45.0))
-            ndvi_rng = ndvi_max.subtract(ndvi_min).max(0.001)
-            lst_rng = lst_max.subtract(lst_min).max(0.001)
-
-            ls_bands = []
-            if "TVDI" in request_indices and "TVDI" in requested_landsat:
-                ls_bands.append(lst_c.subtract(lst_min).divide(lst_rng).rename('TVDI'))
-            if "TCI" in request_indices and "TCI" in requested_landsat:
-                ls_bands.append(ee.Image.constant(lst_max).subtract(lst_c).divide(lst_rng).multiply(100).rename('TCI'))
-            if "VHI" in request_indices and "VHI" in requested_landsat:
-                vci = ndvi_l.subtract(ndvi_min).divide(ndvi_rng).multiply(100)
-                tci = ee.Image.constant(lst_max).subtract(lst_c).divide(lst_rng).multiply(100)
-                ls_bands.append(vci.multiply(0.5).add(tci.multiply(0.5)).rename('VHI'))
+            wanted = [i for i in ("TVDI", "TCI", "VHI") if i in request_indices and i in requested_landsat]
+            ls_bands = list(index_registry.build_landsat(ls, wanted, region, minmax_defaults=True).values())
 
             if ls_bands:
                 ls_stats = ee.Image.cat(ls_bands).reduceRegion(
@@ -654,15 +687,70 @@ def _compute_core_summary_from_period_composites(
     return summary_stats, period_stats
 
 
+def _field_condition(core_summary: dict, core_period_stats: dict, timeseries_count: int,
+                     hotspot: Optional[dict]) -> Optional[dict]:
+    """Field-condition block from the core composites plus the hotspot summary."""
+    field_condition = _compute_field_condition_fast(
+        period_summary=core_summary,
+        period_stats=core_period_stats,
+        timeseries_count=timeseries_count,
+        index_damage=hotspot["index_damage"] if hotspot else None,
+    )
+
+    # Keep field score consistent with hotspot map colors:
+    # score_0_10 = 10 * (1 - mean_stress), where mean_stress is from STRESS_HOTSPOTS.
+    if hotspot is not None:
+        hotspot_mean_stress = hotspot["mean_stress"]
+        hotspot_score = _clamp((1.0 - hotspot_mean_stress) * 10.0, 0.0, 10.0)
+        # Share of AOI pixels at or above DAMAGED_STRESS_LEVEL on the hotspot map.
+        damaged_area_pct = hotspot["damaged_area_pct"]
+        if damaged_area_pct is None:
+            damaged_area_pct = round(hotspot_mean_stress * 100.0, 2)
+        if field_condition is None:
+            field_condition = {
+                "score_0_10": round(hotspot_score, 2),
+                "label": _score_label(hotspot_score),
+                "confidence": "Medium",
+                "confidence_score": 0.5,
+                "base_score_0_10": round(hotspot_score, 2),
+                "damage_penalty": 0.0,
+                "variability_penalty": 0.0,
+                "damaged_area_pct": damaged_area_pct,
+                "drivers": [],
+                "index_breakdown": {},
+            }
+        else:
+            field_condition["score_0_10"] = round(hotspot_score, 2)
+            field_condition["label"] = _score_label(hotspot_score)
+            field_condition["base_score_0_10"] = round(hotspot_score, 2)
+            field_condition["damage_penalty"] = 0.0
+            field_condition["variability_penalty"] = 0.0
+            field_condition["damaged_area_pct"] = damaged_area_pct
+        field_condition["damage_classes"] = {
+            idx: d["classes"] for idx, d in hotspot["index_damage"].items()
+        }
+    return field_condition
+
+
 # ===========================================================================
 #  Main analysis logic  (optimised: threaded dates, single getInfo per date)
 # ===========================================================================
-def calculate_biomass_logic(request: AnalysisRequest) -> dict:
+def calculate_biomass_logic(request: AnalysisRequest,
+                            progress: Optional[Callable[[int, int], None]] = None) -> dict:
+    """Run the full analysis for one field.
+
+    *progress(done, total)* is called as dates finish (jobs.py uses it for
+    polling and cancellation); if it raises, pending dates are cancelled
+    and the exception propagates.  Core-index-only requests have no
+    per-date phase and report each phase boundary instead (dates, index
+    composites, core composites, hotspots).
+    """
     t0 = time.time()
     region = ee.Geometry(request.geojson)
 
     requested_s2 = [i for i in request.indices if i in S2_INDICES]
     requested_landsat = [i for i in request.indices if i in LANDSAT_INDICES]
+    histogram_bins = max(0, min(request.histogram_bins, MAX_HISTOGRAM_BINS))
 
     # -------------------------------------------------------------------
     #  Phase 1: Discover available dates  (S2 + Landsat in parallel)
@@ -715,6 +803,12 @@ def calculate_biomass_logic(request: AnalysisRequest) -> dict:
     fast_core_mode = (len(request.indices) > 0 and
                       set(request.indices).issubset(_FIELD_SCORE_CORE_INDICES))
 
+    def _phase_done(done: int) -> None:
+        if fast_core_mode and progress is not None:
+            progress(done, _FAST_CORE_PHASES)
+
+    _phase_done(1)
+
     # -------------------------------------------------------------------
     #  Phase 2: Either fast composite summaries (core mode) OR
     #           process all dates in parallel (single getInfo per date)
@@ -728,6 +822,7 @@ def calculate_biomass_logic(request: AnalysisRequest) -> dict:
             s2_col=s2_col,
             ls_col=ls_col,
         )
+        _phase_done(2)
         # Keep available observation dates for UI, but skip expensive per-date index processing.
         timeseries_results = (
             [{"date": d, "sensor": "Sentinel-2", "values": {}} for d in s2_dates] +
@@ -735,65 +830,40 @@ def calculate_biomass_logic(request: AnalysisRequest) -> dict:
         )
         timeseries_results.sort(key=lambda x: x['date'])
     else:
-        timeseries_results = []
-        all_values_flat = {idx: [] for idx in request.indices}
-
+        records = []
         futures = []
         with ThreadPoolExecutor(max_workers=_MAX_GEE_WORKERS) as pool:
             for d in s2_dates:
-                futures.append(pool.submit(_process_s2_date, s2_col, d, requested_s2, region))
+                futures.append(pool.submit(_process_s2_date, s2_col, d, requested_s2, region,
+                                           histogram_bins))
             for d in ls_dates:
-                futures.append(pool.submit(_process_ls_date, ls_col, d, requested_landsat, region))
+                futures.append(pool.submit(_process_ls_date, ls_col, d, requested_landsat, region,
+                                           histogram_bins))
 
-            for fut in as_completed(futures):
+            for done, fut in enumerate(as_completed(futures), start=1):
                 try:
                     result = fut.result()
                 except Exception as exc:
                     log.warning("Date processing failed: %s", exc)
-                    continue
-                if result is None:
-                    continue
-                timeseries_results.append(result)
-                for idx, v in result['values'].items():
-                    all_values_flat[idx].append(v)
+                    result = None
+                if result is not None:
+                    records.append(result)
+                if progress is not None:
+                    try:
+                        progress(done, len(futures))
+                    except BaseException:
+                        for pending in futures:
+                            pending.cancel()
+                        raise
 
         # -------------------------------------------------------------------
-        #  Summary  (mean for backwards compat + richer stats)
+        #  Summary  (mean for backwards compat + richer stats), one
+        #  vectorised pass over the dates × indices matrix
         # -------------------------------------------------------------------
-        timeseries_results.sort(key=lambda x: x['date'])
-        summary_stats = {}
-        period_stats = {}
-        for idx in request.indices:
-            vals = all_values_flat.get(idx, [])
-            if vals:
-                vals_sorted = sorted(vals)
-                n = len(vals_sorted)
-                mean_val = statistics.mean(vals)
-                summary_stats[idx] = round(mean_val, 4)
-
-                def _percentile(data, p):
-                    k = (len(data) - 1) * p / 100
-                    f = int(k)
-                    c = f + 1 if f + 1 < len(data) else f
-                    return data[f] + (k - f) * (data[c] - data[f])
-
-                period_stats[idx] = {
-                    "mean": round(mean_val, 4),
-                    "min": round(vals_sorted[0], 4),
-                    "max": round(vals_sorted[-1], 4),
-                    "std_dev": round(statistics.stdev(vals), 4) if n >= 2 else 0.0,
-                    "median": round(statistics.median(vals), 4),
-                    "p10": round(_percentile(vals_sorted, 10), 4),
-                    "p90": round(_percentile(vals_sorted, 90), 4),
-                    "count": n,
-                }
-            else:
-                summary_stats[idx] = None
-                period_stats[idx] = {
-                    "mean": None, "min": None, "max": None,
-                    "std_dev": None, "median": None, "p10": None, "p90": None,
-                    "count": 0,
-                }
+        series = TimeSeries.from_records(records, request.indices)
+        period_stats = series.period_stats()
+        summary_stats = series.summary(period_stats)
+        timeseries_results = series.to_records()
 
     sensors = []
     if requested_s2:
@@ -820,53 +890,34 @@ def calculate_biomass_logic(request: AnalysisRequest) -> dict:
                        .filter(ee.Filter.lt('CLOUD_COVER', request.cloud_cover))
                        .map(_mask_landsat_clouds).map(_apply_landsat_scale))
 
-    core_summary, core_period_stats = _compute_core_summary_from_period_composites(
-        region=region,
-        request_indices=list(_FIELD_SCORE_CORE_INDICES),
-        requested_s2=["NDVI", "NDMI"],
-        requested_landsat=["TVDI", "TCI", "VHI"],
-        s2_col=core_s2_col,
-        ls_col=core_ls_col,
-    )
+    # Core composites and the hotspot condition are independent GEE
+    # computations, so they run side by side rather than back to back.
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        fut_core = pool.submit(
+            _compute_core_summary_from_period_composites,
+            region=region,
+            request_indices=list(_FIELD_SCORE_CORE_INDICES),
+            requested_s2=["NDVI", "NDMI"],
+            requested_landsat=["TVDI", "TCI", "VHI"],
+            s2_col=core_s2_col,
+            ls_col=core_ls_col,
+        )
+        fut_hotspot = pool.submit(
+            _compute_hotspot_condition,
+            region=region,
+            start_date=request.start_date,
+            end_date=request.end_date,
+            cloud_cover=request.cloud_cover,
+        )
+        core_summary, core_period_stats = fut_core.result()
+        _phase_done(3)
+        hotspot = fut_hotspot.result()
+    _phase_done(4)
 
     elapsed = time.time() - t0
     log.info("Analysis complete: %d dates, %.1fs total", len(timeseries_results), elapsed)
-    field_condition = _compute_field_condition_fast(
-        period_summary=core_summary,
-        period_stats=core_period_stats,
-        timeseries_count=len(timeseries_results),
-    )
-
-    # Keep field score consistent with hotspot map colors:
-    # score_0_10 = 10 * (1 - mean_stress), where mean_stress is from STRESS_HOTSPOTS.
-    hotspot_mean_stress = _compute_hotspot_mean_stress(
-        region=region,
-        start_date=request.start_date,
-        end_date=request.end_date,
-        cloud_cover=request.cloud_cover,
-    )
-    if hotspot_mean_stress is not None:
-        hotspot_score = _clamp((1.0 - hotspot_mean_stress) * 10.0, 0.0, 10.0)
-        if field_condition is None:
-            field_condition = {
-                "score_0_10": round(hotspot_score, 2),
-                "label": _score_label(hotspot_score),
-                "confidence": "Medium",
-                "confidence_score": 0.5,
-                "base_score_0_10": round(hotspot_score, 2),
-                "damage_penalty": 0.0,
-                "variability_penalty": 0.0,
-                "damaged_area_pct": round(hotspot_mean_stress * 100.0, 2),
-                "drivers": [],
-                "index_breakdown": {},
-            }
-        else:
-            field_condition["score_0_10"] = round(hotspot_score, 2)
-            field_condition["label"] = _score_label(hotspot_score)
-            field_condition["base_score_0_10"] = round(hotspot_score, 2)
-            field_condition["damage_penalty"] = 0.0
-            field_condition["variability_penalty"] = 0.0
-            field_condition["damaged_area_pct"] = round(hotspot_mean_stress * 100.0, 2)
+    field_condition = _field_condition(core_summary, core_period_stats,
+                                       len(timeseries_results), hotspot)
 
     return {
         "metadata": {
@@ -883,98 +934,460 @@ def calculate_biomass_logic(request: AnalysisRequest) -> dict:
 
 
 # ===========================================================================
-#  Database persistence
+#  Multi-field batch analysis  (dates discovered once, reduceRegions per date)
 # ===========================================================================
-def save_results_to_db(db: Session, result_data: dict):
+
+# Upper bound on fields per batch request (one FeatureCollection per call).
+_MAX_BATCH_FIELDS = 1000
+
+
+def _normalize_fields(fields_geojson: dict) -> list:
+    """Return [{"id", "geometry"}, ...] from a FeatureCollection / Feature of parcels.
+
+    Field ids come from `id`, then properties `field_id` / `id` / `name`,
+    and fall back to a running number.
+    """
+    if not fields_geojson:
+        raise ValueError("No fields provided.")
+    if fields_geojson.get("type") == "FeatureCollection":
+        features = fields_geojson.get("features") or []
+    elif fields_geojson.get("type") == "Feature":
+        features = [fields_geojson]
+    else:
+        raise ValueError("fields must be a GeoJSON Feature or FeatureCollection.")
+
+    out, seen = [], set()
+    for n, feat in enumerate(features, start=1):
+        geom = feat.get("geometry") or {}
+        if geom.get("type") not in ("Polygon", "MultiPolygon"):
+            raise ValueError(f"Field {n} must be a Polygon or MultiPolygon.")
+        props = feat.get("properties") or {}
+        fid = feat.get("id", props.get("field_id", props.get("id", props.get("name"))))
+        fid = str(fid) if fid not in (None, "") else str(n)
+        if fid in seen:
+            raise ValueError(f"Duplicate field id {fid!r}.")
+        seen.add(fid)
+        out.append({"id": fid, "geometry": geom})
+
+    if not out:
+        raise ValueError("No fields provided.")
+    if len(out) > _MAX_BATCH_FIELDS:
+        raise ValueError(f"Too many fields ({len(out)}); the limit is {_MAX_BATCH_FIELDS}.")
+    return out
+
+
+def _features_by_pid(info: Optional[dict]) -> dict:
+    return {str((f.get("properties") or {}).get("pid")): f.get("properties") or {}
+            for f in (info or {}).get("features", [])}
+
+
+def _batch_process_date(col, date_str: str, sensor: str, requested: list, region,
+                        fields_fc) -> dict:
+    """Per-field values + spatial stats for one date; {field_id: record}.
+
+    One mosaic over the union of all fields, one combined-reducer
+    reduceRegions over the field collection, one getInfo().
+    """
+    day_start = ee.Date(date_str)
+    dm = col.filterDate(day_start, day_start.advance(1, 'day')).mosaic()
+    if sensor == "Sentinel-2":
+        index_imgs = index_registry.build_s2(dm, requested)
+        clear_band = dm.select('B8').mask().unmask(0).rename('clear_frac')
+        scale = 10
+    else:
+        # TVDI / TCI / VHI normalised per field, matching /calculate/biomass.
+        index_imgs = index_registry.build_landsat(dm, requested, region, zones=fields_fc)
+        clear_band = dm.select('SR_B5').mask().unmask(0).rename('clear_frac')
+        scale = 30
+    if not index_imgs:
+        return {}
+
+    combined = ee.Image.cat(list(index_imgs.values())).addBands(clear_band)
+    info = combined.reduceRegions(
+        collection=fields_fc, reducer=_date_stats_reducer(), scale=scale
+    ).getInfo()
+
+    out = {}
+    for fid, props in _features_by_pid(info).items():
+        clear_frac, day_vals, spatial = _parse_date_stats({"stats": props}, list(index_imgs))
+        if clear_frac < MIN_CLEAR_RATIO or not day_vals:
+            continue
+        out[fid] = {"date": date_str, "sensor": sensor, "values": day_vals, "spatial": spatial}
+    return out
+
+
+def _batch_field_conditions(region, fields_fc, start_date: str, end_date: str,
+                            cloud_cover: int, s2_col, ls_col) -> dict:
+    """Core composites + hotspot summary for every field in one getInfo().
+
+    Returns {field_id: (core_summary, core_period_stats, hotspot)}.
+    """
+    payload = {}
     try:
-        field_id = int(result_data["metadata"]["field_id"])
-    except (TypeError, ValueError):
-        raise ValueError("field_id must be a numeric value for the target database table.")
-    updated_count = 0
-    new_count = 0
-    processed_count = 0
-    skipped_empty_count = 0
-
-    for item in result_data["timeseries"]:
-        processed_count += 1
-        measurement_date = date_type.fromisoformat(item["date"])
-        sensor = item.get("sensor", "")
-        values = item["values"]
+        # Median of an empty collection has no bands, so only reduce what exists.
+        n_s2, n_ls = ee.List([s2_col.size(), ls_col.size()]).getInfo()
+        if n_s2:
+            s2 = s2_col.median().clip(region)
+            payload["s2"] = ee.Image.cat(list(index_registry.build_s2(s2, ["NDVI", "NDMI"]).values())) \
+                .reduceRegions(collection=fields_fc, reducer=ee.Reducer.mean(), scale=10)
+        if n_ls:
+            ls = ls_col.median().clip(region)
+            payload["ls"] = ee.Image.cat(list(index_registry.build_landsat(
+                ls, ["TVDI", "TCI", "VHI"], region, minmax_defaults=True, zones=fields_fc).values())) \
+                .reduceRegions(collection=fields_fc, reducer=ee.Reducer.mean(), scale=30)
+
+        s_date = ee.Date(start_date)
+        e_date = s_date.advance(1, 'day') if start_date == end_date else ee.Date(end_date)
+        try:
+            stress_img, native_scale, index_imgs = _build_stress_hotspot_image(
+                region, s_date, e_date, cloud_cover, include_landsat=True, with_indices=True
+            )
+            stress_bands, class_bands = _hotspot_reduction_images(stress_img, index_imgs)
+            payload["stress"] = stress_bands.reduceRegions(
+                collection=fields_fc, reducer=ee.Reducer.mean(), scale=native_scale)
+            if class_bands is not None:
+                payload["classes"] = class_bands.reduceRegions(
+                    collection=fields_fc, reducer=ee.Reducer.frequencyHistogram().unweighted(),
+                    scale=native_scale)
+        except Exception as exc:
+            log.warning("Batch hotspot image failed: %s", exc)
+
+        result = ee.Dictionary(payload).getInfo() or {}
+    except Exception as exc:
+        log.warning("Batch field condition failed: %s", exc)
+        return {}
+
+    s2_stats, ls_stats = _features_by_pid(result.get("s2")), _features_by_pid(result.get("ls"))
+    stress_stats, class_stats = _features_by_pid(result.get("stress")), _features_by_pid(result.get("classes"))
+
+    out = {}
+    for fid in set(s2_stats) | set(ls_stats) | set(stress_stats):
+        summary = {idx: None for idx in _FIELD_SCORE_CORE_INDICES}
+        period_stats = {idx: _single_point_stats(None) for idx in _FIELD_SCORE_CORE_INDICES}
+        for props in (s2_stats.get(fid, {}), ls_stats.get(fid, {})):
+            for idx in _FIELD_SCORE_CORE_INDICES:
+                v = _safe_float(props.get(idx))
+                if v is not None:
+                    summary[idx] = round(v, 4)
+                    period_stats[idx] = _single_point_stats(v)
+        classes = {k: v for k, v in class_stats.get(fid, {}).items() if k in index_registry.BY_NAME}
+        hotspot = _parse_hotspot_condition(stress_stats.get(fid), classes)
+        out[fid] = (summary, period_stats, hotspot)
+    return out
+
+
+def calculate_biomass_batch(fields_geojson: dict, start_date: str, end_date: str,
+                            indices: list, cloud_cover: int = 20) -> dict:
+    """Analyse many fields together; returns {"fields": {field_id: BiomassResponse}}.
+
+    Dates are discovered once for the union of all fields, and every
+    per-date reduction covers all fields with one reduceRegions call, so
+    GEE work scales with the number of scenes rather than fields x scenes.
+    Landsat min/max-normalised indices (TCI, VHI, TVDI) use each field's
+    own min/max, so stored values match those from /calculate/biomass.
+    """
+    t0 = time.time()
+    fields = _normalize_fields(fields_geojson)
+    fields_fc = ee.FeatureCollection([
+        ee.Feature(ee.Geometry(f["geometry"]), {"pid": f["id"]}) for f in fields
+    ])
+    region = fields_fc.geometry()
+
+    requested_s2 = [i for i in indices if i in S2_INDICES]
+    requested_landsat = [i for i in indices if i in LANDSAT_INDICES]
+
+    s2_col = (ee.ImageCollection("COPERNICUS/S2_SR_HARMONIZED")
+              .filterBounds(region)
+              .filterDate(start_date, end_date)
+              .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', cloud_cover))
+              .map(_mask_s2_clouds))
+    ls_col = (ee.ImageCollection("LANDSAT/LC08/C02/T1_L2")
+              .merge(ee.ImageCollection("LANDSAT/LC09/C02/T1_L2"))
+              .filterBounds(region)
+              .filterDate(start_date, end_date)
+              .filter(ee.Filter.lt('CLOUD_COVER', cloud_cover))
+              .map(_mask_landsat_clouds).map(_apply_landsat_scale))
+
+    def _dates(col):
+        return (col.map(lambda img: ee.Feature(None, {'date': img.date().format('YYYY-MM-dd')}))
+                .aggregate_array('date').distinct().getInfo())
+
+    with ThreadPoolExecutor(max_workers=_MAX_GEE_WORKERS) as pool:
+        fut_conditions = pool.submit(_batch_field_conditions, region, fields_fc,
+                                     start_date, end_date, cloud_cover, s2_col, ls_col)
+        fut_s2 = pool.submit(_dates, s2_col) if requested_s2 else None
+        fut_ls = pool.submit(_dates, ls_col) if requested_landsat else None
+        s2_dates = fut_s2.result() if fut_s2 else []
+        ls_dates = fut_ls.result() if fut_ls else []
+
+        futures = (
+            [pool.submit(_batch_process_date, s2_col, d, "Sentinel-2", requested_s2, region, fields_fc)
+             for d in s2_dates] +
+            [pool.submit(_batch_process_date, ls_col, d, "Landsat 8/9", requested_landsat, region, fields_fc)
+             for d in ls_dates]
+        )
+        records = {f["id"]: [] for f in fields}
+        for fut in as_completed(futures):
+            try:
+                per_field = fut.result()
+            except Exception as exc:
+                log.warning("Batch date processing failed: %s", exc)
+                continue
+            for fid, rec in per_field.items():
+                records.setdefault(fid, []).append(rec)
+        conditions = fut_conditions.result()
+
+    sensors = []
+    if requested_s2:
+        sensors.append("Sentinel-2 L2A")
+    if requested_landsat:
+        sensors.append("Landsat 8/9 C2L2")
+
+    results = {}
+    for f in fields:
+        fid = f["id"]
+        series = TimeSeries.from_records(records.get(fid, []), indices)
+        period_stats = series.period_stats()
+        core_summary, core_period_stats, hotspot = conditions.get(fid, ({}, {}, None))
+        results[fid] = {
+            "metadata": {
+                "field_id": fid,
+                "start_date": start_date,
+                "end_date": end_date,
+                "sensor": " + ".join(sensors),
+            },
+            "period_summary": series.summary(period_stats),
+            "period_stats": period_stats,
+            "field_condition": _field_condition(core_summary, core_period_stats, len(series), hotspot),
+            "timeseries": series.to_records(),
+        }
+
+    elapsed = round((time.time() - t0) * 1000)
+    log.info("Batch analysis: %d fields, S2=%d / Landsat=%d dates in %d ms",
+             len(fields), len(s2_dates), len(ls_dates), elapsed)
+    return {"fields": results, "elapsed_ms": elapsed}
+
+
+# ===========================================================================
+#  Database persistence
+# ===========================================================================
+# Index name → measurement column for every index the table stores.
+_MEASUREMENT_COLUMNS = {d.name: d.name.lower() for d in index_registry.INDICES}
+_UPSERT_KEY = ("field_id", "captured_at", "sensor")
+
+
+def _dialect_insert(db):
+    """INSERT construct with on_conflict_do_update for the session's dialect."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f"Bulk upsert is not supported for the {dialect!r} database dialect.")
+    return insert(models.Measurement.__table__)
+
+
+def _measurement_rows(field_id: int, series: TimeSeries) -> tuple:
+    """(rows to upsert, skipped-empty count) for every date with at least one value."""
+    rows, skipped = [], 0
+    for date_str, sensor, values, spatial in series.rows():
         if not values:
-            skipped_empty_count += 1
+            skipped += 1
             continue
+        row = {
+            "field_id": field_id,
+            "captured_at": date_type.fromisoformat(date_str),
+            "sensor": sensor,
+            "source": "GEE",
+            "source_image_id": "1",
+            "canopy_cover": values.get("CANOPY_COVER", 1.0),
+            "biomass_est": values.get("BIOMASS_EST", 1.0),
+            "spatial_stats": spatial or None,
+        }
+        # Every row carries every index column so the batch is one statement.
+        for idx, column in _MEASUREMENT_COLUMNS.items():
+            row[column] = values.get(idx)
+        rows.append(row)
+    return rows, skipped
 
-        existing = db.query(models.Measurement).filter(
-            models.Measurement.field_id == field_id,
-            models.Measurement.captured_at == measurement_date,
-            models.Measurement.sensor == sensor
-        ).first()
-
-        if existing:
-            modified = False
-            if getattr(existing, "captured_at", None) != measurement_date:
-                setattr(existing, "captured_at", measurement_date)
-                modified = True
-            for idx_name, val in values.items():
-                column_name = idx_name.lower()
-                if getattr(existing, column_name, None) != val:
-                    setattr(existing, column_name, val)
-                    modified = True
-            if getattr(existing, "canopy_cover", None) is None:
-                existing.canopy_cover = 1.0
-                modified = True
-            if getattr(existing, "biomass_est", None) is None:
-                existing.biomass_est = 1.0
-                modified = True
-            if getattr(existing, "source_image_id", None) in (None, ""):
-                existing.source_image_id = "1"
-                modified = True
-            if modified:
-                updated_count += 1
-            continue
 
-        db_record = models.Measurement(
-            field_id=field_id,
-            captured_at=measurement_date,
-            sensor=sensor,
-            source="GEE",
-            source_image_id=item.get("source_image_id") or "1",
-            # Sentinel-2
-            ndvi=values.get("NDVI"),
-            ndre=values.get("NDRE"),
-            gndvi=values.get("GNDVI"),
-            evi=values.get("EVI"),
-            savi=values.get("SAVI"),
-            canopy_cover=values.get("CANOPY_COVER", 1.0),
-            biomass_est=values.get("BIOMASS_EST", 1.0),
-            cire=values.get("CIre"),
-            mtci=values.get("MTCI"),
-            ireci=values.get("IRECI"),
-            ndmi=values.get("NDMI"),
-            nmdi=values.get("NMDI"),
-            # Landsat thermal / drought
-            lst=values.get("LST"),
-            vswi=values.get("VSWI"),
-            tvdi=values.get("TVDI"),
-            tci=values.get("TCI"),
-            vhi=values.get("VHI"),
-        )
-        db.add(db_record)
-        new_count += 1
+def result_rows(result_data: dict) -> tuple:
+    """(field_id, series, rows, skipped) for one result; ValueError when it cannot be stored.
+
+    Also used by write_behind.enqueue() so malformed results are rejected
+    before they reach the writer thread.
+    """
+    try:
+        field_id = int(result_data["metadata"]["field_id"])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("field_id must be a numeric value for the target database table.")
+    try:
+        series = TimeSeries.from_records(result_data["timeseries"])
+        rows, skipped_empty_count = _measurement_rows(field_id, series)
+    except (KeyError, TypeError, ValueError) as exc:
+        raise ValueError(f"Result for field {field_id} cannot be stored: {exc}")
+    return field_id, series, rows, skipped_empty_count
+
+
+def save_results_to_db(db: Session, result_data: dict, commit: bool = True):
+    """Upsert one analysis result as a single INSERT ... ON CONFLICT statement.
+
+    Existing rows keep values this result does not provide: index columns
+    and spatial_stats are only overwritten when the new value is not NULL,
+    and canopy_cover / biomass_est / source_image_id are only filled in
+    when missing, matching the earlier per-row update rules.  The weekly /
+    monthly rollups of the touched dates are refreshed in the same
+    transaction.  With commit=False the caller commits (write_behind.py
+    batches results).
+    """
+    field_id, series, rows, skipped_empty_count = result_rows(result_data)
+    table = models.Measurement.__table__
+    updated_count = 0
+    if rows:
+        # Keys already stored, only to report new vs updated.
+        existing = set(db.execute(
+            select(table.c.captured_at, table.c.sensor)
+            .where(table.c.field_id == field_id,
+                   table.c.captured_at.in_({r["captured_at"] for r in rows}))
+        ).all())
+        updated_count = sum((r["captured_at"], r["sensor"]) in existing for r in rows)
+
+        stmt = _dialect_insert(db)
+        excluded = stmt.excluded
+        update_set = {
+            column: func.coalesce(excluded[column], table.c[column])
+            for column in list(_MEASUREMENT_COLUMNS.values()) + ["spatial_stats"]
+        }
+        update_set.update({
+            "canopy_cover": func.coalesce(table.c.canopy_cover, excluded.canopy_cover),
+            "biomass_est": func.coalesce(table.c.biomass_est, excluded.biomass_est),
+            "source_image_id": func.coalesce(func.nullif(table.c.source_image_id, ""),
+                                             excluded.source_image_id),
+        })
+        db.execute(stmt.values(rows).on_conflict_do_update(index_elements=list(_UPSERT_KEY),
+                                                           set_=update_set))
+        days = [r["captured_at"] for r in rows]
+        rollups.refresh(db, field_id, {r["sensor"] for r in rows}, min(days), max(days))
+    if commit:
+        db.commit()
 
-    db.commit()
-    table_name = models.Measurement.__table__.fullname
     print(
-        f"DB status | table={table_name} | field_id={field_id} "
-        f"| processed={processed_count} | skipped_empty={skipped_empty_count} "
-        f"| new={new_count} | updated={updated_count}"
+        f"DB status | table={table.fullname} | field_id={field_id} "
+        f"| processed={len(series)} | skipped_empty={skipped_empty_count} "
+        f"| new={len(rows) - updated_count} | updated={updated_count}"
     )
 
 
+# ---------------------------------------------------------------------------
+# History read path  (Core tuple query, keyset pagination on (captured_at, id))
+# ---------------------------------------------------------------------------
+HISTORY_DEFAULT_LIMIT = 1000
+HISTORY_MAX_LIMIT = 10000
+_HISTORY_BASE_COLUMNS = ("id", "field_id", "captured_at", "sensor")
+_HISTORY_EXTRA_COLUMNS = ("created_at", "source", "source_image_id", "canopy_cover",
+                          "biomass_est", "spatial_stats")
+
+
+def encode_history_cursor(captured_at: date_type, row_id: int) -> str:
+    return f"{captured_at.isoformat()}.{row_id}"
+
+
+def decode_history_cursor(cursor: str) -> tuple:
+    try:
+        day, row_id = cursor.split(".", 1)
+        return date_type.fromisoformat(day), int(row_id)
+    except ValueError:
+        raise ValueError("Invalid cursor.")
+
+
+def _json_value(value):
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+def _history_statement(field_id: int, start_date: Optional[str], end_date: Optional[str],
+                       sensor: Optional[str], indices: Optional[list], limit: int,
+                       cursor: Optional[str]) -> tuple:
+    """(select, column names, clamped limit) for one /history page."""
+    table = models.Measurement.__table__
+    if indices:
+        unknown = [i for i in indices if i not in _MEASUREMENT_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown indices: {', '.join(unknown)}")
+        names = list(_HISTORY_BASE_COLUMNS) + [_MEASUREMENT_COLUMNS[i] for i in indices]
+    else:
+        names = (list(_HISTORY_BASE_COLUMNS) + list(_HISTORY_EXTRA_COLUMNS)
+                 + list(_MEASUREMENT_COLUMNS.values()))
+    limit = max(1, min(limit, HISTORY_MAX_LIMIT))
+
+    stmt = (select(*(table.c[n] for n in names))
+            .where(table.c.field_id == field_id, table.c.captured_at.isnot(None))
+            .order_by(table.c.captured_at, table.c.id)
+            .limit(limit + 1))
+    if start_date:
+        stmt = stmt.where(table.c.captured_at >= date_type.fromisoformat(start_date))
+    if end_date:
+        stmt = stmt.where(table.c.captured_at <= date_type.fromisoformat(end_date))
+    if sensor:
+        stmt = stmt.where(table.c.sensor == sensor)
+    if cursor:
+        after_date, after_id = decode_history_cursor(cursor)
+        stmt = stmt.where(or_(table.c.captured_at > after_date,
+                              and_(table.c.captured_at == after_date, table.c.id > after_id)))
+    return stmt, names, limit
+
+
+def _history_page(rows: list, names: list, limit: int) -> tuple:
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_history_cursor(rows[-1].captured_at, rows[-1].id)
+
+    payload = []
+    for row in rows:
+        item = {n: _json_value(v) for n, v in zip(names, row)}
+        # Keep frontend compatibility after replacing legacy `date` column with `captured_at`.
+        item["date"] = item["captured_at"]
+        payload.append(item)
+    return payload, next_cursor
+
+
+def query_history(db: Session, field_id: int, start_date: Optional[str] = None,
+                  end_date: Optional[str] = None, sensor: Optional[str] = None,
+                  indices: Optional[list] = None, limit: int = HISTORY_DEFAULT_LIMIT,
+                  cursor: Optional[str] = None) -> tuple:
+    """Stored measurements for one field, oldest first; returns (rows, next_cursor).
+
+    Only the selected columns are read, as plain tuples (no ORM objects).
+    *indices* limits the index columns (default: every column, as before);
+    pages continue after *cursor* = (captured_at, id) of the previous page.
+    """
+    stmt, names, limit = _history_statement(field_id, start_date, end_date, sensor,
+                                            indices, limit, cursor)
+    return _history_page(db.execute(stmt).all(), names, limit)
+
+
+async def query_history_async(db: AsyncSession, field_id: int, start_date: Optional[str] = None,
+                              end_date: Optional[str] = None, sensor: Optional[str] = None,
+                              indices: Optional[list] = None, limit: int = HISTORY_DEFAULT_LIMIT,
+                              cursor: Optional[str] = None) -> tuple:
+    """query_history on an AsyncSession."""
+    stmt, names, limit = _history_statement(field_id, start_date, end_date, sensor,
+                                            indices, limit, cursor)
+    return _history_page((await db.execute(stmt)).all(), names, limit)
+
+
 # ===========================================================================
 #  Composite stress-hotspot helper (shared by map + pixel query)
 # ===========================================================================
-def _build_stress_hotspot_image(region, s_date, e_date, cloud_cover, include_landsat=True):
+def _build_stress_hotspot_image(region, s_date, e_date, cloud_cover, include_landsat=True,
+                                with_indices=False):
+    """Blend S2 and Landsat stress into STRESS_HOTSPOTS (0..1).
+
+    Returns (image, native_scale); with_indices=True also returns the
+    period-composite index images it was built from ({name: ee.Image}).
+    """
+    index_imgs = {}
     s2_weighted_parts = []
     s2_weight_masks = []
     ls_weighted_parts = []
@@ -988,8 +1401,9 @@ def _build_stress_hotspot_image(region, s_date, e_date, cloud_cover, include_lan
     has_s2 = s2_col.size().getInfo() > 0
     if has_s2:
         s2 = s2_col.median().clip(region)
-        ndvi = s2.normalizedDifference(['B8', 'B4'])
-        ndmi = s2.normalizedDifference(['B8', 'B11'])
+        s2_idx = index_registry.build_s2(s2, ['NDVI', 'NDMI'])
+        ndvi, ndmi = s2_idx['NDVI'], s2_idx['NDMI']
+        index_imgs.update(s2_idx)
         ndvi_stress = ee.Image.constant(0.70).subtract(ndvi).divide(0.50).clamp(0, 1).rename('stress')
         ndmi_stress = ee.Image.constant(0.30).subtract(ndmi).divide(0.40).clamp(0, 1).rename('stress')
         s2_weighted_parts.append(ndvi_stress.unmask(0).multiply(0.20).rename('stress').toFloat())
@@ -1009,24 +1423,13 @@ def _build_stress_hotspot_image(region, s_date, e_date, cloud_cover, include_lan
         has_ls = ls_col.size().getInfo() > 0
         if has_ls:
             ls = ls_col.median().clip(region)
-            ndvi_l = ls.normalizedDifference(['SR_B5', 'SR_B4']).rename('ndvi_l')
-            lst_c = ls.select('ST_B10').subtract(273.15).rename('lst_c')
-            mm = ee.Image.cat([ndvi_l, lst_c]).reduceRegion(
-                reducer=ee.Reducer.minMax(), geometry=region, scale=30, maxPixels=1e9
-            )
-            ndvi_min = ee.Number(mm.get('ndvi_l_min', -0.2))
-            ndvi_max = ee.Number(mm.get('ndvi_l_max', 0.9))
-            lst_min = ee.Number(mm.get('lst_c_min', 10.0))
-            lst_max = ee.Number(mm.get('lst_c_max', 45.0))
-            ndvi_rng = ndvi_max.subtract(ndvi_min).max(0.001)
-            lst_rng = lst_max.subtract(lst_min).max(0.001)
-
-            tci = ee.Image.constant(lst_max).subtract(lst_c).divide(lst_rng).multiply(100)
+            ls_idx = index_registry.build_landsat(ls, ['TVDI', 'TCI', 'VHI'], region, minmax_defaults=True)
+            index_imgs.update(ls_idx)
+            tci = ls_idx['TCI']
             tci_stress = ee.Image.constant(80).subtract(tci).divide(60).clamp(0, 1).rename('stress')
-            tvdi = lst_c.subtract(lst_min).divide(lst_rng).clamp(0, 1)
+            tvdi = ls_idx['TVDI'].clamp(0, 1)
             tvdi_stress = tvdi.subtract(0.20).divide(0.60).clamp(0, 1).rename('stress')
-            vci = ndvi_l.subtract(ndvi_min).divide(ndvi_rng).multiply(100)
-            vhi = vci.multiply(0.5).add(tci.multiply(0.5))
+            vhi = ls_idx['VHI']
             vhi_stress = ee.Image.constant(70).subtract(vhi).divide(50).clamp(0, 1).rename('stress')
 
             ls_weighted_parts.append(vhi_stress.unmask(0).multiply(0.40).rename('stress').toFloat())
@@ -1073,6 +1476,8 @@ def _build_stress_hotspot_image(region, s_date, e_date, cloud_cover, include_lan
     # Keep low-stress pixels visible and crop strictly to AOI geometry.
     # Use unmask(..., False) so AOI never becomes transparent due to sparse masks.
     stress = stress.unmask(0.0, False).clip(region)
+    if with_indices:
+        return stress.rename('STRESS_HOTSPOTS'), native_scale, index_imgs
     return stress.rename('STRESS_HOTSPOTS'), native_scale
 
 
@@ -1098,21 +1503,16 @@ def generate_tile_url(request: AnalysisRequest, index_name: str) -> dict:
         )
         # Fixed scaling: align color interpretation with pixel-popup thresholds.
         vis_params = {'min': 0.0, 'max': 1.0, 'palette': hotspot_palette}
+        prefetch_stress_raster(request.geojson, request.start_date, request.end_date, request.cloud_cover)
         return _get_map_id(stress, vis_params, index_name, native_scale=native_scale)
 
     # ---------------------------------------------------------------
-    #  Landsat branch
+    #  Landsat / Sentinel-2 index layers (definitions in index_registry)
     # ---------------------------------------------------------------
     # Route to the correct branch: explicit sensor hint (for RGB) or index membership
     use_landsat = (index_name in LANDSAT_INDICES or
                    (index_name == "RGB" and request.sensor and "Landsat" in request.sensor))
     if use_landsat:
-        # Palettes
-        LST_PALETTE   = ['08306b', '2171b5', '6baed6', 'bdd7e7', 'ffffcc', 'fed976', 'fd8d3c', 'e31a1c', '800026']
-        VSWI_PALETTE  = ['d73027', 'fc8d59', 'fee08b', 'd9ef8b', '66bd63', '1a9850']
-        TVDI_PALETTE  = ['2166ac', '67a9cf', 'd1e5f0', 'fddbc7', 'ef8a62', 'b2182b']
-        HEALTH_PALETTE = ['d73027', 'fc8d59', 'fee08b', 'd9ef8b', '66bd63', '1a9850']
-
         l8 = ee.ImageCollection("LANDSAT/LC08/C02/T1_L2")
         l9 = ee.ImageCollection("LANDSAT/LC09/C02/T1_L2")
         ls_col = (l8.merge(l9)
@@ -1126,65 +1526,12 @@ def generate_tile_url(request: AnalysisRequest, index_name: str) -> dict:
             raise Exception(f"No clear Landsat imagery for date: {request.start_date}")
 
         image = ls_col.median().clip(region)
-        ndvi_l = image.normalizedDifference(['SR_B5', 'SR_B4']).rename('ndvi_l')
-        lst_c  = image.select('ST_B10').subtract(273.15).rename('lst_c')
-
-        viz_image = None
-        vis_params = {}
-
-        if index_name == "LST":
-            viz_image = lst_c
-            vis_params = {'min': 0, 'max': 45, 'palette': LST_PALETTE}
-
-        elif index_name == "VSWI":
-            viz_image = ndvi_l.divide(lst_c)
-            vis_params = {'min': 0, 'max': 0.06, 'palette': VSWI_PALETTE}
-
-        elif index_name in ("TVDI", "TCI", "VHI"):
-            mm = ee.Image.cat([ndvi_l, lst_c]).reduceRegion(
-                reducer=ee.Reducer.minMax(), geometry=region, scale=30, maxPixels=1e9)
-            ndvi_min = ee.Number(mm.get('ndvi_l_min'))
-            ndvi_max = ee.Number(mm.get('ndvi_l_max'))
-            lst_min  = ee.Number(mm.get('lst_c_min'))
-            lst_max  = ee.Number(mm.get('lst_c_max'))
-            ndvi_rng = ndvi_max.subtract(ndvi_min).max(0.001)
-            lst_rng  = lst_max.subtract(lst_min).max(0.001)
-
-            if index_name == "TVDI":
-                viz_image = lst_c.subtract(lst_min).divide(lst_rng)
-                vis_params = {'min': 0, 'max': 1, 'palette': TVDI_PALETTE}
-            elif index_name == "TCI":
-                viz_image = ee.Image.constant(lst_max).subtract(lst_c).divide(lst_rng).multiply(100)
-                vis_params = {'min': 0, 'max': 100, 'palette': HEALTH_PALETTE}
-            elif index_name == "VHI":
-                vci = ndvi_l.subtract(ndvi_min).divide(ndvi_rng).multiply(100)
-                tci = ee.Image.constant(lst_max).subtract(lst_c).divide(lst_rng).multiply(100)
-                viz_image = vci.multiply(0.5).add(tci.multiply(0.5))
-                vis_params = {'min': 0, 'max': 100, 'palette': HEALTH_PALETTE}
-
-        # Landsat RGB true-color composite
-        if index_name == "RGB":
-            viz_image = image.select(['SR_B4', 'SR_B3', 'SR_B2'])
-            vis_params = {'min': 0.0, 'max': 0.3}
-
-        if viz_image:
+        layers = index_registry.build_layers(image, index_registry.LANDSAT, [index_name], region)
+        if index_name in layers:
+            viz_image, vis_params = layers[index_name]
             return _get_map_id(viz_image, vis_params, index_name, native_scale=30)
         raise Exception(f"Unsupported Landsat index: {index_name}")
 
-    # ---------------------------------------------------------------
-    #  Sentinel-2 branch  (existing)
-    # ---------------------------------------------------------------
-    NDVI_PALETTE  = ['a50026', 'd73027', 'f46d43', 'fdae61', 'fee08b', 'd9ef8b', 'a6d96a', '66bd63', '1a9850', '006837']
-    NDRE_PALETTE  = ['440154', '482878', '3e4989', '31688e', '26828e', '1f9e89', '35b779', '6ece58', 'b5de2b', 'fde725']
-    GNDVI_PALETTE = ['a50026', 'f46d43', 'fee08b', 'addd8e', '66bd63', '006837']
-    EVI_PALETTE   = ['CE7E45', 'DF923D', 'F1B555', 'FCD163', '99B718', '74A901', '66A000', '529400', '3E8601', '207401']
-    SAVI_PALETTE  = ['8c510a', 'bf812d', 'dfc27d', 'f6e8c3', 'c7eae5', '80cdc1', '35978f', '01665e']
-    CIRE_PALETTE  = ['ffffcc', 'd9f0a3', 'addd8e', '78c679', '41ab5d', '238443', '005a32']
-    MTCI_PALETTE  = ['ffffb2', 'fed976', 'feb24c', 'fd8d3c', 'fc4e2a', 'e31a1c', 'b10026']
-    IRECI_PALETTE = ['fef0d9', 'fdd49e', 'fdbb84', 'fc8d59', 'ef6548', 'd7301f', '990000']
-    NDMI_PALETTE  = ['8c510a', 'd8b365', 'f6e8c3', 'c7eae5', '5ab4ac', '2166ac', '053061']
-    NMDI_PALETTE  = ['d73027', 'fc8d59', 'fee090', 'ffffbf', 'e0f3f8', '91bfdb', '4575b4']
-
     s2_col = (ee.ImageCollection("COPERNICUS/S2_SR_HARMONIZED")
               .filterBounds(region)
               .filterDate(s_date, e_date)
@@ -1195,57 +1542,9 @@ def generate_tile_url(request: AnalysisRequest, index_name: str) -> dict:
         raise Exception(f"No clear Sentinel-2 imagery for date: {request.start_date}")
 
     image = s2_col.median().clip(region)
-    viz_image = None
-    vis_params = {}
-
-    if index_name == "NDVI":
-        viz_image = image.normalizedDifference(['B8', 'B4'])
-        vis_params = {'min': -0.2, 'max': 1.0, 'palette': NDVI_PALETTE}
-    elif index_name == "NDRE":
-        viz_image = image.normalizedDifference(['B8', 'B5'])
-        vis_params = {'min': -0.2, 'max': 0.8, 'palette': NDRE_PALETTE}
-    elif index_name == "GNDVI":
-        viz_image = image.normalizedDifference(['B8', 'B3'])
-        vis_params = {'min': -0.2, 'max': 0.9, 'palette': GNDVI_PALETTE}
-    elif index_name == "EVI":
-        viz_image = image.expression(
-            '2.5 * ((NIR - RED) / (NIR + 6 * RED - 7.5 * BLUE + 10000))',
-            {'NIR': image.select('B8'), 'RED': image.select('B4'), 'BLUE': image.select('B2')})
-        vis_params = {'min': -0.2, 'max': 0.8, 'palette': EVI_PALETTE}
-    elif index_name == "SAVI":
-        viz_image = image.expression(
-            '((NIR - RED) / (NIR + RED + 5000)) * 1.5',
-            {'NIR': image.select('B8'), 'RED': image.select('B4')})
-        vis_params = {'min': -0.2, 'max': 0.8, 'palette': SAVI_PALETTE}
-    elif index_name == "CIre":
-        viz_image = image.expression(
-            '(RE3 / RE1) - 1',
-            {'RE3': image.select('B7'), 'RE1': image.select('B5')})
-        vis_params = {'min': 0, 'max': 10, 'palette': CIRE_PALETTE}
-    elif index_name == "MTCI":
-        viz_image = image.expression(
-            '(RE2 - RE1) / (RE1 - RED)',
-            {'RE2': image.select('B6'), 'RE1': image.select('B5'), 'RED': image.select('B4')})
-        vis_params = {'min': 0, 'max': 6, 'palette': MTCI_PALETTE}
-    elif index_name == "IRECI":
-        viz_image = image.expression(
-            '(RE3 - RED) * RE2 / (RE1 * 10000)',
-            {'RE3': image.select('B7'), 'RED': image.select('B4'),
-             'RE1': image.select('B5'), 'RE2': image.select('B6')})
-        vis_params = {'min': 0, 'max': 3, 'palette': IRECI_PALETTE}
-    elif index_name == "NDMI":
-        viz_image = image.normalizedDifference(['B8', 'B11'])
-        vis_params = {'min': -0.8, 'max': 0.8, 'palette': NDMI_PALETTE}
-    elif index_name == "NMDI":
-        viz_image = image.expression(
-            '(NIR - (SWIR1 - SWIR2)) / (NIR + (SWIR1 - SWIR2))',
-            {'NIR': image.select('B8'), 'SWIR1': image.select('B11'), 'SWIR2': image.select('B12')})
-        vis_params = {'min': 0, 'max': 1.0, 'palette': NMDI_PALETTE}
-    elif index_name == "RGB":
-        viz_image = image.select(['B4', 'B3', 'B2'])
-        vis_params = {'min': 0, 'max': 3000}
-
-    if viz_image:
+    layers = index_registry.build_layers(image, index_registry.SENTINEL2, [index_name])
+    if index_name in layers:
+        viz_image, vis_params = layers[index_name]
         return _get_map_id(viz_image, vis_params, index_name, native_scale=10)
 
     raise Exception(f"Unsupported index for visualisation: {index_name}")
@@ -1256,28 +1555,6 @@ def generate_tile_url(request: AnalysisRequest, index_name: str) -> dict:
 #  at once, parallelised getMapId calls via ThreadPoolExecutor.
 # ===========================================================================
 
-# ---- Palette definitions (shared across batch & single) ----
-_S2_PALETTES = {
-    'NDVI':  ['a50026','d73027','f46d43','fdae61','fee08b','d9ef8b','a6d96a','66bd63','1a9850','006837'],
-    'NDRE':  ['440154','482878','3e4989','31688e','26828e','1f9e89','35b779','6ece58','b5de2b','fde725'],
-    'GNDVI': ['a50026','f46d43','fee08b','addd8e','66bd63','006837'],
-    'EVI':   ['CE7E45','DF923D','F1B555','FCD163','99B718','74A901','66A000','529400','3E8601','207401'],
-    'SAVI':  ['8c510a','bf812d','dfc27d','f6e8c3','c7eae5','80cdc1','35978f','01665e'],
-    'CIre':  ['ffffcc','d9f0a3','addd8e','78c679','41ab5d','238443','005a32'],
-    'MTCI':  ['ffffb2','fed976','feb24c','fd8d3c','fc4e2a','e31a1c','b10026'],
-    'IRECI': ['fef0d9','fdd49e','fdbb84','fc8d59','ef6548','d7301f','990000'],
-    'NDMI':  ['8c510a','d8b365','f6e8c3','c7eae5','5ab4ac','2166ac','053061'],
-    'NMDI':  ['d73027','fc8d59','fee090','ffffbf','e0f3f8','91bfdb','4575b4'],
-}
-_LS_PALETTES = {
-    'LST':  ['08306b','2171b5','6baed6','bdd7e7','ffffcc','fed976','fd8d3c','e31a1c','800026'],
-    'VSWI': ['d73027','fc8d59','fee08b','d9ef8b','66bd63','1a9850'],
-    'TVDI': ['2166ac','67a9cf','d1e5f0','fddbc7','ef8a62','b2182b'],
-    'TCI':  ['d73027','fc8d59','fee08b','d9ef8b','66bd63','1a9850'],
-    'VHI':  ['d73027','fc8d59','fee08b','d9ef8b','66bd63','1a9850'],
-}
-
-
 def _get_map_id(viz_image, vis_params, index_name, native_scale=None):
     """Wrapper for getMapId suitable for ThreadPoolExecutor."""
     mid = viz_image.getMapId(vis_params)
@@ -1288,107 +1565,6 @@ def _get_map_id(viz_image, vis_params, index_name, native_scale=None):
     }
 
 
-def _build_s2_layers(image, indices):
-    """Build {index_name: (ee.Image, vis_params)} dict for Sentinel-2."""
-    layers = {}
-    for idx in indices:
-        viz = None; vp = {}
-        if idx == "NDVI":
-            viz = image.normalizedDifference(['B8','B4'])
-            vp = {'min': -0.2, 'max': 1.0, 'palette': _S2_PALETTES['NDVI']}
-        elif idx == "NDRE":
-            viz = image.normalizedDifference(['B8','B5'])
-            vp = {'min': -0.2, 'max': 0.8, 'palette': _S2_PALETTES['NDRE']}
-        elif idx == "GNDVI":
-            viz = image.normalizedDifference(['B8','B3'])
-            vp = {'min': -0.2, 'max': 0.9, 'palette': _S2_PALETTES['GNDVI']}
-        elif idx == "EVI":
-            viz = image.expression(
-                '2.5 * ((NIR - RED) / (NIR + 6 * RED - 7.5 * BLUE + 10000))',
-                {'NIR': image.select('B8'), 'RED': image.select('B4'), 'BLUE': image.select('B2')})
-            vp = {'min': -0.2, 'max': 0.8, 'palette': _S2_PALETTES['EVI']}
-        elif idx == "SAVI":
-            viz = image.expression(
-                '((NIR - RED) / (NIR + RED + 5000)) * 1.5',
-                {'NIR': image.select('B8'), 'RED': image.select('B4')})
-            vp = {'min': -0.2, 'max': 0.8, 'palette': _S2_PALETTES['SAVI']}
-        elif idx == "CIre":
-            viz = image.expression('(RE3 / RE1) - 1',
-                {'RE3': image.select('B7'), 'RE1': image.select('B5')})
-            vp = {'min': 0, 'max': 10, 'palette': _S2_PALETTES['CIre']}
-        elif idx == "MTCI":
-            viz = image.expression('(RE2 - RE1) / (RE1 - RED)',
-                {'RE2': image.select('B6'), 'RE1': image.select('B5'), 'RED': image.select('B4')})
-            vp = {'min': 0, 'max': 6, 'palette': _S2_PALETTES['MTCI']}
-        elif idx == "IRECI":
-            viz = image.expression('(RE3 - RED) * RE2 / (RE1 * 10000)',
-                {'RE3': image.select('B7'), 'RED': image.select('B4'),
-                 'RE1': image.select('B5'), 'RE2': image.select('B6')})
-            vp = {'min': 0, 'max': 3, 'palette': _S2_PALETTES['IRECI']}
-        elif idx == "NDMI":
-            viz = image.normalizedDifference(['B8','B11'])
-            vp = {'min': -0.8, 'max': 0.8, 'palette': _S2_PALETTES['NDMI']}
-        elif idx == "NMDI":
-            viz = image.expression(
-                '(NIR - (SWIR1 - SWIR2)) / (NIR + (SWIR1 - SWIR2))',
-                {'NIR': image.select('B8'), 'SWIR1': image.select('B11'), 'SWIR2': image.select('B12')})
-            vp = {'min': 0, 'max': 1.0, 'palette': _S2_PALETTES['NMDI']}
-        elif idx == "RGB":
-            viz = image.select(['B4','B3','B2'])
-            vp = {'min': 0, 'max': 3000}
-        if viz is not None:
-            layers[idx] = (viz, vp)
-    return layers
-
-
-def _build_ls_layers(image, indices, region):
-    """Build {index_name: (ee.Image, vis_params)} dict for Landsat 8/9."""
-    ndvi_l = image.normalizedDifference(['SR_B5','SR_B4']).rename('ndvi_l')
-    lst_c  = image.select('ST_B10').subtract(273.15).rename('lst_c')
-
-    layers = {}
-    needs_mm = any(i in ('TVDI','TCI','VHI') for i in indices)
-    mm_done = False
-    ndvi_min = ndvi_max = lst_min = lst_max = ndvi_rng = lst_rng = None
-
-    for idx in indices:
-        viz = None; vp = {}
-        if idx == "LST":
-            viz = lst_c
-            vp = {'min': 0, 'max': 45, 'palette': _LS_PALETTES['LST']}
-        elif idx == "VSWI":
-            viz = ndvi_l.divide(lst_c)
-            vp = {'min': 0, 'max': 0.06, 'palette': _LS_PALETTES['VSWI']}
-        elif idx in ("TVDI","TCI","VHI"):
-            if needs_mm and not mm_done:
-                mm = ee.Image.cat([ndvi_l, lst_c]).reduceRegion(
-                    reducer=ee.Reducer.minMax(), geometry=region, scale=30, maxPixels=1e9)
-                ndvi_min = ee.Number(mm.get('ndvi_l_min'))
-                ndvi_max = ee.Number(mm.get('ndvi_l_max'))
-                lst_min  = ee.Number(mm.get('lst_c_min'))
-                lst_max  = ee.Number(mm.get('lst_c_max'))
-                ndvi_rng = ndvi_max.subtract(ndvi_min).max(0.001)
-                lst_rng  = lst_max.subtract(lst_min).max(0.001)
-                mm_done = True
-            if idx == "TVDI":
-                viz = lst_c.subtract(lst_min).divide(lst_rng)
-                vp = {'min': 0, 'max': 1, 'palette': _LS_PALETTES['TVDI']}
-            elif idx == "TCI":
-                viz = ee.Image.constant(lst_max).subtract(lst_c).divide(lst_rng).multiply(100)
-                vp = {'min': 0, 'max': 100, 'palette': _LS_PALETTES['TCI']}
-            elif idx == "VHI":
-                vci = ndvi_l.subtract(ndvi_min).divide(ndvi_rng).multiply(100)
-                tci = ee.Image.constant(lst_max).subtract(lst_c).divide(lst_rng).multiply(100)
-                viz = vci.multiply(0.5).add(tci.multiply(0.5))
-                vp = {'min': 0, 'max': 100, 'palette': _LS_PALETTES['VHI']}
-        elif idx == "RGB":
-            viz = image.select(['SR_B4','SR_B3','SR_B2'])
-            vp = {'min': 0.0, 'max': 0.3}
-        if viz is not None:
-            layers[idx] = (viz, vp)
-    return layers
-
-
 def generate_tile_urls_batch(date: str, sensor: str, indices: list,
                              geojson: dict, cloud_cover: int = 20) -> dict:
     """Return tile URLs for ALL requested indices on a single date/sensor.
@@ -1417,7 +1593,7 @@ def generate_tile_urls_batch(date: str, sensor: str, indices: list,
         if col.size().getInfo() == 0:
             raise Exception(f"No clear Landsat imagery for {date}")
         image = col.median().clip(region)
-        layer_defs = _build_ls_layers(image, indices, region)
+        layer_defs = index_registry.build_layers(image, index_registry.LANDSAT, indices, region)
     else:
         col = (ee.ImageCollection("COPERNICUS/S2_SR_HARMONIZED")
                .filterBounds(region).filterDate(s_date, e_date)
@@ -1426,7 +1602,7 @@ def generate_tile_urls_batch(date: str, sensor: str, indices: list,
         if col.size().getInfo() == 0:
             raise Exception(f"No clear Sentinel-2 imagery for {date}")
         image = col.median().clip(region)
-        layer_defs = _build_s2_layers(image, indices)
+        layer_defs = index_registry.build_layers(image, index_registry.SENTINEL2, indices)
 
     # ---------- Parallel getMapId ----------
     native_scale = 30 if "Landsat" in sensor else 10
@@ -1447,11 +1623,225 @@ def generate_tile_urls_batch(date: str, sensor: str, indices: list,
     order = {name: i for i, name in enumerate(indices)}
     results.sort(key=lambda r: order.get(r['index_name'], 999))
 
+    # Warm the local pixel raster so inspector clicks on these overlays are
+    # answered without a GEE round trip.
+    if any(idx != "RGB" for idx in layer_defs):
+        prefetch_index_raster(geojson, date, sensor, cloud_cover)
+
     elapsed = round((time.time() - t0) * 1000)
     log.info("Batch %s %s: %d layers in %d ms", date, sensor, len(results), elapsed)
     return {"date": date, "sensor": sensor, "layers": results, "elapsed_ms": elapsed}
 
 
+# ===========================================================================
+#  Local pixel rasters  –  fetch AOI index arrays once, answer clicks locally
+# ===========================================================================
+
+# Fill value used to carry the GEE mask through computePixels (no index
+# ever reaches it); converted back to NaN in the local array.
+_PIXEL_NODATA = -99999.0
+_S2_RASTER_BANDS = ['NDVI', 'NDRE', 'GNDVI', 'EVI', 'SAVI', 'CIre', 'MTCI', 'IRECI', 'NDMI', 'NMDI']
+_LS_RASTER_BANDS = ['LST', 'VSWI', 'TVDI', 'TCI', 'VHI']
+
+_pixel_rasters = pixel_cache.PixelRasterCache()
+_band_store = band_store.BandStore()
+_raster_fetches: Dict[tuple, Future] = {}
+_raster_fetch_lock = threading.Lock()
+# key -> monotonic time of the last failed (or empty) fetch; such keys are
+# not fetched again for PIXEL_RASTER_RETRY_S, so clicks go straight to the
+# per-point fallback instead of rebuilding a raster that just failed.
+_raster_failures: Dict[tuple, float] = {}
+PIXEL_RASTER_RETRY_S = float(os.getenv("PIXEL_RASTER_RETRY_S", "120"))
+_raster_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="pixel-raster")
+
+
+def _fetch_pixel_raster(image, bands: list, geojson: dict, scale: int) -> Optional[pixel_cache.PixelRaster]:
+    """Download *bands* of *image* over the AOI grid with one computePixels call."""
+    grid = pixel_cache.grid_for_aoi(geojson, scale)
+    if grid is None:
+        return None
+    expr = image.select(bands).toFloat().unmask(_PIXEL_NODATA, False)
+    arr = ee.data.computePixels({
+        "expression": expr,
+        "fileFormat": "NUMPY_NDARRAY",
+        "grid": pixel_cache.ee_grid(grid),
+    })
+    data = np.stack([arr[b] for b in bands]).astype(np.float32)
+    data[data <= _PIXEL_NODATA + 1] = np.nan
+    return pixel_cache.PixelRaster(bands, data, grid)
+
+
+def _scene_id(date: str, sensor: str, cloud_cover: int) -> str:
+    return f"{'LS' if 'Landsat' in sensor else 'S2'}:{date}:cc{int(cloud_cover)}"
+
+
+def _fetch_scene_bands(geojson: dict, date: str, sensor: str, cloud_cover: int) -> Optional[band_store.StoredScene]:
+    """Return the raw bands of one daily mosaic over the AOI grid.
+
+    Served from the local band store when present, otherwise downloaded
+    with one computePixels call and stored.  Cloud masks are applied in
+    GEE (so the median only combines clear pixels); Landsat values stay
+    unscaled DNs and SCL / QA_PIXEL are the per-pixel mode.
+    """
+    gkey = pixel_cache.geometry_key(geojson)
+    scene_id = _scene_id(date, sensor, cloud_cover)
+    scene = _band_store.get(gkey, scene_id)
+    if scene is not None:
+        return scene
+
+    landsat = "Landsat" in sensor
+    scale = 30 if landsat else 10
+    grid = pixel_cache.grid_for_aoi(geojson, scale)
+    if grid is None:
+        return None
+
+    region = ee.Geometry(geojson)
+    s_date = ee.Date(date)
+    e_date = s_date.advance(1, 'day')
+    if landsat:
+        l8 = ee.ImageCollection("LANDSAT/LC08/C02/T1_L2")
+        l9 = ee.ImageCollection("LANDSAT/LC09/C02/T1_L2")
+        col = (l8.merge(l9)
+               .filterBounds(region).filterDate(s_date, e_date)
+               .filter(ee.Filter.lt('CLOUD_COVER', cloud_cover))
+               .map(_mask_landsat_clouds))
+        data_bands, qa_band = band_store.LANDSAT_BANDS[:-1], 'QA_PIXEL'
+    else:
+        col = (ee.ImageCollection("COPERNICUS/S2_SR_HARMONIZED")
+               .filterBounds(region).filterDate(s_date, e_date)
+               .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', cloud_cover))
+               .map(_mask_s2_clouds))
+        data_bands, qa_band = band_store.S2_BANDS[:-1], 'SCL'
+
+    names = data_bands + [qa_band]
+    image = col.select(data_bands).median().addBands(col.select([qa_band]).mode().rename(qa_band))
+    arr = ee.data.computePixels({
+        "expression": image.select(names).toFloat().unmask(_PIXEL_NODATA, False),
+        "fileFormat": "NUMPY_NDARRAY",
+        "grid": pixel_cache.ee_grid(grid),
+    })
+    bands = {}
+    for b in names:
+        band = np.asarray(arr[b], dtype=np.float32)
+        band[band <= _PIXEL_NODATA + 1] = np.nan
+        bands[b] = band
+    return _band_store.put(gkey, scene_id, bands, grid,
+                           {"source": "gee", "sensor": sensor, "date": date, "scale": scale})
+
+
+def _build_index_raster(geojson: dict, date: str, sensor: str, cloud_cover: int):
+    """Compute all index rasters for one date locally from the stored bands."""
+    scene = _fetch_scene_bands(geojson, date, sensor, cloud_cover)
+    if scene is None:
+        return None
+    region_mask = pixel_cache.aoi_mask(geojson, scene.grid)
+    if "Landsat" in sensor:
+        names = _LS_RASTER_BANDS
+        bands = index_engine.apply_landsat_scale(scene.bands(['SR_B4', 'SR_B5', 'ST_B10']))
+        values = index_engine.compute_landsat_indices(bands, names, region_mask=region_mask)
+    else:
+        names = _S2_RASTER_BANDS
+        values = index_engine.compute_s2_indices(scene.bands(band_store.S2_BANDS[:-1]), names)
+    data = np.stack([values[b] for b in names]).astype(np.float32, copy=False)
+    data[:, ~region_mask] = np.nan      # same as clip(region) in the GEE graph
+    return pixel_cache.PixelRaster(names, data, scene.grid)
+
+
+def _build_stress_raster(geojson: dict, start_date: str, end_date: str, cloud_cover: int):
+    region = ee.Geometry(geojson)
+    s_date = ee.Date(start_date)
+    e_date = ee.Date(end_date)
+    if start_date == end_date:
+        e_date = s_date.advance(1, 'day')
+    stress_img, native_scale = _build_stress_hotspot_image(
+        region, s_date, e_date, cloud_cover, include_landsat=True
+    )
+    return _fetch_pixel_raster(stress_img, ["STRESS_HOTSPOTS"], geojson, native_scale)
+
+
+def _index_raster_key(geojson: dict, date: str, sensor: str, cloud_cover: int) -> tuple:
+    sensor_key = "Landsat 8/9" if "Landsat" in sensor else "Sentinel-2"
+    return (pixel_cache.geometry_key(geojson), date, sensor_key, int(cloud_cover))
+
+
+def _stress_raster_key(geojson: dict, start_date: str, end_date: str, cloud_cover: int) -> tuple:
+    return (pixel_cache.geometry_key(geojson), f"{start_date}/{end_date}", "STRESS_HOTSPOTS", int(cloud_cover))
+
+
+def _get_raster(key: tuple, builder, *args, wait: bool = True) -> Optional[pixel_cache.PixelRaster]:
+    """Return the cached raster for *key*, fetching it at most once.
+
+    Concurrent callers (a prefetch and the first click) share one in-flight
+    fetch.  With wait=False the fetch is only scheduled.  A fetch that
+    fails or yields no raster is remembered for PIXEL_RASTER_RETRY_S,
+    during which the key returns None without fetching.
+    """
+    raster = _pixel_rasters.get(key)
+    if raster is not None:
+        return raster
+
+    def _fill():
+        filled = None
+        try:
+            filled = builder(*args)
+            if filled is not None:
+                _pixel_rasters.put(key, filled)
+            return filled
+        except Exception as exc:
+            log.warning("Pixel raster fetch failed for %s: %s", key[1:], exc)
+            return None
+        finally:
+            with _raster_fetch_lock:
+                _raster_fetches.pop(key, None)
+                if filled is None:
+                    now = time.monotonic()
+                    for stale in [k for k, t in _raster_failures.items() if now - t >= PIXEL_RASTER_RETRY_S]:
+                        del _raster_failures[stale]
+                    _raster_failures[key] = now
+
+    with _raster_fetch_lock:
+        failed_at = _raster_failures.get(key)
+        if failed_at is not None:
+            if time.monotonic() - failed_at < PIXEL_RASTER_RETRY_S:
+                return None
+            del _raster_failures[key]
+        fut = _raster_fetches.get(key)
+        if fut is None:
+            fut = _raster_pool.submit(_fill)
+            _raster_fetches[key] = fut
+    return fut.result() if wait else None
+
+
+def _click_raster(key: tuple, builder, *args) -> Optional[pixel_cache.PixelRaster]:
+    """Raster for an interactive click without queueing behind other fetches.
+
+    Returns the cached raster, or waits for its fetch only when that fetch
+    is already running.  Otherwise the fetch is scheduled in the background
+    and None is returned, so the click is answered by the point query.
+    """
+    raster = _pixel_rasters.get(key)
+    if raster is not None:
+        return raster
+    with _raster_fetch_lock:
+        fut = _raster_fetches.get(key)
+    if fut is not None and fut.running():
+        return fut.result()
+    _get_raster(key, builder, *args, wait=False)
+    return None
+
+
+def prefetch_index_raster(geojson: dict, date: str, sensor: str, cloud_cover: int = 20) -> None:
+    """Schedule a background fetch of all index rasters for one date/sensor."""
+    key = _index_raster_key(geojson, date, sensor, cloud_cover)
+    _get_raster(key, _build_index_raster, geojson, date, sensor, cloud_cover, wait=False)
+
+
+def prefetch_stress_raster(geojson: dict, start_date: str, end_date: str, cloud_cover: int = 20) -> None:
+    """Schedule a background fetch of the STRESS_HOTSPOTS raster for a period."""
+    key = _stress_raster_key(geojson, start_date, end_date, cloud_cover)
+    _get_raster(key, _build_stress_raster, geojson, start_date, end_date, cloud_cover, wait=False)
+
+
 # ===========================================================================
 #  Pixel value query  –  sample index values at a single point
 # ===========================================================================
@@ -1459,39 +1849,83 @@ def generate_tile_urls_batch(date: str, sensor: str, indices: list,
 def query_pixel_value(lat: float, lng: float, date: str, sensor: str,
                       indices: list, geojson: dict, cloud_cover: int = 20,
                       start_date: Optional[str] = None, end_date: Optional[str] = None) -> dict:
-    """Return index values at a specific lat/lng for a single date/sensor."""
+    """Return index values at a specific lat/lng for a single date/sensor.
+
+    Values are read from the locally cached AOI raster (fetched once per
+    date/sensor, usually already prefetched when the overlays were loaded);
+    the per-point GEE reduceRegion answers the click when the raster is
+    neither cached nor being downloaded right now.
+    The response carries the native grid cell that was sampled (at the
+    finest scale involved), which the inspector keys its cache on; it is
+    left out when a GEE query failed, so the partial answer is not cached.
+    """
     region = ee.Geometry(geojson)
     point = ee.Geometry.Point([lng, lat])
     s_date = ee.Date(date)
     e_date = s_date.advance(1, 'day')
 
     result_values = {}
+    cell_scales = []
+    query_failed = False
+
+    def _response(values):
+        response = {"lat": lat, "lng": lng, "date": date, "values": values}
+        if not query_failed:
+            scale = min(cell_scales) if cell_scales else (30 if "Landsat" in sensor else 10)
+            response["cell"] = pixel_cache.grid_cell(geojson, lat, lng, scale)
+        return response
+
     if "STRESS_HOTSPOTS" in indices:
-        try:
-            stress_start = start_date or date
-            stress_end = end_date or date
-            s_stress = ee.Date(stress_start)
-            e_stress = ee.Date(stress_end)
-            if stress_start == stress_end:
-                e_stress = s_stress.advance(1, 'day')
-            stress_img, native_scale = _build_stress_hotspot_image(
-                region, s_stress, e_stress, cloud_cover, include_landsat=True
-            )
-            raw = stress_img.reduceRegion(
-                reducer=ee.Reducer.first(),
-                geometry=point,
-                scale=native_scale
-            ).getInfo()
-            v = raw.get("STRESS_HOTSPOTS") if raw else None
+        stress_start = start_date or date
+        stress_end = end_date or date
+        stress_raster = _click_raster(
+            _stress_raster_key(geojson, stress_start, stress_end, cloud_cover),
+            _build_stress_raster, geojson, stress_start, stress_end, cloud_cover,
+        )
+        if stress_raster is not None:
+            cell_scales.append(stress_raster.grid["scale"])
+            v = stress_raster.lookup(lat, lng, ["STRESS_HOTSPOTS"]).get("STRESS_HOTSPOTS")
             if v is not None:
                 result_values["STRESS_HOTSPOTS"] = round(v, 4)
-        except Exception as exc:
-            log.warning("Hotspot pixel query failed at (%s, %s): %s", lat, lng, exc)
+        else:
+            try:
+                s_stress = ee.Date(stress_start)
+                e_stress = ee.Date(stress_end)
+                if stress_start == stress_end:
+                    e_stress = s_stress.advance(1, 'day')
+                stress_img, native_scale = _build_stress_hotspot_image(
+                    region, s_stress, e_stress, cloud_cover, include_landsat=True
+                )
+                cell_scales.append(native_scale)
+                raw = stress_img.reduceRegion(
+                    reducer=ee.Reducer.first(),
+                    geometry=point,
+                    scale=native_scale
+                ).getInfo()
+                v = raw.get("STRESS_HOTSPOTS") if raw else None
+                if v is not None:
+                    result_values["STRESS_HOTSPOTS"] = round(v, 4)
+            except Exception as exc:
+                query_failed = True
+                log.warning("Hotspot pixel query failed at (%s, %s): %s", lat, lng, exc)
         # Continue to index-specific query if other indices were requested.
         if len([i for i in indices if i != "STRESS_HOTSPOTS"]) == 0:
-            return {"lat": lat, "lng": lng, "date": date, "values": result_values}
+            return _response(result_values)
 
     non_stress_indices = [i for i in indices if i != "STRESS_HOTSPOTS"]
+    queryable = [i for i in non_stress_indices if i != "RGB"]
+    if not queryable:
+        return _response(result_values)
+    raster = _click_raster(
+        _index_raster_key(geojson, date, sensor, cloud_cover),
+        _build_index_raster, geojson, date, sensor, cloud_cover,
+    )
+    cell_scales.append(30 if "Landsat" in sensor else 10)
+    if raster is not None and raster.has_bands(queryable):
+        for idx, v in raster.lookup(lat, lng, queryable).items():
+            result_values[idx] = round(v, 4)
+        return _response(result_values)
+
     if "Landsat" in sensor:
         l8 = ee.ImageCollection("LANDSAT/LC08/C02/T1_L2")
         l9 = ee.ImageCollection("LANDSAT/LC09/C02/T1_L2")
@@ -1500,7 +1934,7 @@ def query_pixel_value(lat: float, lng: float, date: str, sensor: str,
                .filter(ee.Filter.lt('CLOUD_COVER', cloud_cover))
                .map(_mask_landsat_clouds).map(_apply_landsat_scale))
         image = col.median().clip(region)
-        layer_defs = _build_ls_layers(image, non_stress_indices, region)
+        layer_defs = index_registry.build_layers(image, index_registry.LANDSAT, non_stress_indices, region)
         scale = 30
     else:
         col = (ee.ImageCollection("COPERNICUS/S2_SR_HARMONIZED")
@@ -1508,7 +1942,7 @@ def query_pixel_value(lat: float, lng: float, date: str, sensor: str,
                .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', cloud_cover))
                .map(_mask_s2_clouds))
         image = col.median().clip(region)
-        layer_defs = _build_s2_layers(image, non_stress_indices)
+        layer_defs = index_registry.build_layers(image, index_registry.SENTINEL2, non_stress_indices)
         scale = 10
 
     bands = []
@@ -1519,7 +1953,7 @@ def query_pixel_value(lat: float, lng: float, date: str, sensor: str,
             band_names.append(idx)
 
     if not bands:
-        return {"lat": lat, "lng": lng, "date": date, "values": result_values}
+        return _response(result_values)
 
     combined = ee.Image.cat(bands)
     try:
@@ -1529,12 +1963,360 @@ def query_pixel_value(lat: float, lng: float, date: str, sensor: str,
             scale=scale
         ).getInfo()
     except Exception as exc:
+        query_failed = True
         log.warning("Pixel query failed at (%s, %s): %s", lat, lng, exc)
-        return {"lat": lat, "lng": lng, "date": date, "values": {}}
+        return _response(result_values)
 
     for idx in band_names:
         v = raw.get(idx)
         if v is not None:
             result_values[idx] = round(v, 4)
 
-    return {"lat": lat, "lng": lng, "date": date, "values": result_values}
+    return _response(result_values)
+
+
+# ===========================================================================
+#  Batch pixel sampling  –  many points, one reduceRegions call per date
+# ===========================================================================
+
+# Upper bound on points per batch request (keeps the FeatureCollection
+# payload and the reduceRegions output well inside GEE request limits).
+_MAX_BATCH_POINTS = 5000
+
+
+def _normalize_sample_points(points: Optional[list], points_geojson: Optional[dict]) -> list:
+    """Return [{"id", "lat", "lng"}, ...] from a point list and/or GeoJSON.
+
+    Accepts Point, MultiPoint, Feature and FeatureCollection geometries.
+    Feature ids are taken from `id`, then properties `id` / `name`, and
+    fall back to the point's position (suffixed if that id is taken).
+    Duplicate explicit ids are rejected: results are keyed by id.
+    """
+    out = []
+
+    def _add(lng, lat, point_id=None):
+        pid = str(point_id) if point_id not in (None, "") else None
+        out.append({"id": pid, "lat": float(lat), "lng": float(lng)})
+
+    for p in points or []:
+        if isinstance(p, dict):
+            _add(p["lng"], p["lat"], p.get("id"))
+        else:
+            _add(p.lng, p.lat, p.id)
+
+    def _walk(obj, feature_id=None):
+        if not obj:
+            return
+        kind = obj.get("type")
+        if kind == "FeatureCollection":
+            for feat in obj.get("features") or []:
+                _walk(feat)
+        elif kind == "Feature":
+            props = obj.get("properties") or {}
+            fid = obj.get("id", props.get("id", props.get("name")))
+            _walk(obj.get("geometry"), fid)
+        elif kind == "Point":
+            lng, lat = obj["coordinates"][:2]
+            _add(lng, lat, feature_id)
+        elif kind == "MultiPoint":
+            coords = obj.get("coordinates") or []
+            for i, (lng, lat, *_) in enumerate(coords):
+                pid = f"{feature_id}_{i + 1}" if feature_id not in (None, "") and len(coords) > 1 else feature_id
+                _add(lng, lat, pid)
+        else:
+            raise ValueError(f"Unsupported geometry type for point sampling: {kind!r}")
+
+    _walk(points_geojson)
+
+    if not out:
+        raise ValueError("No sample points provided.")
+    if len(out) > _MAX_BATCH_POINTS:
+        raise ValueError(f"Too many sample points ({len(out)}); the limit is {_MAX_BATCH_POINTS}.")
+
+    seen = set()
+    for p in out:
+        if p["id"] is None:
+            continue
+        if p["id"] in seen:
+            raise ValueError(f"Duplicate sample point id {p['id']!r}.")
+        seen.add(p["id"])
+    for n, p in enumerate(out, start=1):
+        if p["id"] is None:
+            pid, k = str(n), 1
+            while pid in seen:
+                k += 1
+                pid = f"{n}_{k}"
+            p["id"] = pid
+            seen.add(pid)
+    return out
+
+
+def _date_index_image(date: str, sensor: str, indices: list, region, cloud_cover: int) -> tuple:
+    """Return (image, band_names, scale) with one band per index for one date."""
+    s_date = ee.Date(date)
+    e_date = s_date.advance(1, 'day')
+    if "Landsat" in sensor:
+        l8 = ee.ImageCollection("LANDSAT/LC08/C02/T1_L2")
+        l9 = ee.ImageCollection("LANDSAT/LC09/C02/T1_L2")
+        col = (l8.merge(l9)
+               .filterBounds(region).filterDate(s_date, e_date)
+               .filter(ee.Filter.lt('CLOUD_COVER', cloud_cover))
+               .map(_mask_landsat_clouds).map(_apply_landsat_scale))
+        image = col.median().clip(region)
+        layer_defs = index_registry.build_layers(image, index_registry.LANDSAT, indices, region)
+        scale = 30
+    else:
+        col = (ee.ImageCollection("COPERNICUS/S2_SR_HARMONIZED")
+               .filterBounds(region).filterDate(s_date, e_date)
+               .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', cloud_cover))
+               .map(_mask_s2_clouds))
+        image = col.median().clip(region)
+        layer_defs = index_registry.build_layers(image, index_registry.SENTINEL2, indices)
+        scale = 10
+
+    band_names = [idx for idx in layer_defs if idx != 'RGB']
+    if not band_names:
+        return None, [], scale
+    combined = ee.Image.cat([layer_defs[idx][0].rename(idx) for idx in band_names])
+    return combined, band_names, scale
+
+
+def _sample_date(date: str, sensor: str, indices: list, region, points_fc, cloud_cover: int) -> dict:
+    """Sample all *indices* at every feature of *points_fc* for one date.
+
+    Returns {point_id: {index: value}}; uses a SINGLE reduceRegions getInfo().
+    """
+    combined, band_names, scale = _date_index_image(date, sensor, indices, region, cloud_cover)
+    if not band_names:
+        return {}
+    return _reduce_points(combined, band_names, points_fc, scale)
+
+
+def _reduce_points(image, band_names: list, points_fc, scale: int, reducer=None) -> dict:
+    """Run *reducer* (default Reducer.first()) over every feature of *points_fc*.
+
+    Returns {pid: {band: value}}.
+    """
+    # With a single-output reducer, reduceRegions names output properties
+    # after the input bands, so each feature carries one value per index.
+    fc = image.reduceRegions(collection=points_fc, reducer=reducer or ee.Reducer.first(), scale=scale)
+    info = fc.select(['pid'] + band_names, None, False).getInfo() or {}
+    out = {}
+    for feat in info.get("features", []):
+        props = feat.get("properties") or {}
+        vals = {}
+        for idx in band_names:
+            v = _safe_float(props.get(idx))
+            vals[idx] = round(v, 4) if v is not None else None
+        out[str(props.get("pid"))] = vals
+    return out
+
+
+def query_pixel_values_batch(dates: list, sensor: str, indices: list, geojson: dict,
+                             points: Optional[list] = None, points_geojson: Optional[dict] = None,
+                             cloud_cover: int = 20, start_date: Optional[str] = None,
+                             end_date: Optional[str] = None) -> dict:
+    """Return index values at many points for each requested date.
+
+    All points are sampled together with one reduceRegions call per date
+    (dates run in parallel), instead of one reduceRegion per point.
+    STRESS_HOTSPOTS is period-based and is sampled once over
+    start_date..end_date, then attached to every date's rows.
+    """
+    t0 = time.time()
+    if not dates:
+        raise ValueError("At least one date is required.")
+    sample_points = _normalize_sample_points(points, points_geojson)
+    region = ee.Geometry(geojson)
+    points_fc = ee.FeatureCollection([
+        ee.Feature(ee.Geometry.Point([p["lng"], p["lat"]]), {"pid": p["id"]})
+        for p in sample_points
+    ])
+    index_names = [i for i in indices if i != "STRESS_HOTSPOTS"]
+    unique_dates = list(dict.fromkeys(dates))
+
+    per_date = {}
+    if index_names:
+        with ThreadPoolExecutor(max_workers=min(len(unique_dates), _MAX_GEE_WORKERS)) as pool:
+            futures = {
+                pool.submit(_sample_date, d, sensor, index_names, region, points_fc, cloud_cover): d
+                for d in unique_dates
+            }
+            for fut in as_completed(futures):
+                d = futures[fut]
+                try:
+                    per_date[d] = fut.result()
+                except Exception as exc:
+                    log.warning("Batch sampling failed for %s: %s", d, exc)
+                    per_date[d] = {}
+
+    stress_vals = {}
+    if "STRESS_HOTSPOTS" in indices:
+        try:
+            stress_start = start_date or min(unique_dates)
+            stress_end = end_date or max(unique_dates)
+            s_stress = ee.Date(stress_start)
+            e_stress = ee.Date(stress_end)
+            if stress_start == stress_end:
+                e_stress = s_stress.advance(1, 'day')
+            stress_img, native_scale = _build_stress_hotspot_image(
+                region, s_stress, e_stress, cloud_cover, include_landsat=True
+            )
+            stress_vals = _reduce_points(stress_img, ["STRESS_HOTSPOTS"], points_fc, native_scale)
+        except Exception as exc:
+            log.warning("Hotspot batch sampling failed: %s", exc)
+
+    samples = []
+    for d in unique_dates:
+        date_vals = per_date.get(d, {})
+        for p in sample_points:
+            vals = {idx: None for idx in index_names}
+            vals.update(date_vals.get(p["id"], {}))
+            if "STRESS_HOTSPOTS" in indices:
+                vals["STRESS_HOTSPOTS"] = stress_vals.get(p["id"], {}).get("STRESS_HOTSPOTS")
+            samples.append({"point_id": p["id"], "lat": p["lat"], "lng": p["lng"],
+                            "date": d, "values": vals})
+
+    elapsed = round((time.time() - t0) * 1000)
+    log.info("Batch sampling %s: %d points x %d dates in %d ms",
+             sensor, len(sample_points), len(unique_dates), elapsed)
+    return {
+        "sensor": sensor,
+        "dates": unique_dates,
+        "point_count": len(sample_points),
+        "samples": samples,
+        "elapsed_ms": elapsed,
+    }
+
+
+def pixel_samples_to_csv(result: dict, indices: list) -> str:
+    """Serialise a query_pixel_values_batch() result as CSV (one row per point/date)."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(["point_id", "lat", "lng", "date", "sensor"] + list(indices))
+    for s in result["samples"]:
+        vals = s["values"]
+        writer.writerow([s["point_id"], s["lat"], s["lng"], s["date"], result["sensor"]] +
+                        ["" if vals.get(idx) is None else vals[idx] for idx in indices])
+    return buf.getvalue()
+
+
+# ===========================================================================
+#  Zonal statistics  –  grid / management zones, one reduceRegions per date
+# ===========================================================================
+
+_zone_cache = zones.ZoneStatsCache()
+
+
+def _zone_date_stats(date: str, sensor: str, indices: list, region, zones_fc,
+                     cloud_cover: int, cache_key: tuple) -> dict:
+    """Mean of every index in every zone for one date ({zone_id: {index: value}})."""
+    key = cache_key + (date,)
+    cached = _zone_cache.get(key)
+    if cached is not None:
+        return cached
+    combined, band_names, scale = _date_index_image(date, sensor, indices, region, cloud_cover)
+    if not band_names:
+        return {}
+    result = _reduce_points(combined, band_names, zones_fc, scale, reducer=ee.Reducer.mean())
+    if any(v is not None for vals in result.values() for v in vals.values()):
+        _zone_cache.put(key, result)
+    return result
+
+
+def query_zonal_stats(dates: list, sensor: str, indices: list, geojson: dict,
+                      field_id: Optional[str] = None, grid_size_m: Optional[float] = None,
+                      zones_geojson: Optional[dict] = None, cloud_cover: int = 20) -> dict:
+    """Per-zone index means for each date.
+
+    The AOI is split into a grid of *grid_size_m* cells, or *zones_geojson*
+    polygons are used as given.  All zones are reduced together with one
+    reduceRegions call per date (dates run in parallel).  Results are
+    cached per (field, zoning, date).
+    """
+    t0 = time.time()
+    if not dates:
+        raise ValueError("At least one date is required.")
+    index_names = [i for i in indices if i not in ("RGB", "STRESS_HOTSPOTS")]
+    if not index_names:
+        raise ValueError("At least one index is required.")
+    if zones_geojson:
+        zone_list = zones.polygon_zones(zones_geojson)
+    else:
+        zone_list = zones.grid_zones(geojson, grid_size_m or 20.0)
+
+    region = ee.Geometry(geojson)
+    zones_fc = ee.FeatureCollection([
+        ee.Feature(ee.Geometry(z["geometry"]), {"pid": z["id"]}) for z in zone_list
+    ])
+    zoning = zones.zoning_key(grid_size_m or 20.0, zones_geojson)
+    # The geometry is always part of the key: grid zone ids and the clip depend on
+    # it, so an edited parcel under the same field_id must not hit old entries.
+    cache_key = (field_id, pixel_cache.geometry_key(geojson), zoning, sensor,
+                 cloud_cover, tuple(sorted(index_names)))
+    unique_dates = list(dict.fromkeys(dates))
+
+    per_date = {}
+    with ThreadPoolExecutor(max_workers=min(len(unique_dates), _MAX_GEE_WORKERS)) as pool:
+        futures = {
+            pool.submit(_zone_date_stats, d, sensor, index_names, region, zones_fc,
+                        cloud_cover, cache_key): d
+            for d in unique_dates
+        }
+        for fut in as_completed(futures):
+            d = futures[fut]
+            try:
+                per_date[d] = fut.result()
+            except Exception as exc:
+                log.warning("Zonal statistics failed for %s: %s", d, exc)
+                per_date[d] = {}
+
+    values = {
+        idx: [[per_date[d].get(z["id"], {}).get(idx) for z in zone_list] for d in unique_dates]
+        for idx in index_names
+    }
+    elapsed = round((time.time() - t0) * 1000)
+    log.info("Zonal stats %s (%s): %d zones x %d dates in %d ms",
+             sensor, zoning, len(zone_list), len(unique_dates), elapsed)
+    return {
+        "sensor": sensor,
+        "zoning": zoning,
+        "dates": unique_dates,
+        "indices": index_names,
+        "zones": zone_list,
+        "values": values,          # values[index][date_i][zone_i]
+        "elapsed_ms": elapsed,
+    }
+
+
+def zonal_stats_to_columnar(result: dict) -> dict:
+    """Drop zone geometries: zone ids / areas plus values[index][date_i][zone_i]."""
+    return {
+        "sensor": result["sensor"],
+        "zoning": result["zoning"],
+        "dates": result["dates"],
+        "indices": result["indices"],
+        "zone_ids": [z["id"] for z in result["zones"]],
+        "zone_area_m2": [z["area_m2"] for z in result["zones"]],
+        "values": result["values"],
+        "elapsed_ms": result["elapsed_ms"],
+    }
+
+
+def zonal_stats_to_geojson(result: dict) -> dict:
+    """One Feature per zone with flat `<INDEX>_<YYYYMMDD>` properties (GIS / VRA tools)."""
+    features = []
+    for zi, z in enumerate(result["zones"]):
+        props = {"zone_id": z["id"], "area_m2": z["area_m2"]}
+        for idx, rows in result["values"].items():
+            for di, d in enumerate(result["dates"]):
+                props[f"{idx}_{d.replace('-', '')}"] = rows[di][zi]
+        features.append({"type": "Feature", "id": z["id"], "geometry": z["geometry"], "properties": props})
+    return {
+        "type": "FeatureCollection",
+        "features": features,
+        "properties": {
+            "sensor": result["sensor"], "zoning": result["zoning"],
+            "dates": result["dates"], "indices": result["indices"],
+        },
+    }
@@ -1,3 +1,38 @@
+// =========================================================================
+//  LAZY VENDOR SCRIPTS
+// =========================================================================
+// Chart.js and driver.js are only needed for the chart popup and the tour,
+// so they are not part of the initial page load.
+const CHART_JS_URL = 'https://cdn.jsdelivr.net/npm/chart.js@4.4.7/dist/chart.umd.min.js';
+const DRIVER_JS_URL = 'https://cdn.jsdelivr.net/npm/driver.js@1.3.1/dist/driver.js.iife.js';
+const DRIVER_CSS_URL = 'https://cdn.jsdelivr.net/npm/driver.js@1.3.1/dist/driver.css';
+const lazyScripts = {};
+
+function loadScriptOnce(src) {
+    if (!lazyScripts[src]) {
+        lazyScripts[src] = new Promise(function(resolve, reject) {
+            const el = document.createElement('script');
+            el.src = src;
+            el.async = true;
+            el.onload = resolve;
+            el.onerror = function() {
+                delete lazyScripts[src];
+                reject(new Error('Failed to load ' + src));
+            };
+            document.head.appendChild(el);
+        });
+    }
+    return lazyScripts[src];
+}
+
+function loadStylesheetOnce(href) {
+    if (document.querySelector('link[href="' + href + '"]')) return;
+    const el = document.createElement('link');
+    el.rel = 'stylesheet';
+    el.href = href;
+    document.head.appendChild(el);
+}
+
 // =========================================================================
 //  COLLAPSIBLE SETUP CARD
 // =========================================================================
@@ -5,13 +40,7 @@ let setupCardOpen = true;
 let persistentStressLayer = null;
 
 function clearPersistentStressLayer() {
-    if (persistentStressLayer && map && map.hasLayer(persistentStressLayer)) {
-        map.removeLayer(persistentStressLayer);
-    }
-    activeLayers = activeLayers.filter(function(layer) { return layer !== persistentStressLayer; });
-    const stressRow = document.querySelector('.lp-overlay-row[data-persistent-stress="1"]');
-    if (stressRow) stressRow.remove();
-    updateLayerCount();
+    removeOverlayDescriptors(function(desc) { return desc.persistentStress; });
     persistentStressLayer = null;
 }
 
@@ -19,21 +48,17 @@ async function refreshPersistentStressLayer(fieldId, start, end) {
     if (!currentAOI || !start || !end) return;
 
     try {
-        const res = await fetch(API_URL + '/visualize/map', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
-                field_id: fieldId,
-                start_date: start,
-                end_date: end,
-                indices: ['STRESS_HOTSPOTS'],
-                geojson: currentAOI,
-                cloud_cover: 20
-            })
+        const body = {
+            field_id: fieldId,
+            start_date: start,
+            end_date: end,
+            indices: ['STRESS_HOTSPOTS'],
+            geojson: currentAOI,
+            cloud_cover: 20
+        };
+        const { data: layer } = await cachedPostJSON('layers', '/visualize/map', body, function(fresh) {
+            overlayDescriptors.filter(d => d.persistentStress).forEach(d => setOverlayUrl(d, fresh.layer_url));
         });
-        if (!res.ok) return;
-
-        const layer = await res.json();
         const hotspotNativeScale = Number(layer.native_scale || 10);
         const nextLayer = L.tileLayer(layer.layer_url, {
             opacity: 1.0,
@@ -51,13 +76,18 @@ async function refreshPersistentStressLayer(fieldId, start, end) {
         clearPersistentStressLayer();
         persistentStressLayer = nextLayer;
         persistentStressLayer._persistentStress = true;
-        activeLayers.push(persistentStressLayer);
-        persistentStressLayer.addTo(map);
-        if (typeof persistentStressLayer.bringToFront === 'function') persistentStressLayer.bringToFront();
-        const stressCb = addOverlayToPanel(persistentStressLayer, 'STRESS_HOTSPOTS', persistentStressLayer._displayDate, '');
-        const stressRow = document.querySelector('#lp-overlays .lp-overlay-row:last-child');
-        if (stressRow) stressRow.dataset.persistentStress = '1';
-        if (stressCb) stressCb.checked = true;
+        const stressDesc = addOverlayDescriptor({
+            url: layer.layer_url,
+            idx: 'STRESS_HOTSPOTS',
+            date: persistentStressLayer._displayDate,
+            sensor: '',
+            nativeScale: hotspotNativeScale,
+            zIndex: 1090,
+            layer: persistentStressLayer,
+            persistentStress: true
+        }, false);
+        setOverlayVisible(stressDesc, true);
+        renderOverlayRows();
         ensureLegendTab('STRESS_HOTSPOTS');
         updateLegend('STRESS_HOTSPOTS');
     } catch (e) {
@@ -127,19 +157,30 @@ function _dateOnly(s) {
     return String(s || '').slice(0, 10);
 }
 
+function _isoDate(d) {
+    return d.getFullYear() + '-' + String(d.getMonth() + 1).padStart(2, '0') + '-' +
+        String(d.getDate()).padStart(2, '0');
+}
+
 async function fetchTrendInfo(fieldId, startDate, endDate, currentScore) {
     try {
-        const res = await fetch(API_URL + '/history/' + encodeURIComponent(fieldId));
-        if (!res.ok) return null;
-        const records = await res.json();
-        if (!Array.isArray(records) || records.length === 0) return null;
-
         const start = new Date(startDate + 'T00:00:00');
         const end = new Date(endDate + 'T00:00:00');
         const periodDays = Math.max(1, Math.round((end - start) / 86400000) + 1);
         const prevEnd = new Date(start.getTime() - 86400000);
         const prevStart = new Date(prevEnd.getTime() - (periodDays - 1) * 86400000);
 
+        // Only the previous period and the five score indices are needed.
+        const query = new URLSearchParams({
+            start_date: _isoDate(prevStart),
+            end_date: _isoDate(prevEnd),
+            indices: 'NDVI,NDMI,TCI,TVDI,VHI'
+        });
+        const res = await fetch(API_URL + '/history/' + encodeURIComponent(fieldId) + '?' + query);
+        if (!res.ok) return null;
+        const records = await res.json();
+        if (!Array.isArray(records) || records.length === 0) return null;
+
         const sums = { NDVI: 0, NDMI: 0, TCI: 0, TVDI: 0, VHI: 0 };
         const counts = { NDVI: 0, NDMI: 0, TCI: 0, TVDI: 0, VHI: 0 };
         records.forEach(function(r) {
@@ -537,6 +578,11 @@ function setActiveChartTab(filter) {
 
 function buildPopupChart() {
     if (!lastAnalysisData) return;
+    if (typeof Chart === 'undefined') {
+        // Chart.js is fetched the first time the chart is opened.
+        loadScriptOnce(CHART_JS_URL).then(buildPopupChart).catch(function(e) { console.error(e); });
+        return;
+    }
     const timeseries = lastAnalysisData.timeseries;
     const allIndices = lastRequestedIndices;
 
@@ -636,9 +682,199 @@ function showDatesSkeleton() {
     cont.innerHTML = html;
 }
 
+// =========================================================================
+//  RESULT CACHE (IndexedDB)
+// =========================================================================
+// Analysis responses and layer URL sets are cached per AOI + request params.
+// Entries younger than `fresh` are served without a request; older entries
+// up to `expires` are served immediately and revalidated in the background.
+const RESULT_CACHE_DB = 'biomass_result_cache';
+const RESULT_CACHE_STORE = 'entries';
+const RESULT_CACHE_TTL = {
+    analysis: { fresh: 60 * 60 * 1000,  expires: 7 * 24 * 60 * 60 * 1000 },
+    // GEE map tokens expire after a few hours, so tile URLs are kept briefly.
+    layers:   { fresh: 30 * 60 * 1000,  expires: 3 * 60 * 60 * 1000 }
+};
+let resultCacheDbPromise = null;
+
+function openResultCache() {
+    if (resultCacheDbPromise) return resultCacheDbPromise;
+    resultCacheDbPromise = new Promise(function(resolve) {
+        if (!window.indexedDB) { resolve(null); return; }
+        const req = indexedDB.open(RESULT_CACHE_DB, 1);
+        req.onupgradeneeded = function() {
+            const store = req.result.createObjectStore(RESULT_CACHE_STORE, { keyPath: 'key' });
+            store.createIndex('expiresAt', 'expiresAt');
+        };
+        req.onsuccess = function() { resolve(req.result); pruneResultCache(req.result); };
+        req.onerror = function() { resolve(null); };
+    });
+    return resultCacheDbPromise;
+}
+
+function pruneResultCache(db) {
+    try {
+        const tx = db.transaction(RESULT_CACHE_STORE, 'readwrite');
+        const range = IDBKeyRange.upperBound(Date.now());
+        tx.objectStore(RESULT_CACHE_STORE).index('expiresAt').openCursor(range).onsuccess = function(e) {
+            const cursor = e.target.result;
+            if (cursor) { cursor.delete(); cursor.continue(); }
+        };
+    } catch (e) { /* cache is best-effort */ }
+}
+
+async function resultCacheGet(key) {
+    const db = await openResultCache();
+    if (!db) return null;
+    return new Promise(function(resolve) {
+        try {
+            const req = db.transaction(RESULT_CACHE_STORE, 'readonly').objectStore(RESULT_CACHE_STORE).get(key);
+            req.onsuccess = function() {
+                const entry = req.result;
+                resolve(entry && entry.expiresAt > Date.now() ? entry : null);
+            };
+            req.onerror = function() { resolve(null); };
+        } catch (e) { resolve(null); }
+    });
+}
+
+async function resultCachePut(key, kind, value) {
+    const db = await openResultCache();
+    if (!db) return;
+    const now = Date.now();
+    const ttl = RESULT_CACHE_TTL[kind];
+    try {
+        db.transaction(RESULT_CACHE_STORE, 'readwrite').objectStore(RESULT_CACHE_STORE).put({
+            key: key, kind: kind, value: value,
+            storedAt: now, freshUntil: now + ttl.fresh, expiresAt: now + ttl.expires
+        });
+    } catch (e) { /* quota or private mode — ignore */ }
+}
+
+// FNV-1a over the canonical JSON; enough to tell AOIs and parameter sets apart.
+function hashString(str) {
+    let h = 0x811c9dc5;
+    for (let i = 0; i < str.length; i++) {
+        h ^= str.charCodeAt(i);
+        h = Math.imul(h, 0x01000193);
+    }
+    return (h >>> 0).toString(16).padStart(8, '0');
+}
+
+function resultCacheKey(kind, body) {
+    const params = Object.assign({}, body);
+    delete params.geojson;
+    return kind + ':' + hashString(JSON.stringify(body.geojson || null)) + ':' + hashString(JSON.stringify(params));
+}
+
+async function fetchJSON(path, body) {
+    const res = await fetch(API_URL + path, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(body)
+    });
+    if (!res.ok) {
+        const err = await res.json().catch(() => ({}));
+        throw new Error(err.detail || 'Server returned an error (' + res.status + ')');
+    }
+    return res.json();
+}
+
+// POST with stale-while-revalidate caching. Resolves to { data, fromCache }.
+// `onRevalidated(data)` is called only when a background refresh returns a
+// different payload than the one already rendered.
+async function cachedPostJSON(kind, path, body, onRevalidated) {
+    const key = resultCacheKey(kind, body);
+    const entry = await resultCacheGet(key);
+    if (entry) {
+        if (entry.freshUntil <= Date.now()) {
+            fetchJSON(path, body).then(function(fresh) {
+                resultCachePut(key, kind, fresh);
+                if (onRevalidated && JSON.stringify(fresh) !== JSON.stringify(entry.value)) onRevalidated(fresh);
+            }).catch(function(e) { console.warn('Background revalidation failed', e); });
+        }
+        return { data: entry.value, fromCache: true };
+    }
+    const data = await fetchJSON(path, body);
+    resultCachePut(key, kind, data);
+    return { data: data, fromCache: false };
+}
+
 // =========================================================================
 //  MAIN ANALYSIS
 // =========================================================================
+let lastAnalysisCacheKey = null;
+
+// Fills the results card from a /calculate/biomass payload. Also used to
+// re-render when a cached analysis is revalidated in the background.
+async function renderAnalysisResult(data, ctx) {
+    const { field_id, start, end, analysisIndices, displayIndices, manualIndices, t0 } = ctx;
+    lastAnalysisData = data;
+    lastRequestedIndices = displayIndices;
+    lastManualIndexSelection = manualIndices.length > 0;
+    await refreshPersistentStressLayer(field_id, start, end);
+
+    const cont = document.getElementById('dates-container');
+    cont.innerHTML = '';
+
+    buildSummaryPanel(data.period_summary, displayIndices, data.field_condition || null, lastManualIndexSelection);
+    prepareChartData(data.timeseries, displayIndices);
+
+    var allMissing = analysisIndices.every(function(i) { return data.period_summary[i] == null; });
+
+    if (data.timeseries.length === 0 || allMissing) {
+        if (lastManualIndexSelection) {
+            buildWarnings(data.period_summary || {}, displayIndices, 0, 0);
+        } else {
+            document.getElementById('warnings-panel').innerHTML = '';
+        }
+        document.getElementById('summary-panel').innerHTML = '';
+        document.getElementById('dates-container').innerHTML = '';
+        document.getElementById('btn-chart-toggle').style.display = 'none';
+        document.getElementById('btn-load').style.display = 'none';
+        document.querySelector('#result-card label[style]').style.display = 'none';
+        setStatus(t('status_no_images'), "warning");
+    } else {
+        document.getElementById('btn-load').style.display = '';
+        document.querySelector('#result-card label[style]').style.display = '';
+
+        const s2Dates = data.timeseries.filter(t => t.sensor === 'Sentinel-2');
+        const lsDates = data.timeseries.filter(t => t.sensor === 'Landsat 8/9');
+
+        if (lastManualIndexSelection) {
+            buildWarnings(data.period_summary || {}, displayIndices, s2Dates.length, lsDates.length);
+        } else {
+            document.getElementById('warnings-panel').innerHTML = '';
+        }
+
+        let html = '';
+        if (s2Dates.length > 0) {
+            html += '<div class="sensor-group">';
+            html += '<div class="sensor-header"><span class="sensor-badge s2">' + t('optical') + '</span><div class="sensor-meta"><span class="sensor-count">' + s2Dates.length + ' ' + t('dates_suffix') + '</span><a href="#" class="select-all-link" onclick="toggleSensorDates(\'Sentinel-2\', this); return false;">' + t('all').toLowerCase() + '</a></div></div>';
+            s2Dates.forEach(t => {
+                html += '<div class="date-row"><input type="checkbox" class="date-checkbox" value="' + t.date + '" data-sensor="Sentinel-2"><span>' + formatDate(t.date) + '</span></div>';
+            });
+            html += '</div>';
+        }
+        if (lsDates.length > 0) {
+            html += '<div class="sensor-group">';
+            html += '<div class="sensor-header"><span class="sensor-badge ls">' + t('thermal') + '</span><div class="sensor-meta"><span class="sensor-count">' + lsDates.length + ' ' + t('dates_suffix') + '</span><a href="#" class="select-all-link" onclick="toggleSensorDates(\'Landsat 8/9\', this); return false;">' + t('all').toLowerCase() + '</a></div></div>';
+            lsDates.forEach(t => {
+                html += '<div class="date-row"><input type="checkbox" class="date-checkbox" value="' + t.date + '" data-sensor="Landsat 8/9"><span>' + formatDate(t.date) + '</span></div>';
+            });
+            html += '</div>';
+        }
+        cont.innerHTML = html;
+        zoomToAOI();
+
+        const total = s2Dates.length + lsDates.length;
+        const elapsed = ((performance.now() - t0) / 1000).toFixed(1);
+        setStatus(t('status_complete', { total: total, elapsed: elapsed }), "success");
+
+        if (field_id && currentAOI) saveFieldToRecent(field_id, currentAOI, null);
+    }
+}
+
 async function startAnalysis() {
     const fieldInput = document.getElementById('field_id');
     if (!fieldInput.value.trim()) {
@@ -687,84 +923,17 @@ async function startAnalysis() {
 
         setProgress(25);
         const t0 = performance.now();
-        const res = await fetch(API_URL + '/calculate/biomass', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(currentQuery)
+        const cacheKey = resultCacheKey('analysis', currentQuery);
+        const ctx = { field_id, start, end, analysisIndices, displayIndices, manualIndices, t0 };
+        lastAnalysisCacheKey = cacheKey;
+        const { data, fromCache } = await cachedPostJSON('analysis', '/calculate/biomass', currentQuery, function(fresh) {
+            // Re-render only if the user is still looking at this analysis.
+            if (lastAnalysisCacheKey === cacheKey) renderAnalysisResult(fresh, ctx);
         });
 
         setProgress(80);
-
-        if (!res.ok) {
-            const err = await res.json().catch(() => ({}));
-            throw new Error(err.detail || 'Server returned an error (' + res.status + ')');
-        }
-
-        const data = await res.json();
-        lastAnalysisData = data;
-        lastRequestedIndices = displayIndices;
-        lastManualIndexSelection = manualIndices.length > 0;
-        await refreshPersistentStressLayer(field_id, start, end);
-
-        const cont = document.getElementById('dates-container');
-        cont.innerHTML = '';
-
-        buildSummaryPanel(data.period_summary, displayIndices, data.field_condition || null, lastManualIndexSelection);
-        prepareChartData(data.timeseries, displayIndices);
-
-        var allMissing = analysisIndices.every(function(i) { return data.period_summary[i] == null; });
-
-        if (data.timeseries.length === 0 || allMissing) {
-            if (lastManualIndexSelection) {
-                buildWarnings(data.period_summary || {}, displayIndices, 0, 0);
-            } else {
-                document.getElementById('warnings-panel').innerHTML = '';
-            }
-            document.getElementById('summary-panel').innerHTML = '';
-            document.getElementById('dates-container').innerHTML = '';
-            document.getElementById('btn-chart-toggle').style.display = 'none';
-            document.getElementById('btn-load').style.display = 'none';
-            document.querySelector('#result-card label[style]').style.display = 'none';
-            setStatus(t('status_no_images'), "warning");
-        } else {
-            document.getElementById('btn-load').style.display = '';
-            document.querySelector('#result-card label[style]').style.display = '';
-
-            const s2Dates = data.timeseries.filter(t => t.sensor === 'Sentinel-2');
-            const lsDates = data.timeseries.filter(t => t.sensor === 'Landsat 8/9');
-
-            if (lastManualIndexSelection) {
-                buildWarnings(data.period_summary || {}, displayIndices, s2Dates.length, lsDates.length);
-            } else {
-                document.getElementById('warnings-panel').innerHTML = '';
-            }
-
-            let html = '';
-            if (s2Dates.length > 0) {
-                html += '<div class="sensor-group">';
-                html += '<div class="sensor-header"><span class="sensor-badge s2">' + t('optical') + '</span><div class="sensor-meta"><span class="sensor-count">' + s2Dates.length + ' ' + t('dates_suffix') + '</span><a href="#" class="select-all-link" onclick="toggleSensorDates(\'Sentinel-2\', this); return false;">' + t('all').toLowerCase() + '</a></div></div>';
-                s2Dates.forEach(t => {
-                    html += '<div class="date-row"><input type="checkbox" class="date-checkbox" value="' + t.date + '" data-sensor="Sentinel-2"><span>' + formatDate(t.date) + '</span></div>';
-                });
-                html += '</div>';
-            }
-            if (lsDates.length > 0) {
-                html += '<div class="sensor-group">';
-                html += '<div class="sensor-header"><span class="sensor-badge ls">' + t('thermal') + '</span><div class="sensor-meta"><span class="sensor-count">' + lsDates.length + ' ' + t('dates_suffix') + '</span><a href="#" class="select-all-link" onclick="toggleSensorDates(\'Landsat 8/9\', this); return false;">' + t('all').toLowerCase() + '</a></div></div>';
-                lsDates.forEach(t => {
-                    html += '<div class="date-row"><input type="checkbox" class="date-checkbox" value="' + t.date + '" data-sensor="Landsat 8/9"><span>' + formatDate(t.date) + '</span></div>';
-                });
-                html += '</div>';
-            }
-            cont.innerHTML = html;
-            zoomToAOI();
-
-            const total = s2Dates.length + lsDates.length;
-            const elapsed = ((performance.now() - t0) / 1000).toFixed(1);
-            setStatus(t('status_complete', { total: total, elapsed: elapsed }), "success");
-
-            if (field_id && currentAOI) saveFieldToRecent(field_id, currentAOI, null);
-        }
+        await renderAnalysisResult(data, ctx);
+        if (fromCache) console.info('Analysis served from local cache');
         setProgress(100);
         setTimeout(() => setProgress(-1), 800);
     } catch(e) {
@@ -829,13 +998,9 @@ async function loadSelectedLayers() {
     let completedDates = 0, loaded = 0, failed = 0;
 
     const promises = batchRequests.map(({ date, sensor, indices }) =>
-        fetch(API_URL + '/visualize/batch', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ date, sensor, indices, geojson: currentAOI, cloud_cover: 20 })
-        })
-        .then(res => { if (!res.ok) throw new Error('HTTP ' + res.status); return res.json(); })
-        .then(data => ({ status: 'ok', date, sensor, data }))
+        cachedPostJSON('layers', '/visualize/batch', { date, sensor, indices, geojson: currentAOI, cloud_cover: 20 },
+            fresh => refreshOverlayUrls(date, sensor, fresh.layers))
+        .then(({ data }) => ({ status: 'ok', date, sensor, data }))
         .catch(err => ({ status: 'error', date, sensor, error: err }))
     );
 
@@ -863,19 +1028,15 @@ async function loadSelectedLayers() {
             const idx = layer.index_name;
             const sensorNativeScale = sensor === 'Landsat 8/9' ? 30 : 10;
             const nativeScale = Number(layer.native_scale || sensorNativeScale);
-            const tileLayer = L.tileLayer(layer.layer_url, {
-                opacity: 1.0,
-                maxNativeZoom: maxNativeZoomForScale(nativeScale),
-                maxZoom: 22,
-                zIndex: 1000,
-                pane: 'analysisPane'
-            });
-            tileLayer._idxKey = idx;
-            tileLayer._date = date;
-            tileLayer._sensor = sensor;
-            activeLayers.push(tileLayer);
-            const overlayCb = addOverlayToPanel(tileLayer, idx, date, sensor);
-            tileLayer._overlayCb = overlayCb || null;
+            // Only a descriptor is stored; the tile layer is built when its row is switched on.
+            addOverlayDescriptor({
+                url: layer.layer_url,
+                idx: idx,
+                date: date,
+                sensor: sensor,
+                nativeScale: nativeScale,
+                zIndex: 1000
+            }, false);
 
             ensureLegendTab(idx);
 
@@ -886,6 +1047,7 @@ async function loadSelectedLayers() {
         setStatus(t('status_loading_overlays', { done: completedDates, total: totalDates, elapsed: elapsed }), "loading");
     }
 
+    renderOverlayRows();
     if (!layersPanelOpen && loaded > 0) toggleLayersPanel();
 
     setProgress(100);
@@ -1162,7 +1324,14 @@ toggleAboutPanel = function() {
 //  11. ONBOARDING TOUR
 // =========================================================================
 function startOnboardingTour() {
-    if (typeof window.driver === 'undefined') return;
+    if (typeof window.driver === 'undefined') {
+        // driver.js is fetched on first use; do nothing if it cannot be loaded.
+        loadStylesheetOnce(DRIVER_CSS_URL);
+        loadScriptOnce(DRIVER_JS_URL).then(function() {
+            if (typeof window.driver !== 'undefined') startOnboardingTour();
+        }).catch(function(e) { console.error(e); });
+        return;
+    }
     const sidebarEl = document.getElementById('sidebar');
     const layersBodyEl = document.getElementById('lp-body');
     const tourUiState = {
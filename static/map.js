@@ -42,7 +42,7 @@ L.DomEvent.disableClickPropagation(coordDisplayEl);
 const sidebarToggleEl = document.getElementById('sidebar-toggle');
 L.DomEvent.disableClickPropagation(sidebarToggleEl);
 
-let activeLayers = [];   // { layer, idx, date, sensor, label }
+let activeLayers = [];   // live L.tileLayer instances tagged with _idxKey/_date/_sensor
 let aoiLayer = null;
 let currentLegendIdx = null;
 let lastAoiStatusData = null;
@@ -239,14 +239,116 @@ function switchBaseMap(key) {
     baseMaps[key].bringToBack();
 }
 
-function addOverlayToPanel(layer, idx, date, sensor) {
-    const container = document.getElementById('lp-overlays');
-    const section = document.getElementById('lp-overlays-section');
-    const opSection = document.getElementById('lp-opacity-section');
-    section.style.display = 'block';
-    opSection.style.display = 'block';
+// Overlays are kept as lightweight descriptors; an L.tileLayer is created only
+// when its row is switched on, and hidden layers beyond MAX_LIVE_OVERLAYS are
+// dropped least-recently-used first. The panel renders only the rows that are
+// scrolled into view.
+const MAX_LIVE_OVERLAYS = 12;
+const OVERLAY_ROW_HEIGHT = 44;
+const OVERLAY_VIEWPORT_ROWS = 6;
+let overlayDescriptors = [];   // { id, url, idx, date, sensor, nativeScale, zIndex, layer, visible, persistentStress }
+let liveOverlayOrder = [];     // descriptors holding a live layer, least recently used first
+let overlayOpacity = 1.0;
+let overlayRenderQueued = false;
+
+function addOverlayDescriptor(desc, render) {
+    desc.id = 'ol-' + Date.now() + '-' + Math.random().toString(36).slice(2, 6);
+    desc.layer = desc.layer || null;
+    desc.visible = !!desc.visible;
+    desc.zIndex = desc.zIndex || 1000;
+    overlayDescriptors.push(desc);
+    if (desc.layer) {
+        tagOverlayLayer(desc);
+        touchLiveOverlay(desc);
+    }
+    if (render !== false) renderOverlayRows();
+    return desc;
+}
+
+function tagOverlayLayer(desc) {
+    desc.layer._idxKey = desc.idx;
+    desc.layer._date = desc.layer._date || desc.date;
+    desc.layer._sensor = desc.sensor;
+    if (!activeLayers.includes(desc.layer)) activeLayers.push(desc.layer);
+}
+
+function ensureOverlayLayer(desc) {
+    if (desc.layer) return desc.layer;
+    desc.layer = L.tileLayer(desc.url, {
+        opacity: overlayOpacity,
+        maxNativeZoom: maxNativeZoomForScale(desc.nativeScale),
+        maxZoom: 22,
+        zIndex: desc.zIndex,
+        pane: 'analysisPane'
+    });
+    tagOverlayLayer(desc);
+    return desc.layer;
+}
+
+function touchLiveOverlay(desc) {
+    liveOverlayOrder = liveOverlayOrder.filter(d => d !== desc);
+    liveOverlayOrder.push(desc);
+}
+
+function releaseOverlayLayer(desc) {
+    if (!desc.layer) return;
+    if (map.hasLayer(desc.layer)) map.removeLayer(desc.layer);
+    activeLayers = activeLayers.filter(l => l !== desc.layer);
+    liveOverlayOrder = liveOverlayOrder.filter(d => d !== desc);
+    desc.layer = null;
+}
+
+function evictLiveOverlays() {
+    let excess = liveOverlayOrder.length - MAX_LIVE_OVERLAYS;
+    for (const desc of liveOverlayOrder.slice()) {
+        if (excess <= 0) break;
+        if (desc.visible || desc.persistentStress) continue;
+        releaseOverlayLayer(desc);
+        excess--;
+    }
+}
+
+function setOverlayVisible(desc, on) {
+    desc.visible = !!on;
+    if (on) {
+        const layer = ensureOverlayLayer(desc);
+        layer.addTo(map);
+        if (typeof layer.setZIndex === 'function') layer.setZIndex(desc.zIndex);
+        if (typeof layer.bringToFront === 'function') layer.bringToFront();
+        touchLiveOverlay(desc);
+        evictLiveOverlays();
+    } else if (desc.layer) {
+        map.removeLayer(desc.layer);
+    }
+}
+
+function setOverlayUrl(desc, url) {
+    desc.url = url;
+    if (desc.layer) desc.layer.setUrl(url);
+}
+
+// Swap in re-issued tile URLs for one date/sensor after a cache revalidation.
+function refreshOverlayUrls(date, sensor, layers) {
+    (layers || []).forEach(function(layer) {
+        overlayDescriptors
+            .filter(d => d.date === date && d.sensor === sensor && d.idx === layer.index_name)
+            .forEach(d => setOverlayUrl(d, layer.layer_url));
+    });
+}
+
+function removeOverlayDescriptors(predicate) {
+    overlayDescriptors = overlayDescriptors.filter(function(desc) {
+        if (!predicate(desc)) return true;
+        releaseOverlayLayer(desc);
+        return false;
+    });
+    renderOverlayRows();
+}
 
-    const id = 'ol-' + Date.now() + '-' + Math.random().toString(36).slice(2, 6);
+function buildOverlayRow(desc) {
+    const idx = desc.idx;
+    const date = desc.date;
+    const sensor = desc.sensor;
     const info = (typeof getIndexInfo === 'function') ? getIndexInfo(idx) : INDEX_INFO[idx];
     const displayName = idx === 'STRESS_HOTSPOTS'
         ? t('stress_layer_name')
@@ -258,19 +360,18 @@ function addOverlayToPanel(layer, idx, date, sensor) {
     const isRGB = (idx === 'RGB');
     const row = document.createElement('label');
     row.className = 'lp-overlay-row' + (isRGB ? ' lp-rgb-row' : '');
-    row.setAttribute('for', id);
+    row.setAttribute('for', desc.id);
     row.dataset.idx = idx;
     row.dataset.date = date;
-    row.dataset.rawDate = date;
-    row.dataset.rangeDate = (date && date.indexOf('→') !== -1) ? '1' : '0';
+    if (desc.persistentStress) row.dataset.persistentStress = '1';
 
-    const rgbName = t('rgb_scene');
-    const dateLabel = row.dataset.rangeDate === '1' ? date : formatDate(date);
+    const isRangeDate = !!date && date.indexOf('→') !== -1;
+    const dateLabel = isRangeDate ? date : formatDate(date);
     row.innerHTML =
-        '<input type="checkbox" id="' + id + '" class="lp-overlay-cb" data-layer-id="' + id + '">' +
+        '<input type="checkbox" id="' + desc.id + '" class="lp-overlay-cb" data-layer-id="' + desc.id + '">' +
         '<span class="lp-cb-mark"></span>' +
         '<span class="lp-overlay-info">' +
-        '  <span class="lp-overlay-name">' + (isRGB ? rgbName : displayName) + '</span>' +
+        '  <span class="lp-overlay-name">' + (isRGB ? t('rgb_scene') : displayName) + '</span>' +
         '  <span class="lp-overlay-meta">' +
         (showSensorTag ? ('    <span class="lp-sensor ' + sensorCls + '">' + sensorTag + '</span>') : '') +
         '    <span class="lp-date">' + dateLabel + '</span>' +
@@ -278,38 +379,54 @@ function addOverlayToPanel(layer, idx, date, sensor) {
         '</span>';
 
     const cb = row.querySelector('input');
-    cb.addEventListener('change', function() {
-        if (this.checked) {
-            layer.addTo(map);
-            if (typeof layer.setZIndex === 'function') layer.setZIndex(1000);
-            if (typeof layer.bringToFront === 'function') layer.bringToFront();
-        }
-        else              { map.removeLayer(layer); }
-    });
+    cb.checked = desc.visible;
+    cb.addEventListener('change', function() { setOverlayVisible(desc, this.checked); });
+    return row;
+}
 
-    container.appendChild(row);
+function renderOverlayRows() {
+    const container = document.getElementById('lp-overlays');
+    const hasRows = overlayDescriptors.length > 0;
+    document.getElementById('lp-overlays-section').style.display = hasRows ? 'block' : 'none';
+    document.getElementById('lp-opacity-section').style.display = hasRows ? 'block' : 'none';
     updateLayerCount();
-    return cb;
+
+    container.classList.add('lp-overlays-virtual');
+    container.style.height = Math.min(overlayDescriptors.length, OVERLAY_VIEWPORT_ROWS) * OVERLAY_ROW_HEIGHT + 'px';
+    let spacer = container.querySelector('.lp-overlays-spacer');
+    if (!spacer) {
+        spacer = document.createElement('div');
+        spacer.className = 'lp-overlays-spacer';
+        container.appendChild(spacer);
+        container.addEventListener('scroll', queueOverlayRender);
+    }
+    spacer.style.height = (overlayDescriptors.length * OVERLAY_ROW_HEIGHT) + 'px';
+
+    const first = Math.max(0, Math.floor(container.scrollTop / OVERLAY_ROW_HEIGHT) - 2);
+    const last = Math.min(overlayDescriptors.length, first + OVERLAY_VIEWPORT_ROWS + 4);
+    container.querySelectorAll('.lp-overlay-row').forEach(row => row.remove());
+    const frag = document.createDocumentFragment();
+    for (let i = first; i < last; i++) {
+        const row = buildOverlayRow(overlayDescriptors[i]);
+        row.style.top = (i * OVERLAY_ROW_HEIGHT) + 'px';
+        frag.appendChild(row);
+    }
+    container.appendChild(frag);
 }
 
-function refreshOverlayTranslations() {
-    document.querySelectorAll('.lp-overlay-row').forEach(function(row) {
-        const idx = row.dataset.idx;
-        const date = row.dataset.date;
-        const rawDate = row.dataset.rawDate || date;
-        const isRangeDate = row.dataset.rangeDate === '1';
-        if (!idx || !date) return;
-        const info = (typeof getIndexInfo === 'function') ? getIndexInfo(idx) : INDEX_INFO[idx];
-        const displayName = (idx === 'RGB')
-            ? t('rgb_scene')
-            : (idx === 'STRESS_HOTSPOTS' ? t('stress_layer_name') : (info ? info.short : idx));
-        const nameEl = row.querySelector('.lp-overlay-name');
-        const dateEl = row.querySelector('.lp-date');
-        if (nameEl) nameEl.textContent = displayName;
-        if (dateEl) dateEl.textContent = isRangeDate ? rawDate : formatDate(date);
+function queueOverlayRender() {
+    if (overlayRenderQueued) return;
+    overlayRenderQueued = true;
+    requestAnimationFrame(function() {
+        overlayRenderQueued = false;
+        renderOverlayRows();
     });
 }
 
+function refreshOverlayTranslations() {
+    renderOverlayRows();
+}
+
 function renderAoiStatusHtml(payload) {
     if (!payload) return '';
     if (payload.type === 'parcel' && payload.info) {
@@ -348,29 +465,15 @@ function refreshAoiTranslations() {
 }
 
 function clearAllOverlays() {
-    activeLayers = activeLayers.filter(function(layer) {
-        if (layer && layer._persistentStress) return true;
-        map.removeLayer(layer);
-        return false;
-    });
-
-    const overlaysEl = document.getElementById('lp-overlays');
-    overlaysEl.querySelectorAll('.lp-overlay-row').forEach(function(row) {
-        if (row.dataset.persistentStress !== '1') row.remove();
-    });
-
-    const hasRows = overlaysEl.querySelectorAll('.lp-overlay-row').length > 0;
-    document.getElementById('lp-overlays-section').style.display = hasRows ? 'block' : 'none';
-    document.getElementById('lp-opacity-section').style.display = hasRows ? 'block' : 'none';
-    if (!hasRows) {
+    removeOverlayDescriptors(desc => !desc.persistentStress);
+    if (overlayDescriptors.length === 0) {
         document.getElementById('legend-panel').style.display = 'none';
         document.getElementById('legend-tabs').innerHTML = '';
     }
-    updateLayerCount();
 }
 
 function updateLayerCount() {
-    const count = document.querySelectorAll('.lp-overlay-cb').length;
+    const count = overlayDescriptors.length;
     const badge = document.getElementById('lp-count');
     if (count > 0) { badge.innerText = count; badge.style.display = 'inline-flex'; }
     else           { badge.style.display = 'none'; }
@@ -378,6 +481,7 @@ function updateLayerCount() {
 
 function setOverlayOpacity(val) {
     const opacity = val / 100;
+    overlayOpacity = opacity;
     document.getElementById('lp-opacity-val').innerText = val + '%';
     activeLayers.forEach(function(l) {
         if (typeof l.setOpacity === 'function') {
@@ -122,6 +122,64 @@ function formatMeasureArea(sqm) {
 // =========================================================================
 let pixelInspectorActive = false;
 
+// Session cache of pixel responses keyed by query + native grid cell (the
+// server returns the sampled cell's id and corner ring, and omits it when a
+// query failed so errors are not cached), and the single in-flight request
+// (aborted when a click elsewhere supersedes it).
+const PIXEL_CACHE_MAX = 500;
+let pixelValueCache = new Map();
+let pixelCacheAOI = null;
+let pixelInflight = null;
+
+function pixelCellContains(ring, lat, lng) {
+    // Ray casting over the cell's [lat, lng] corners (a UTM square, slightly skewed in lat/lng).
+    let inside = false;
+    for (let i = 0, j = ring.length - 1; i < ring.length; j = i++) {
+        const [yi, xi] = ring[i];
+        const [yj, xj] = ring[j];
+        if ((yi > lat) !== (yj > lat) && lng < (xj - xi) * (lat - yi) / (yj - yi) + xi) inside = !inside;
+    }
+    return inside;
+}
+
+function cachedPixelValues(queryKey, lat, lng) {
+    for (const entry of pixelValueCache.values()) {
+        if (entry.queryKey === queryKey && pixelCellContains(entry.ring, lat, lng)) return entry.data;
+    }
+    return null;
+}
+
+function fetchPixelValues(queryKey, payload) {
+    if (pixelCacheAOI !== currentAOI) {
+        pixelValueCache.clear();
+        pixelCacheAOI = currentAOI;
+    }
+    const cached = cachedPixelValues(queryKey, payload.lat, payload.lng);
+    if (cached) return Promise.resolve(cached);
+    const requestKey = queryKey + '|' + payload.lat + ',' + payload.lng;
+    if (pixelInflight && pixelInflight.key === requestKey) return pixelInflight.promise;
+    if (pixelInflight) pixelInflight.controller.abort();
+
+    const controller = new AbortController();
+    const promise = fetch(API_URL + '/api/pixel-value', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(payload),
+        signal: controller.signal
+    })
+    .then(res => { if (!res.ok) throw new Error('HTTP ' + res.status); return res.json(); })
+    .then(data => {
+        if (data.cell) {
+            pixelValueCache.set(queryKey + '|' + data.cell.id, { queryKey, ring: data.cell.ring, data });
+            if (pixelValueCache.size > PIXEL_CACHE_MAX) pixelValueCache.delete(pixelValueCache.keys().next().value);
+        }
+        return data;
+    })
+    .finally(() => { if (pixelInflight && pixelInflight.key === requestKey) pixelInflight = null; });
+    pixelInflight = { key: requestKey, promise, controller };
+    return promise;
+}
+
 function togglePixelInspector() {
     if (measureMode) cancelMeasure();
     if (pixelInspectorActive) { disablePixelInspector(); }
@@ -224,17 +282,16 @@ async function onPixelInspectClick(e) {
     try {
         const rangeStart = document.getElementById('start_date') ? document.getElementById('start_date').value : '';
         const rangeEnd = document.getElementById('end_date') ? document.getElementById('end_date').value : '';
-        const res = await fetch(API_URL + '/api/pixel-value', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
-                lat, lng, date: queryDate, sensor: querySensor, indices, geojson: currentAOI, cloud_cover: 20,
-                start_date: indices.includes('STRESS_HOTSPOTS') ? rangeStart : null,
-                end_date: indices.includes('STRESS_HOTSPOTS') ? rangeEnd : null
-            })
+        const withStress = indices.includes('STRESS_HOTSPOTS');
+        const cacheKey = [
+            queryDate, querySensor, indices.join(','),
+            withStress ? rangeStart + '/' + rangeEnd : ''
+        ].join('|');
+        const data = await fetchPixelValues(cacheKey, {
+            lat, lng, date: queryDate, sensor: querySensor, indices, geojson: currentAOI, cloud_cover: 20,
+            start_date: withStress ? rangeStart : null,
+            end_date: withStress ? rangeEnd : null
         });
-        if (!res.ok) throw new Error('HTTP ' + res.status);
-        const data = await res.json();
         const headerDateLabel = (indices.includes('STRESS_HOTSPOTS') && rangeStart && rangeEnd)
             ? (rangeStart + ' → ' + rangeEnd)
             : formatDate(queryDate);
@@ -264,6 +321,8 @@ async function onPixelInspectClick(e) {
         html += '</div>';
         popup.setContent(html);
     } catch (err) {
+        // Superseded by a newer click — its popup has already replaced this one.
+        if (err.name === 'AbortError') return;
         popup.setContent('<div style="font-family:Inter,sans-serif;font-size:0.78rem;color:#dc2626;padding:4px;">' + (currentLang() === 'pl' ? 'Błąd: ' : 'Error: ') + err.message + '</div>');
     }
 }
@@ -0,0 +1,11 @@
+import os
+import sys
+
+# The app is a set of flat top-level modules; make them importable from tests/.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Never touch a configured database: database.py reads these at import
+# (before .env, which does not override them).  Tests build their own
+# SQLite engines.
+os.environ["DATABASE_URL"] = "sqlite://"
+os.environ["DB_ASYNC"] = "0"
@@ -0,0 +1,197 @@
+"""
+index_engine must produce what the Earth Engine graphs in index_registry
+compute.  The registry builders are run against a float64 NumPy stand-in
+for ee.Image, so the formulas GEE receives are evaluated here without
+GEE and compared with the float32 engine.
+"""
+
+import re
+import types
+
+import numpy as np
+import pytest
+
+import index_engine
+import index_registry
+
+
+class FakeImage:
+    """The subset of ee.Image used by build_s2 / build_landsat, on float64 arrays."""
+
+    def __init__(self, bands):
+        self.bands = {k: np.asarray(v, dtype=np.float64) for k, v in bands.items()}
+
+    @classmethod
+    def constant(cls, value):
+        return value if isinstance(value, FakeImage) else cls({"constant": value})
+
+    @property
+    def _only(self):
+        (arr,) = self.bands.values()
+        return arr
+
+    @staticmethod
+    def _value(other):
+        return other._only if isinstance(other, FakeImage) else other
+
+    def _wrap(self, arr):
+        return FakeImage({"v": arr})
+
+    def select(self, name):
+        return FakeImage({name: self.bands[name]})
+
+    def rename(self, name):
+        return FakeImage({name: self._only})
+
+    def normalizedDifference(self, names):
+        a, b = self.bands[names[0]], self.bands[names[1]]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self._wrap((a - b) / (a + b))
+
+    def expression(self, expr):
+        # Compiled registry expressions reference bands as b('NAME').
+        code = re.sub(r"b\('([^']+)'\)", r"_b['\1']", expr)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self._wrap(eval(code, {"_b": self.bands}))
+
+    def subtract(self, other):
+        return self._wrap(self._only - self._value(other))
+
+    def add(self, other):
+        return self._wrap(self._only + self._value(other))
+
+    def multiply(self, other):
+        return self._wrap(self._only * self._value(other))
+
+    def divide(self, other):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self._wrap(self._only / self._value(other))
+
+    def max(self, other):
+        return self._wrap(np.maximum(self._only, self._value(other)))
+
+
+def _as_nan(arr):
+    """GEE masks inf / NaN results of a division; the engine writes NaN."""
+    arr = np.array(arr, dtype=np.float64)
+    arr[~np.isfinite(arr)] = np.nan
+    return arr
+
+
+def _s2_bands(rng, shape=(16, 16)):
+    """Random L2A reflectance ×10000; blue stays low, as it does over land,
+    so the EVI denominator never cancels (where float32 and float64 part ways)."""
+    names = ("B3", "B4", "B5", "B6", "B7", "B8", "B11", "B12")
+    bands = {b: rng.uniform(100, 6000, shape).astype(np.float32) for b in names}
+    bands["B2"] = rng.uniform(100, 800, shape).astype(np.float32)
+    return bands
+
+
+def test_every_registry_index_has_an_engine_formula():
+    assert index_registry.S2_INDICES == set(index_engine._S2_FORMULAS)
+    assert index_registry.LANDSAT_NEEDS_MINMAX == index_engine.LANDSAT_NEEDS_MINMAX
+    for name, bands in index_engine.S2_BANDS_FOR.items():
+        assert set(bands) == set(index_registry.BY_NAME[name].bands)
+
+
+@pytest.mark.parametrize("index", sorted(index_registry.S2_INDICES))
+def test_s2_index_matches_gee_graph(index):
+    bands = _s2_bands(np.random.default_rng(1))
+    expected = index_registry.build_s2(FakeImage(bands), [index])[index]._only
+    got = index_engine.compute_s2_indices(bands, [index])[index]
+    assert got.dtype == np.float32
+    np.testing.assert_allclose(got, expected, rtol=2e-5, atol=1e-6)
+
+
+def test_s2_zero_denominator_is_masked():
+    bands = _s2_bands(np.random.default_rng(2), shape=(2, 2))
+    bands["B8"][0, 0] = bands["B4"][0, 0] = 0.0          # NDVI 0 / 0
+    bands["B5"][0, 1] = 0.0                                 # CIre x / 0
+    out = index_engine.compute_s2_indices(bands, ["NDVI", "CIre"])
+    assert np.isnan(out["NDVI"][0, 0]) and np.isnan(out["CIre"][0, 1])
+    assert np.isfinite(out["NDVI"][1, 1]) and np.isfinite(out["CIre"][1, 1])
+
+
+def test_s2_cloud_mask_keeps_clear_scl_classes():
+    bands = _s2_bands(np.random.default_rng(3), shape=(1, 12))
+    bands["SCL"] = np.arange(12, dtype=np.float32).reshape(1, 12)
+    ndvi = index_engine.compute_s2_indices(bands, ["NDVI"])["NDVI"][0]
+    clear = [c for c in range(12) if not np.isnan(ndvi[c])]
+    assert clear == list(index_engine.S2_CLEAR_SCL)
+
+
+def test_landsat_cloud_mask_and_scale():
+    qa = np.array([[0, 1 << 1, 1 << 3, 1 << 4, 1 << 6]], dtype=np.uint16)
+    raw = {"SR_B4": np.full(qa.shape, 10000, np.uint16), "ST_B10": np.full(qa.shape, 45000, np.uint16),
+           "QA_PIXEL": qa}
+    out = index_engine.mask_landsat(raw)
+    assert np.isnan(out["SR_B4"][0, 1:4]).all()
+    np.testing.assert_allclose(out["SR_B4"][0, [0, 4]], 10000 * 0.0000275 - 0.2, rtol=1e-6)
+    np.testing.assert_allclose(out["ST_B10"][0, [0, 4]], 45000 * 0.00341802 + 149.0, rtol=1e-6)
+
+
+@pytest.fixture
+def landsat_scaled():
+    rng = np.random.default_rng(4)
+    shape = (12, 12)
+    return {
+        "SR_B4": rng.uniform(0.02, 0.15, shape).astype(np.float32),
+        "SR_B5": rng.uniform(0.15, 0.45, shape).astype(np.float32),
+        "ST_B10": rng.uniform(288.0, 318.0, shape).astype(np.float32),
+    }
+
+
+def _registry_landsat(monkeypatch, bands, indices, minmax):
+    """build_landsat on FakeImage with the AOI min/max reduction replaced by *minmax*."""
+    monkeypatch.setattr(index_registry, "ee", types.SimpleNamespace(Image=FakeImage))
+    monkeypatch.setattr(index_registry, "landsat_minmax", lambda *a, **k: tuple(
+        FakeImage.constant(minmax[k]) for k in ("ndvi_l_min", "ndvi_l_max", "lst_c_min", "lst_c_max")))
+    out = index_registry.build_landsat(FakeImage(bands), indices, region=object())
+    return {k: v._only for k, v in out.items()}
+
+
+@pytest.mark.parametrize("index", sorted(index_registry.LANDSAT_INDICES))
+def test_landsat_index_matches_gee_graph(monkeypatch, landsat_scaled, index):
+    mm = index_engine.landsat_minmax(
+        index_engine.normalized_difference(landsat_scaled["SR_B5"], landsat_scaled["SR_B4"]),
+        landsat_scaled["ST_B10"] - np.float32(273.15))
+    expected = _registry_landsat(monkeypatch, landsat_scaled, [index], mm)[index]
+    got = index_engine.compute_landsat_indices(landsat_scaled, [index], minmax=mm)[index]
+    np.testing.assert_allclose(got, _as_nan(expected), rtol=1e-4, atol=1e-4)
+
+
+def test_landsat_uses_given_minmax_and_floors_the_range(monkeypatch, landsat_scaled):
+    # A flat scene: the range is floored at 0.001 in both implementations.
+    mm = {"ndvi_l_min": 0.4, "ndvi_l_max": 0.4, "lst_c_min": 30.0, "lst_c_max": 30.0}
+    names = ["TVDI", "TCI", "VHI"]
+    expected = _registry_landsat(monkeypatch, landsat_scaled, names, mm)
+    got = index_engine.compute_landsat_indices(landsat_scaled, names, minmax=mm)
+    for name in names:
+        np.testing.assert_allclose(got[name], expected[name], rtol=1e-3)
+
+
+def test_landsat_minmax_respects_region_mask():
+    ndvi = np.array([[0.1, 0.9], [0.5, np.nan]], dtype=np.float32)
+    lst = np.array([[20.0, 40.0], [30.0, 25.0]], dtype=np.float32)
+    mask = np.array([[True, False], [True, True]])
+    mm = index_engine.landsat_minmax(ndvi, lst, mask)
+    assert mm == pytest.approx({"ndvi_l_min": 0.1, "ndvi_l_max": 0.5, "lst_c_min": 20.0, "lst_c_max": 30.0})
+
+
+def test_stress_hotspots_is_bounded_and_masked():
+    rng = np.random.default_rng(5)
+    s2 = {b: rng.uniform(100, 6000, (9, 9)).astype(np.float32) for b in ("B4", "B8", "B11")}
+    region = np.ones((9, 9), dtype=bool)
+    region[0, 0] = False
+    stress, scale = index_engine.stress_hotspots(s2_bands=s2, region_mask=region)
+    assert scale == 10
+    assert np.isnan(stress[0, 0])
+    inside = stress[region]
+    assert np.isfinite(inside).all() and (inside >= 0).all() and (inside <= 1).all()
+
+
+def test_focal_mean_ignores_nan():
+    values = np.ones((5, 5), dtype=np.float32)
+    values[2, 2] = np.nan
+    out = index_engine.focal_mean(values, 1)
+    np.testing.assert_allclose(out, 1.0)
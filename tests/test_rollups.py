@@ -0,0 +1,135 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+import models
+import rollups
+import services
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'rollups.db'}")
+    models.Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+def _save(db, field_id, points, sensor="Sentinel-2"):
+    """points: {date: {index: value}}"""
+    services.save_results_to_db(db, {
+        "metadata": {"field_id": field_id},
+        "timeseries": [{"date": d, "sensor": sensor, "values": v} for d, v in points.items()],
+    })
+
+
+def _rollups(db, field_id, period, index="NDVI"):
+    return {r["period_start"]: r for r in rollups.query_rollups(db, [field_id], period, [index])}
+
+
+# ---- bucket boundaries -----------------------------------------------------
+
+@pytest.mark.parametrize("day, week, month", [
+    (date(2024, 5, 6), date(2024, 5, 6), date(2024, 5, 1)),      # Monday
+    (date(2024, 5, 12), date(2024, 5, 6), date(2024, 5, 1)),     # Sunday
+    (date(2024, 5, 1), date(2024, 4, 29), date(2024, 5, 1)),     # week starts in April
+    (date(2025, 1, 1), date(2024, 12, 30), date(2025, 1, 1)),    # week starts in the old year
+])
+def test_period_start(day, week, month):
+    assert rollups.period_start(day, "week") == week
+    assert rollups.period_start(day, "month") == month
+
+
+def test_period_end_and_labels():
+    assert rollups._period_end(date(2024, 2, 1), "month") == date(2024, 2, 29)
+    assert rollups._period_end(date(2023, 12, 1), "month") == date(2023, 12, 31)
+    assert rollups._period_end(date(2024, 12, 30), "week") == date(2025, 1, 5)
+    assert rollups.period_label(date(2024, 12, 30), "week") == "2025-W01"
+    assert rollups.period_label(date(2024, 2, 1), "month") == "2024-02"
+
+
+# ---- refresh on save -------------------------------------------------------
+
+def test_save_refreshes_week_and_month(db):
+    _save(db, 1, {"2024-04-29": {"NDVI": 0.2}, "2024-05-02": {"NDVI": 0.4}, "2024-05-20": {"NDVI": 0.9}})
+
+    weeks = _rollups(db, 1, "week")
+    assert set(weeks) == {"2024-04-29", "2024-05-20"}
+    assert weeks["2024-04-29"]["count"] == 2
+    assert weeks["2024-04-29"]["mean"] == pytest.approx(0.3)
+    assert weeks["2024-04-29"]["label"] == "2024-W18"
+
+    months = _rollups(db, 1, "month")
+    assert months["2024-04-01"]["count"] == 1
+    assert months["2024-05-01"] == {**months["2024-05-01"], "count": 2, "min": 0.4, "max": 0.9,
+                                    "mean": pytest.approx(0.65)}
+
+
+def test_overwritten_value_is_not_counted_twice(db):
+    _save(db, 1, {"2024-05-06": {"NDVI": 0.2}, "2024-05-07": {"NDVI": 0.4}})
+    _save(db, 1, {"2024-05-07": {"NDVI": 0.8}})          # same date and sensor: upsert
+
+    week = _rollups(db, 1, "week")["2024-05-06"]
+    assert week["count"] == 2
+    assert week["mean"] == pytest.approx(0.5)
+    assert (week["min"], week["max"]) == (0.2, 0.8)
+
+
+def test_partial_save_rebuilds_the_whole_bucket(db):
+    _save(db, 1, {"2024-05-06": {"NDVI": 0.2}})
+    _save(db, 1, {"2024-05-10": {"NDVI": 0.6}})          # later save, same week and month
+
+    assert _rollups(db, 1, "week")["2024-05-06"]["count"] == 2
+    assert _rollups(db, 1, "month")["2024-05-01"]["mean"] == pytest.approx(0.4)
+
+
+def test_null_values_and_sensors_are_kept_apart(db):
+    _save(db, 1, {"2024-05-06": {"NDVI": 0.5, "NDMI": None}})
+    _save(db, 1, {"2024-05-07": {"LST": 25.0}}, sensor="Landsat 8/9")
+
+    assert _rollups(db, 1, "week", "NDMI") == {}
+    lst = rollups.query_rollups(db, [1], "week", ["LST"])
+    assert [(r["sensor"], r["count"]) for r in lst] == [("Landsat 8/9", 1)]
+    ndvi = rollups.query_rollups(db, [1], "week", ["NDVI"], sensor="Sentinel-2")
+    assert [r["count"] for r in ndvi] == [1]
+
+
+def test_other_fields_are_untouched(db):
+    _save(db, 1, {"2024-05-06": {"NDVI": 0.2}})
+    _save(db, 2, {"2024-05-06": {"NDVI": 0.9}})
+    assert _rollups(db, 1, "week")["2024-05-06"]["mean"] == pytest.approx(0.2)
+    assert _rollups(db, 2, "week")["2024-05-06"]["mean"] == pytest.approx(0.9)
+
+
+def test_rebuild_matches_incremental_refresh(db):
+    _save(db, 1, {"2024-04-29": {"NDVI": 0.2, "NDMI": 0.1}, "2024-05-02": {"NDVI": 0.4}})
+    _save(db, 2, {"2024-05-20": {"NDVI": 0.9}})
+    _save(db, 1, {"2024-05-02": {"NDVI": 0.5}})
+    incremental = {p: rollups.query_rollups(db, [1, 2], p) for p in rollups.PERIODS}
+
+    rollups.rebuild(db.connection(), chunk_rows=1)
+    db.commit()
+    assert {p: rollups.query_rollups(db, [1, 2], p) for p in rollups.PERIODS} == incremental
+
+
+# ---- reads -----------------------------------------------------------------
+
+def test_query_filters_by_date_range(db):
+    _save(db, 1, {"2024-04-29": {"NDVI": 0.2}, "2024-05-20": {"NDVI": 0.9}})
+    rows = rollups.query_rollups(db, [1], "month", ["NDVI"], start_date="2024-05-15")
+    assert [r["period_start"] for r in rows] == ["2024-05-01"]      # the bucket containing the start
+    rows = rollups.query_rollups(db, [1], "week", ["NDVI"], end_date="2024-05-01")
+    assert [r["period_start"] for r in rows] == ["2024-04-29"]
+
+
+@pytest.mark.parametrize("kwargs, message", [
+    ({"field_ids": [1], "period": "day"}, "period"),
+    ({"field_ids": [], "period": "week"}, "field_id"),
+    ({"field_ids": [1], "period": "week", "indices": ["XYZ"]}, "Unknown indices"),
+])
+def test_query_rejects_bad_arguments(db, kwargs, message):
+    with pytest.raises(ValueError, match=message):
+        rollups.query_rollups(db, **kwargs)
@@ -0,0 +1,77 @@
+import statistics
+
+import numpy as np
+import pytest
+
+from timeseries import STAT_KEYS, TimeSeries
+
+RECORDS = [
+    {"date": "2024-05-10", "sensor": "Sentinel-2", "values": {"NDVI": 0.61, "NDMI": 0.12},
+     "spatial": {"NDVI": {"std_dev": 0.05}, "NDMI": {"std_dev": 0.02}}},
+    {"date": "2024-05-02", "sensor": "Sentinel-2", "values": {"NDVI": 0.42, "NDMI": None}},
+    {"date": "2024-05-02", "sensor": "Landsat 8/9", "values": {"LST": 24.5}},
+    {"date": "2024-05-20", "sensor": "Sentinel-2", "values": {"NDVI": 0.70, "NDMI": 0.20}},
+]
+
+
+def _percentile(values, q):
+    """Linear interpolation between closest ranks (numpy's default)."""
+    values = sorted(values)
+    pos = (len(values) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (pos - lo)
+
+
+def test_from_records_orders_by_date_then_sensor():
+    ts = TimeSeries.from_records(RECORDS)
+    assert list(ts.dates) == ["2024-05-02", "2024-05-02", "2024-05-10", "2024-05-20"]
+    assert list(ts.sensors) == ["Landsat 8/9", "Sentinel-2", "Sentinel-2", "Sentinel-2"]
+    assert ts.indices == ["NDVI", "NDMI", "LST"]
+    assert np.isnan(ts.column("NDMI")[1])          # None is a gap, not 0
+    assert ts.spatial[2]["NDVI"] == {"std_dev": 0.05}
+
+
+def test_period_stats_match_reference():
+    ts = TimeSeries.from_records(RECORDS)
+    stats = ts.period_stats()
+    ndvi = [0.61, 0.42, 0.70]
+    expected = {
+        "mean": statistics.fmean(ndvi),
+        "min": min(ndvi),
+        "max": max(ndvi),
+        "std_dev": statistics.stdev(ndvi),
+        "median": statistics.median(ndvi),
+        "p10": _percentile(ndvi, 10),
+        "p90": _percentile(ndvi, 90),
+    }
+    for key in STAT_KEYS:
+        assert stats["NDVI"][key] == pytest.approx(expected[key], abs=1e-4), key
+    assert stats["NDVI"]["count"] == 3
+    assert stats["NDMI"]["count"] == 2
+    assert stats["LST"] == {**{k: pytest.approx(24.5) for k in ("mean", "min", "max", "median", "p10", "p90")},
+                            "std_dev": 0.0, "count": 1}
+    assert ts.summary(stats) == {name: stats[name]["mean"] for name in ts.indices}
+
+
+def test_index_without_observations_reduces_to_none():
+    ts = TimeSeries.from_records(RECORDS[:1], ["NDVI", "EVI"])
+    stats = ts.period_stats()
+    assert stats["EVI"] == {**dict.fromkeys(STAT_KEYS), "count": 0}
+
+
+def test_empty_series():
+    ts = TimeSeries.from_records([], ["NDVI"])
+    assert len(ts) == 0
+    assert ts.period_stats() == {"NDVI": {**dict.fromkeys(STAT_KEYS), "count": 0}}
+    assert ts.to_records() == []
+
+
+def test_records_round_trip_drops_gaps():
+    ts = TimeSeries.from_records(RECORDS)
+    records = ts.to_records()
+    assert records[1] == {"date": "2024-05-02", "sensor": "Sentinel-2",
+                          "values": {"NDVI": 0.42}, "spatial": {}}
+    assert records[2]["spatial"] == {"NDVI": {"std_dev": 0.05}, "NDMI": {"std_dev": 0.02}}
+    again = TimeSeries.from_records(records, ts.indices)
+    np.testing.assert_array_equal(again.values, ts.values)
@@ -0,0 +1,130 @@
+"""
+Columnar time series of per-date index values.
+
+One analysis produces a handful of dates × up to 15 indices.  Instead of a
+list of {"date", "sensor", "values"} dicts plus per-index Python lists,
+results are held as:
+
+    dates    np.ndarray[str]          (n,)
+    sensors  np.ndarray[str]          (n,)
+    values   np.ndarray[float32]      (n_indices, n)   NaN = no value
+    spatial  list[dict]               (n,)  within-field distribution per date
+
+Period statistics for every index are then computed in one vectorised
+pass over the matrix, and the same object is used to serialise the
+response timeseries and to feed DB persistence.
+"""
+
+import warnings
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+STAT_KEYS = ("mean", "min", "max", "std_dev", "median", "p10", "p90")
+_DECIMALS = 4
+
+
+def _round(value) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), _DECIMALS)
+
+
+class TimeSeries:
+    """Dates × indices matrix of observations (float32, NaN for gaps)."""
+
+    __slots__ = ("indices", "dates", "sensors", "values", "spatial", "_row")
+
+    def __init__(self, indices: List[str], dates=(), sensors=(), values: Optional[np.ndarray] = None,
+                 spatial: Optional[List[dict]] = None):
+        self.indices = list(indices)
+        self._row = {name: i for i, name in enumerate(self.indices)}
+        self.dates = np.asarray(dates, dtype=str)
+        self.sensors = np.asarray(sensors, dtype=str)
+        if values is None:
+            values = np.full((len(self.indices), len(self.dates)), np.nan, dtype=np.float32)
+        self.values = np.asarray(values, dtype=np.float32)
+        # Per-date {index: {std_dev, p10, p50, p90, count[, histogram]}}; too
+        # ragged for a matrix, so it rides along as one dict per date.
+        self.spatial = list(spatial) if spatial is not None else [{} for _ in range(len(self.dates))]
+
+    # ---- construction ------------------------------------------------------
+
+    @classmethod
+    def from_records(cls, records: List[dict], indices: Optional[List[str]] = None) -> "TimeSeries":
+        """Build from {"date", "sensor", "values"[, "spatial"]} records, sorted by date then sensor.
+
+        *indices* fixes the row order; by default every index seen in
+        *records* is included, in first-seen order.
+        """
+        if indices is None:
+            indices = list(dict.fromkeys(k for rec in records for k in rec.get("values", {})))
+        ts = cls(indices, [r["date"] for r in records], [r.get("sensor", "") for r in records],
+                 spatial=[r.get("spatial") or {} for r in records])
+        for col, rec in enumerate(records):
+            for name, v in rec.get("values", {}).items():
+                row = ts._row.get(name)
+                if row is not None and v is not None:
+                    ts.values[row, col] = v
+        order = np.lexsort((ts.sensors, ts.dates))
+        ts.dates, ts.sensors, ts.values = ts.dates[order], ts.sensors[order], ts.values[:, order]
+        ts.spatial = [ts.spatial[i] for i in order]
+        return ts
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def column(self, name: str) -> np.ndarray:
+        """Observations of one index across all dates (NaN where missing)."""
+        return self.values[self._row[name]]
+
+    # ---- statistics --------------------------------------------------------
+
+    def period_stats(self) -> Dict[str, dict]:
+        """mean / min / max / std_dev / median / p10 / p90 / count per index.
+
+        All indices are reduced together along the date axis.  std_dev is
+        the sample standard deviation (0.0 for a single observation);
+        percentiles use linear interpolation between closest ranks.
+        """
+        counts = np.count_nonzero(~np.isnan(self.values), axis=1)
+        if not len(self.dates):
+            return {name: {**dict.fromkeys(STAT_KEYS), "count": 0} for name in self.indices}
+
+        data = self.values.astype(np.float64)
+        with warnings.catch_warnings():
+            # Indices without any observation reduce to NaN → None.
+            warnings.simplefilter("ignore", RuntimeWarning)
+            mean = np.nanmean(data, axis=1)
+            vmin = np.nanmin(data, axis=1)
+            vmax = np.nanmax(data, axis=1)
+            std = np.nanstd(data, axis=1, ddof=1)
+            p10, median, p90 = np.nanpercentile(data, (10, 50, 90), axis=1)
+        std = np.where(counts == 1, 0.0, std)
+
+        columns = (mean, vmin, vmax, std, median, p10, p90)
+        return {
+            name: {**{key: _round(col[i]) for key, col in zip(STAT_KEYS, columns)},
+                   "count": int(counts[i])}
+            for i, name in enumerate(self.indices)
+        }
+
+    def summary(self, stats: Optional[Dict[str, dict]] = None) -> Dict[str, Optional[float]]:
+        """Period mean per index (the legacy `period_summary` shape)."""
+        stats = stats if stats is not None else self.period_stats()
+        return {name: stats[name]["mean"] for name in self.indices}
+
+    # ---- row access / serialisation ----------------------------------------
+
+    def rows(self) -> Iterator[Tuple[str, str, Dict[str, float], dict]]:
+        """Yield (date, sensor, {index: value}, spatial) with gaps left out."""
+        present = ~np.isnan(self.values)
+        for col in range(len(self.dates)):
+            values = {
+                self.indices[row]: round(float(self.values[row, col]), _DECIMALS)
+                for row in np.flatnonzero(present[:, col])
+            }
+            spatial = {k: v for k, v in self.spatial[col].items() if k in values}
+            yield str(self.dates[col]), str(self.sensors[col]), values, spatial
+
+    def to_records(self) -> List[dict]:
+        """Response `timeseries` list: [{"date", "sensor", "values", "spatial"}, ...]."""
+        return [{"date": d, "sensor": s, "values": v, "spatial": sp} for d, s, v, sp in self.rows()]
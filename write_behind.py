@@ -0,0 +1,197 @@
+"""
+Write-behind persistence for analysis results.
+
+Endpoints hand finished results to `queue.enqueue()` and return at once;
+a background thread writes them with save_results_to_db.  Results that
+arrive close together are written in one session and one commit, so a
+slow or unreachable database no longer delays or fails the HTTP response.
+
+Failures:
+  Connection errors (OperationalError / DisconnectionError) keep the
+  batch and retry it with exponential backoff (capped at 60 s) for as
+  long as the database is down; results arriving meanwhile wait in the
+  queue, which is bounded only by WRITE_BEHIND_MAX_QUEUE.  On any other
+  error (bad data, IntegrityError) the batch is written again one result
+  at a time; a result that still fails that way is logged and dropped
+  (counted in `failed`), so one bad result never blocks the results
+  queued behind it.
+
+Every result the server persists goes through this queue, so the writer
+thread is the only connection writing to the database: with SQLite in
+WAL mode (database.SQLITE_PRAGMAS) reads run concurrently with it and
+parallel analyses never contend for the write lock.
+
+main.py starts the writer in the FastAPI lifespan and calls `stop()` on
+shutdown, which flushes what is still queued (up to
+WRITE_BEHIND_FLUSH_TIMEOUT_S).  `stats()` reports queue depth and lag
+(age of the oldest unwritten result).
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from sqlalchemy import exc
+
+import database
+
+log = logging.getLogger(__name__)
+
+WRITE_BEHIND_MAX_BATCH = int(os.getenv("WRITE_BEHIND_MAX_BATCH", "20"))
+WRITE_BEHIND_MAX_DELAY_S = float(os.getenv("WRITE_BEHIND_MAX_DELAY_S", "0.5"))
+WRITE_BEHIND_MAX_QUEUE = int(os.getenv("WRITE_BEHIND_MAX_QUEUE", "10000"))
+WRITE_BEHIND_FLUSH_TIMEOUT_S = float(os.getenv("WRITE_BEHIND_FLUSH_TIMEOUT_S", "30"))
+_BACKOFF_INITIAL_S = 1.0
+_BACKOFF_MAX_S = 60.0
+# Errors worth retrying as a whole batch: the database is unreachable or busy.
+_TRANSIENT_ERRORS = (exc.OperationalError, exc.DisconnectionError)
+
+
+class WriteBehindQueue:
+    """In-process FIFO of results drained by one writer thread."""
+
+    def __init__(self, max_batch: int = WRITE_BEHIND_MAX_BATCH,
+                 max_delay_s: float = WRITE_BEHIND_MAX_DELAY_S,
+                 max_queue: int = WRITE_BEHIND_MAX_QUEUE):
+        self.max_batch = max_batch
+        self.max_delay_s = max_delay_s
+        self.max_queue = max_queue
+        self._items: deque = deque()           # (enqueued_at, result)
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._in_flight = 0
+        self._in_flight_since: Optional[float] = None
+        self._written = 0
+        self._dropped = 0
+        self._failed = 0
+        self._failures = 0
+        self._last_error: Optional[str] = None
+
+    # ---- lifecycle ---------------------------------------------------------
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = WRITE_BEHIND_FLUSH_TIMEOUT_S) -> None:
+        """Flush queued results and stop the writer (gives up after *timeout*)."""
+        if self._thread is None:
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            log.error("Write-behind flush timed out; %d result(s) not persisted.", len(self._items))
+        self._thread = None
+
+    # ---- public API --------------------------------------------------------
+
+    def enqueue(self, result: dict) -> None:
+        """Queue *result* for persistence; raises ValueError when it cannot be stored."""
+        import services
+
+        services.result_rows(result)
+        with self._cond:
+            if len(self._items) >= self.max_queue:
+                self._items.popleft()
+                self._dropped += 1
+                log.error("Write-behind queue full; dropped the oldest result.")
+            self._items.append((time.time(), result))
+            self._cond.notify()
+
+    def stats(self) -> dict:
+        with self._cond:
+            oldest = self._in_flight_since or (self._items[0][0] if self._items else None)
+            return {
+                "running": self._thread is not None,
+                "depth": len(self._items) + self._in_flight,
+                "lag_s": round(time.time() - oldest, 3) if oldest is not None else 0.0,
+                "written": self._written,
+                "dropped": self._dropped,
+                "failed": self._failed,
+                "failed_attempts": self._failures,
+                "last_error": self._last_error,
+            }
+
+    # ---- writer thread -----------------------------------------------------
+
+    def _next_batch(self) -> list:
+        with self._cond:
+            while not self._items and not self._stopping:
+                self._cond.wait()
+            # Give requests arriving close together a moment to join the batch.
+            deadline = time.time() + self.max_delay_s
+            while (len(self._items) < self.max_batch and not self._stopping
+                   and time.time() < deadline):
+                self._cond.wait(deadline - time.time())
+            batch = [self._items.popleft() for _ in range(min(self.max_batch, len(self._items)))]
+            self._in_flight = len(batch)
+            self._in_flight_since = batch[0][0] if batch else None
+            return batch
+
+    def _write(self, batch: list) -> None:
+        import services
+
+        with database.SessionLocal() as db:
+            try:
+                for _, result in batch:
+                    services.save_results_to_db(db, result, commit=False)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+
+    def _record_failure(self, exc: Exception) -> None:
+        self._failures += 1
+        self._last_error = f"{type(exc).__name__}: {exc}"
+
+    def _write_batch(self, batch: list) -> int:
+        """Write *batch*; returns how many results were given up on.
+
+        Transient errors never give up: the batch is retried until the
+        database is back.
+        """
+        backoff = _BACKOFF_INITIAL_S
+        while True:
+            try:
+                self._write(batch)
+                return 0
+            except _TRANSIENT_ERRORS as exc:
+                self._record_failure(exc)
+                log.warning("Write-behind batch of %d failed (%s); retrying in %.0fs.",
+                            len(batch), exc, backoff)
+                time.sleep(backoff)
+                backoff = min(backoff * 2, _BACKOFF_MAX_S)
+            except Exception as exc:
+                self._record_failure(exc)
+                break
+        if len(batch) == 1:
+            log.error("Write-behind dropped the result of field %s: %s",
+                      batch[0][1]["metadata"]["field_id"], self._last_error)
+            return 1
+        # Isolate the result(s) that cannot be written; the rest still go in.
+        log.warning("Write-behind batch of %d failed; writing its results one by one.", len(batch))
+        return sum(self._write_batch([item]) for item in batch)
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return   # stopping and drained
+            failed = self._write_batch(batch)
+            with self._cond:
+                self._written += len(batch) - failed
+                self._failed += failed
+                self._in_flight = 0
+                self._in_flight_since = None
+
+
+queue = WriteBehindQueue()
@@ -0,0 +1,162 @@
+"""
+Management zones for zonal statistics.
+
+A zoning is either a regular grid laid over the AOI or a set of uploaded
+zone polygons.  Both are normalised to a list of
+{"id", "geometry", "area_m2"} dicts with WGS-84 GeoJSON geometries that
+services.py turns into one ee.FeatureCollection and reduces with a single
+reduceRegions call per date.
+
+Grid handling:
+  Cells are square in the UTM zone of the AOI centroid (same CRS choice as
+  pixel_cache.py), snapped to multiples of the cell size and clipped to
+  the AOI, so a 20 m grid lines up with Sentinel-2 pixel pairs.  Cells
+  whose clipped area is under MIN_CELL_FRACTION of a full cell are
+  dropped.
+
+Zonal results are cached per (field, geometry, zoning, date, sensor,
+cloud cover, indices) in a small in-process LRU, so repeated prescription
+runs over the same zoning do not go back to GEE.
+"""
+
+import hashlib
+import json
+import math
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import shapely
+from pyproj import Transformer
+from shapely.geometry import box, mapping, shape
+from shapely.ops import transform as transform_geom
+
+import pixel_cache
+
+MAX_ZONES = 5000
+MIN_CELL_SIZE_M = 10.0
+MIN_CELL_FRACTION = 0.05
+ZONE_CACHE_MAX_ENTRIES = int(os.getenv("ZONE_CACHE_MAX_ENTRIES", "256"))
+
+
+def zoning_key(grid_size_m: Optional[float], zones_geojson: Optional[dict]) -> str:
+    """Short stable id of a zoning ("grid20" or a hash of the zone polygons)."""
+    if zones_geojson:
+        raw = json.dumps(zones_geojson, sort_keys=True, separators=(",", ":"))
+        return "zones-" + hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+    return f"grid{grid_size_m:g}"
+
+
+def grid_zones(geojson: dict, cell_size_m: float) -> list:
+    """Split the AOI into square cells of *cell_size_m* metres, clipped to the AOI."""
+    if cell_size_m < MIN_CELL_SIZE_M:
+        raise ValueError(f"grid_size_m must be at least {MIN_CELL_SIZE_M:g} m.")
+    aoi = shape(geojson)
+    centroid = aoi.centroid
+    crs = pixel_cache._utm_crs_for(centroid.x, centroid.y)
+    to_utm = pixel_cache._to_grid_crs(crs)
+    to_wgs = Transformer.from_crs(crs, "EPSG:4326", always_xy=True)
+
+    aoi_utm = transform_geom(to_utm.transform, aoi)
+    min_x, min_y, max_x, max_y = aoi_utm.bounds
+    x0 = math.floor(min_x / cell_size_m) * cell_size_m
+    y0 = math.floor(min_y / cell_size_m) * cell_size_m
+    cols = max(1, math.ceil((max_x - x0) / cell_size_m))
+    rows = max(1, math.ceil((max_y - y0) / cell_size_m))
+    if cols * rows > MAX_ZONES * 4:
+        raise ValueError(f"Grid of {cols}x{rows} cells is too large; use a bigger grid_size_m.")
+
+    cells = [
+        box(x0 + c * cell_size_m, y0 + r * cell_size_m,
+            x0 + (c + 1) * cell_size_m, y0 + (r + 1) * cell_size_m)
+        for r in range(rows) for c in range(cols)
+    ]
+    # Vectorised clip of every cell against the AOI.
+    clipped = shapely.intersection(cells, aoi_utm)
+    areas = shapely.area(clipped)
+    min_area = MIN_CELL_FRACTION * cell_size_m * cell_size_m
+
+    zones = []
+    for i, (geom, area) in enumerate(zip(clipped, areas)):
+        if area < min_area:
+            continue
+        r, c = divmod(i, cols)
+        zones.append({
+            "id": f"r{rows - 1 - r}c{c}",   # row 0 is the northernmost row
+            "geometry": mapping(transform_geom(to_wgs.transform, geom)),
+            "area_m2": round(float(area), 1),
+        })
+    _check_zone_count(zones)
+    return zones
+
+
+def polygon_zones(zones_geojson: dict) -> list:
+    """Normalise uploaded zones (Feature / FeatureCollection / (Multi)Polygon)."""
+    features = []
+
+    def _walk(obj, zone_id=None):
+        if not obj:
+            return
+        kind = obj.get("type")
+        if kind == "FeatureCollection":
+            for feat in obj.get("features") or []:
+                _walk(feat)
+        elif kind == "Feature":
+            props = obj.get("properties") or {}
+            _walk(obj.get("geometry"), obj.get("id", props.get("id", props.get("zone", props.get("name")))))
+        elif kind in ("Polygon", "MultiPolygon"):
+            features.append((zone_id, obj))
+        else:
+            raise ValueError(f"Unsupported geometry type for zones: {kind!r}")
+
+    _walk(zones_geojson)
+    if not features:
+        raise ValueError("No zone polygons provided.")
+
+    zones, seen = [], set()
+    for n, (zone_id, geometry) in enumerate(features, start=1):
+        zid = str(zone_id) if zone_id not in (None, "") else str(n)
+        if zid in seen:
+            zid = f"{zid}_{n}"
+        seen.add(zid)
+        geom = shape(geometry)
+        centroid = geom.centroid
+        tr = pixel_cache._to_grid_crs(pixel_cache._utm_crs_for(centroid.x, centroid.y))
+        zones.append({
+            "id": zid,
+            "geometry": geometry,
+            "area_m2": round(float(transform_geom(tr.transform, geom).area), 1),
+        })
+    _check_zone_count(zones)
+    return zones
+
+
+def _check_zone_count(zones: list) -> None:
+    if not zones:
+        raise ValueError("The zoning does not overlap the AOI.")
+    if len(zones) > MAX_ZONES:
+        raise ValueError(f"Too many zones ({len(zones)}); the limit is {MAX_ZONES}.")
+
+
+class ZoneStatsCache:
+    """Thread-safe LRU of per-date zonal results ({zone_id: {index: value}})."""
+
+    def __init__(self, max_entries: int = ZONE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._items: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[dict]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key: tuple, value: dict) -> None:
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)